@@ -1,32 +1,44 @@
 import pandas as pd
 import pandas_ta as ta
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import time
 import json
 import os
 from datetime import datetime, timedelta
 from infrastructure import log
+from volume_profile import rolling_profile
+from shadow_store import ShadowStore
+from shadow_book import ShadowBook, TP, grid_arrays, variant_grid
+from trade_stats import TradeStatsStore, MfeMaeTracker
+import exit_optimizer
+from settings import cfg
 
 class AdvancedMarketEngine:
-    def __init__(self, mt5_connector, db_handler):
+    def __init__(self, mt5_connector, db_handler, writer=None, migrate_legacy=False):
         self.mt5 = mt5_connector
         self.db = db_handler
-        self.shadow_file = "shadow_trades.json"
-        self.active_stats_file = "trade_perf_stats.json"
         
-        # Lade laufende Shadow Trades
-        self.shadow_trades = self._load_json(self.shadow_file)
-        # Lade MFE/MAE Stats für offene Trades
-        self.trade_stats = self._load_json(self.active_stats_file)
-
-    def _load_json(self, filename):
-        if os.path.exists(filename):
-            try:
-                with open(filename, "r") as f: return json.load(f)
-            except: return [] if "shadow" in filename else {}
-        return [] if "shadow" in filename else {}
-
-    def _save_json(self, filename, data):
-        with open(filename, "w") as f: json.dump(data, f, indent=4, default=str)
+        # Shadow Trades: SQLite-Store, im Speicher nur die offenen (als Arrays pro Symbol).
+        # Alte JSON-Dateien übernimmt nur der Bot (migrate_legacy), nicht jeder Trainer-Worker.
+        self.shadow_store = ShadowStore(cfg.SHADOW_DB, legacy_json="shadow_trades.json" if migrate_legacy else None)
+        self.shadow_store.writer = writer
+        self.shadow_grid = variant_grid(cfg.SHADOW_SL_MULTS, cfg.SHADOW_TP_MULTS, cfg.SHADOW_BREAKEVEN, cfg.SHADOW_TRAIL)
+        self.shadow_grid_id = self.shadow_store.add_grid(self.shadow_grid)
+        self.shadow_grid_arrays = grid_arrays(self.shadow_grid)
+        self.shadow_book = ShadowBook(max_catchup_bars=cfg.CANDLE_CACHE_SIZE, max_age=cfg.SHADOW_MAX_AGE_HOURS * 3600)
+        for entry in self.shadow_store.load_open():
+            self.shadow_book.add(entry, self.shadow_store.grid(entry["grid_id"]))
+        # MFE/MAE der offenen Trades im Speicher (Checkpoint + Historie in SQLite)
+        stats_store = TradeStatsStore(cfg.TRADE_STATS_DB, *(("trade_perf_stats.json", "trade_history_stats.json")
+                                                            if migrate_legacy else ()))
+        stats_store.writer = writer
+        self.trade_tracker = MfeMaeTracker(self.mt5, stats_store,
+                                           checkpoint_interval=cfg.MFE_CHECKPOINT_SECONDS,
+                                           tick_window=cfg.MFE_TICK_WINDOW, max_bars=cfg.CANDLE_CACHE_SIZE)
+        # Empfohlene Exit-Parameter (exit_optimizer.py), bei Änderung der Datei neu geladen
+        self._exit_params = {}
+        self._exit_params_mtime = None
 
     # ==========================================================
     # 1. MARKT-REGIME (Trend vs. Range) & VELOCITY
@@ -98,214 +110,106 @@ class AdvancedMarketEngine:
     # ==========================================================
     # UPGRADE: SHADOW TRADING MIT FEATURE-SNAPSHOT
     # ==========================================================
-    def spawn_shadow_trades(self, symbol, side, entry_price, current_atr, features):
+    def spawn_shadow_trades(self, symbol, side, entry_price, current_atr, features, setup=None):
         """
-        Erstellt 5 virtuelle Varianten UND speichert die KI-Features dazu.
-        Das ist der Schlüssel, damit die KI später davon lernen kann.
+        Erstellt einen virtuellen Einstieg mit allen Varianten des Rasters (SHADOW_* in settings.py)
+        UND speichert die KI-Features dazu. Das ist der Schlüssel, damit die KI später davon lernen kann.
         """
-        variants = [
-            {"name": "Scalp_Sniper", "sl_m": 1.0, "tp_m": 1.5},
-            {"name": "Day_Standard", "sl_m": 1.5, "tp_m": 3.0},
-            {"name": "Swing_Runner", "sl_m": 2.5, "tp_m": 6.0},
-            {"name": "Tight_Guard",  "sl_m": 0.8, "tp_m": 2.0},
-            {"name": "Loose_Risk",   "sl_m": 2.0, "tp_m": 4.0}
-        ]
-        
         # Wir säubern die Features (keine komplexen Objekte, nur Zahlen)
         clean_features = {k: v for k, v in features.items() if isinstance(v, (int, float, str))}
+        # Serverzeit der Eröffnung: ab hier zählen M1-Kerzen bei der Nachprüfung
+        tick = self.mt5.get_tick(symbol)
 
-        for v in variants:
-            sl_dist = current_atr * v["sl_m"]
-            tp_dist = current_atr * v["tp_m"]
-            
-            if side == "LONG":
-                sl = entry_price - sl_dist
-                tp = entry_price + tp_dist
-            else:
-                sl = entry_price + sl_dist
-                tp = entry_price - tp_dist
-                
-            shadow = {
-                "id": f"{symbol}_{int(time.time())}_{v['name']}",
-                "symbol": symbol, 
-                "side": side,
-                "entry": entry_price,
-                "sl": sl, 
-                "tp": tp,
-                "status": "OPEN",
-                "start_time": datetime.now().isoformat(),
-                "strategy_variant": v["name"],
-                "features": clean_features  # <--- HIER IST DAS GOLD!
-            }
-            self.shadow_trades.append(shadow)
-            
-        self._save_json(self.shadow_file, self.shadow_trades)
-        log.info(f"👻 5 Shadow-Trades (mit Features) für {symbol} gestartet!")
+        entry = {
+            "id": f"{symbol}_{int(time.time())}",
+            "symbol": symbol,
+            "side": side,
+            "setup": setup,
+            "entry": entry_price,
+            "atr": current_atr,
+            "entry_time": int(tick.time) if tick else None,
+            "start_time": datetime.now().isoformat(),
+            "grid_id": self.shadow_grid_id,
+            "features": clean_features  # <--- HIER IST DAS GOLD!
+        }
+        self.shadow_store.add_entries([entry])
+        self.shadow_book.add(entry, self.shadow_grid_arrays)
+        log.info(f"👻 Shadow-Einstieg mit {len(self.shadow_grid['sl_m'])} Varianten (mit Features) für {symbol} gestartet!")
 
     # ==========================================================
     # UPGRADE: DYNAMISCHE OPTIMIERUNG (Der "Reality Check")
     # ==========================================================
     def analyze_and_optimize(self):
         """
-        Analysiert geschlossene Trades und berechnet das perfekte TP/SL Verhältnis.
-        Gibt Empfehlungen aus.
+        Sucht pro Symbol und Setup die beste SL/TP/Breakeven/Trailing-Kombination über die gesamte
+        Shadow- und Trade-Historie (exit_optimizer.py) und schreibt sie nach EXIT_PARAMS_FILE.
         """
-        stats_file = "trade_perf_stats.json" # Wir nehmen an, hier landen auch geschlossene (oder wir nutzen DB)
-        # HINWEIS: Damit das funktioniert, musst du in update_trade_performance_stats 
-        # die geschlossenen Trades in eine "History"-Datei schreiben, statt sie zu löschen.
-        
-        # Hier die "Pro"-Logik für die Auswertung:
         try:
-            # Wir simulieren hier den Zugriff auf die History
-            # (Du müsstest im vorherigen Code beim Löschen 'keys_to_delete' in eine history.json speichern)
-            history_file = "trade_history_stats.json" 
-            if not os.path.exists(history_file): return
-            
-            with open(history_file, "r") as f:
-                trades = json.load(f)
-            
-            if len(trades) < 10: return # Brauchen Daten
-            
-            # Analyse
-            avg_mfe = sum([t['max_profit_pips'] for t in trades]) / len(trades)
-            avg_mae = sum([abs(t['max_drawdown_pips']) for t in trades]) / len(trades)
-            
-            log.info(f"📊 OPTIMIZER REPORT (Last {len(trades)} Trades):")
-            log.info(f"   Ø MFE (Max möglicher Gewinn): {avg_mfe:.1f} Pips")
-            log.info(f"   Ø MAE (Max Schmerz): {avg_mae:.1f} Pips")
-            
-            # Empfehlung berechnen
-            suggested_tp = avg_mfe * 0.8 # Wir wollen 80% vom Durchschnitt mitnehmen
-            suggested_sl = avg_mae * 1.2 # Wir geben dem Trade 20% mehr Luft als nötig
+            report = exit_optimizer.optimize(self.shadow_store, self.trade_tracker.store, cfg.DB_NAME)
+            exit_optimizer.write_params(report)
             
-            log.info(f"💡 EMPFEHLUNG: Setze TP auf ca. {suggested_tp:.1f} Pips und SL auf {suggested_sl:.1f} Pips.")
-            
-            # AUTOMATISCHE ANPASSUNG (Optional - riskant, aber mächtig)
-            # self.apply_new_settings(suggested_tp, suggested_sl)
+            log.info(f"📊 OPTIMIZER REPORT ({report['shadow_entries']} Shadow-Einstiege):")
+            for symbol, by_setup in sorted(report["params"].items()):
+                p = by_setup.get(exit_optimizer.ALL)
+                if p:
+                    log.info(f"💡 {symbol}: SL {p['sl_m']} / TP {p['tp_m']} ATR | Ø {p['expectancy_r']:+.2f} R ({p['samples']} Einstiege)")
+            return report
 
         except Exception as e:
             log.error(f"Optimizer Fehler: {e}")
 
-    def update_shadow_trades(self):
-        """Prüft, ob virtuelle Trades gewonnen hätten"""
-        active_shadows = [t for t in self.shadow_trades if t["status"] == "OPEN"]
-        if not active_shadows: return
+    def exit_params(self, symbol, setup=None):
+        """Empfohlene Exit-Parameter für Symbol/Setup (sonst alle Setups des Symbols) oder None."""
+        try:
+            mtime = os.path.getmtime(cfg.EXIT_PARAMS_FILE)
+        except OSError:
+            return None
+        if mtime != self._exit_params_mtime:
+            try:
+                with open(cfg.EXIT_PARAMS_FILE, "r") as f: self._exit_params = json.load(f).get("params", {})
+                log.info(f"🎯 Exit-Parameter neu geladen ({len(self._exit_params)} Symbole).")
+            except Exception as e:
+                log.error(f"❌ {cfg.EXIT_PARAMS_FILE} nicht lesbar: {e}")
+            self._exit_params_mtime = mtime
+        by_setup = self._exit_params.get(symbol, {})
+        return by_setup.get(setup) or by_setup.get(exit_optimizer.ALL)
 
-        changed = False
-        for trade in active_shadows:
-            # Live Preis holen
-            tick = self.mt5.mt5.symbol_info_tick(trade["symbol"])
+    def update_shadow_trades(self):
+        """Prüft, ob virtuelle Trades gewonnen hätten (ein Tick pro Symbol, M1-Nachprüfung)"""
+        updates = []
+        for symbol in self.shadow_book.symbols():
+            # Live Preis aus dem Loop-Snapshot
+            tick = self.mt5.get_tick(symbol)
             if not tick: continue
-            
-            bid, ask = tick.bid, tick.ask
-            
-            outcome = None
-            if trade["side"] == "LONG":
-                if bid <= trade["sl"]: outcome = "LOSS"
-                elif bid >= trade["tp"]: outcome = "WIN"
-            else: # SHORT
-                if ask >= trade["sl"]: outcome = "LOSS"
-                elif ask <= trade["tp"]: outcome = "WIN"
-            
-            if outcome:
-                trade["status"] = outcome
-                trade["end_time"] = datetime.now().isoformat()
-                log.info(f"👻 SHADOW RESULT: {trade['id']} -> {outcome}")
-                changed = True
-                
-                # OPTIONAL: Hier in DB speichern für KI-Analyse
-                # self.db.save_shadow_result(...) 
 
-        if changed:
-            self._save_json(self.shadow_file, self.shadow_trades)
+            # Neue M1-Kerze seit der letzten Nachprüfung: Hochs/Tiefs dazwischen mitprüfen
+            bars = None
+            count = self.shadow_book.catchup_bars(symbol, tick.time)
+            if count:
+                bars = self.mt5.candles.get_rates(symbol, self.mt5.mt5.TIMEFRAME_M1, count)
+
+            for entry in self.shadow_book.evaluate(symbol, tick.bid, tick.ask, tick.time, bars):
+                if entry["status"] != "OPEN":
+                    entry["end_time"] = datetime.now().isoformat()
+                    log.info(f"👻 SHADOW RESULT: {entry['id']} -> {int((entry['outcomes'] == TP).sum())}/"
+                             f"{len(entry['outcomes'])} Varianten im TP, Ø {entry['exits'].mean():+.2f} ATR")
+                updates.append(entry)
+
+        if updates:
+            # Nur die betroffenen Einstiege schreiben
+            self.shadow_store.update_entries(updates)
 
     # ==========================================================
     # 3. MFE / MAE TRACKER (Qualitäts-Kontrolle)
     # ==========================================================
-    def update_trade_performance_stats(self, positions):
-        """Trackt MFE/MAE und archiviert geschlossene Trades."""
-        changed = False
-        current_ticket_ids = [str(p.ticket) for p in positions]
-        
-        # 1. UPDATE: Laufende Trades aktualisieren
-        for pos in positions:
-            ticket = str(pos.ticket)
-            symbol = pos.symbol
-            entry = pos.price_open
-            # Preis holen (Bid für Buy, Ask für Sell um den Exit zu simulieren)
-            tick = self.mt5.mt5.symbol_info_tick(symbol)
-            if not tick: continue
-            current_price = tick.bid if pos.type == 0 else tick.ask
-            
-            # Init wenn neu
-            if ticket not in self.trade_stats:
-                self.trade_stats[ticket] = {
-                    "symbol": symbol,
-                    "max_profit_pips": 0.0,
-                    "max_drawdown_pips": 0.0,
-                    "entry": entry,
-                    "type": "BUY" if pos.type == 0 else "SELL"
-                }
-            
-            stats = self.trade_stats[ticket]
-            point = self.mt5.mt5.symbol_info(symbol).point
-            
-            # Berechne Pips Abstand
-            if stats["type"] == "BUY":
-                diff = (current_price - entry) / point
-            else:
-                diff = (entry - current_price) / point
-                
-            # Update Highscores
-            if diff > stats["max_profit_pips"]:
-                stats["max_profit_pips"] = diff
-                changed = True
-            if diff < stats["max_drawdown_pips"]: # drawdown ist negativ
-                stats["max_drawdown_pips"] = diff
-                changed = True
-                
-        # 2. CLEANUP & ARCHIV: Geschlossene Trades finden
-        keys_to_delete = []
-        archive_data = [] # Hier sammeln wir die geschlossenen für die History
-
-        # Welche Tickets sind nicht mehr da?
-        for ticket in list(self.trade_stats.keys()):
-            if ticket not in current_ticket_ids:
-                keys_to_delete.append(ticket)
-
-        # Jetzt verarbeiten wir die geschlossenen
-        for k in keys_to_delete:
-            stats = self.trade_stats[k] # Daten holen BEVOR wir löschen!
-            
-            # A) Loggen
+    def update_trade_performance_stats(self, positions, complete=True):
+        """
+        Trackt MFE/MAE (alle Ticks seit der letzten Prüfung) und archiviert geschlossene Trades.
+        complete=False, wenn die Positionsabfrage fehlgeschlagen ist (dann wird nichts als geschlossen gewertet).
+        """
+        closed = self.trade_tracker.update(positions, complete)
+        for stats in closed.values():
             log.info(f"📉 TRADE REPORT {stats['symbol']}: Max Profit: {stats['max_profit_pips']:.1f} Pips | Max DD: {stats['max_drawdown_pips']:.1f} Pips")
-            
-            # B) Ins Archiv verschieben
-            archive_data.append(stats)
-            
-            # C) Aus dem aktiven Speicher löschen
-            del self.trade_stats[k]
-            changed = True
-        
-        # 3. SPEICHERN: Aktive Trades (JSON Update)
-        if changed:
-            self._save_json(self.active_stats_file, self.trade_stats)
-
-        # 4. SPEICHERN: History (Append an History File)
-        if archive_data:
-            history_file = "trade_history_stats.json"
-            existing = []
-            if os.path.exists(history_file):
-                try:
-                    with open(history_file, "r") as f: existing = json.load(f)
-                except: existing = []
-            
-            existing.extend(archive_data)
-            
-            # Nur die letzten 500 Trades behalten (damit die Datei nicht explodiert)
-            if len(existing) > 500: existing = existing[-500:]
-            
-            with open(history_file, "w") as f: json.dump(existing, f, indent=4)
 
     # ==========================================================
     # 4. SMART ENTRY LOGIC (Die Strategie-Zentrale)
@@ -320,7 +224,7 @@ class AdvancedMarketEngine:
             if df is None or len(df) < 50: return None, None
             
             # 1. Volume Profile Daten holen
-            poc, vah, val = vp_engine.calculate_enhanced_profile(df)
+            poc, vah, val = vp_engine.get_profile(symbol, df)
             if poc == 0: return None, None
 
             current_price = df['close'].iloc[-1]
@@ -369,4 +273,51 @@ class AdvancedMarketEngine:
 
         except Exception as e:
             log.error(f"Fehler in check_entry_signal für {symbol}: {e}")
-            return None, None
\ No newline at end of file
+            return None, None
+
+    def scan_entry_signals(self, df, lookback, indices=None):
+        """
+        check_entry_signal(symbol, df.iloc[i-lookback:i+1], ...) für viele Kerzen in einem Durchlauf
+        (Training). Profile kommen aus volume_profile.rolling_profile, die Regeln sind vektorisiert.
+        Voraussetzung: i >= lookback. Rückgabe: (directions, strategies) als Listen (None = kein Signal).
+        """
+        n = len(df)
+        idx = np.arange(lookback, n) if indices is None else np.asarray(indices, dtype=np.int64)
+        directions, strategies = [None] * len(idx), [None] * len(idx)
+        if lookback + 1 < 50 or len(idx) == 0: return directions, strategies
+
+        c, o = df['close'].values.astype(float), df['open'].values.astype(float)
+        h, l = df['high'].values.astype(float), df['low'].values.astype(float)
+        vol_col = next((col for col in ['tick_volume', 'volume', 'real_volume'] if col in df.columns), None)
+        volume = df[vol_col].values if vol_col else None
+
+        poc, vah, val = rolling_profile(c, volume, lookback=min(96, lookback + 1), start=int(idx.min()))
+        poc, vah, val = poc[idx], vah[idx], val[idx]
+
+        if 'ATR' in df.columns:
+            atr = df['ATR'].values[idx]
+        else:
+            win = lookback + 1
+            atr = (sliding_window_view(h, win).max(axis=1)[idx - lookback]
+                   - sliding_window_view(l, win).min(axis=1)[idx - lookback]) * 0.05
+
+        price, open_price = c[idx], o[idx]
+        last_closes = c[idx[:, None] - np.arange(4, -1, -1)]
+        touches_vah = (np.abs(last_closes - vah[:, None]) < (atr * 0.3)[:, None]).sum(axis=1)
+        touches_val = (np.abs(last_closes - val[:, None]) < (atr * 0.3)[:, None]).sum(axis=1)
+        active = (poc != 0) & (touches_vah < 3) & (touches_val < 3)
+
+        upper = active & (price >= (vah - (atr * 0.1)))
+        lower = active & ~upper & (price <= (val + (atr * 0.1)))
+        green, red = price > open_price, price < open_price
+        rules = [
+            (upper & green & (price > vah + (atr * 0.1)), "LONG", "Smart_VAH_Breakout"),
+            (upper & red & (price < l[idx - 1]), "SHORT", "Smart_VAH_Rejection"),
+            (lower & red & (price < val - (atr * 0.1)), "SHORT", "Smart_VAL_Breakout"),
+            (lower & green & (price > h[idx - 1]), "LONG", "Smart_VAL_Rejection"),
+        ]
+        # Reihenfolge wie in check_entry_signal: die erste zutreffende Regel gewinnt
+        for mask, direction, name in reversed(rules):
+            for k in np.flatnonzero(mask):
+                directions[k], strategies[k] = direction, name
+        return directions, strategies
\ No newline at end of file
@@ -0,0 +1,156 @@
+# anchors.py
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DAY = 86400
+PIVOT_BARS = 5   # Kerzen links und rechts, die eine Swing-Pivot-Kerze überragen muss
+
+
+def frame_times(df):
+    """Kerzenzeiten in Sekunden (time-Spalte oder time-Index)."""
+    times = df['time'].values if 'time' in df.columns else df.index.values
+    if np.issubdtype(times.dtype, np.datetime64):
+        times = times.astype('datetime64[s]').astype(np.int64)
+    return np.asarray(times, dtype=np.int64)
+
+
+def _vol_col(df):
+    return next((c for c in ['tick_volume', 'volume', 'real_volume'] if c in df.columns), None)
+
+
+def frame_arrays(df):
+    """(times, high, low, close, volume) als float64-Arrays; ohne Volumen-Spalte Volumen 1."""
+    vol_col = _vol_col(df)
+    volume = df[vol_col].values.astype(np.float64) if vol_col else np.ones(len(df))
+    return (frame_times(df), df['high'].values.astype(np.float64),
+            df['low'].values.astype(np.float64), df['close'].values.astype(np.float64), volume)
+
+
+def last_bar(df, times):
+    """(time, high, low, close, volume) der letzten (laufenden) Kerze."""
+    row = df.iloc[-1]
+    vol_col = _vol_col(df)
+    return (int(times[-1]), float(row['high']), float(row['low']), float(row['close']),
+            float(row[vol_col]) if vol_col else 1.0)
+
+
+def typical_price(high, low, close):
+    return (high + low + close) / 3.0
+
+
+# --- Vollständige Berechnung (ohne Zustand) ---
+def last_pivot(high, low, bars=PIVOT_BARS):
+    """
+    Position der letzten bestätigten Swing-Pivot-Kerze in den übergebenen (abgeschlossenen) Kerzen:
+    Hoch >= alle Hochs bzw. Tief <= alle Tiefs der `bars` Kerzen links und rechts. None, wenn keine.
+    """
+    width = 2 * bars + 1
+    if len(high) < width: return None
+    highs, lows = sliding_window_view(high, width), sliding_window_view(low, width)
+    is_pivot = (highs[:, bars] >= highs.max(axis=1)) | (lows[:, bars] <= lows.min(axis=1))
+    hits = np.flatnonzero(is_pivot)
+    return int(hits[-1]) + bars if len(hits) else None
+
+
+def vwap(high, low, close, volume):
+    """VWAP über alle übergebenen Kerzen (sequenzielle Summe wie die inkrementelle Variante)."""
+    if len(close) == 0: return None
+    pv = np.cumsum(typical_price(high, low, close) * volume)[-1]
+    v = np.cumsum(volume)[-1]
+    return pv / v if v > 0 else close[-1]
+
+
+def session_start(times):
+    """Position der ersten Kerze des Handelstags (Serverzeit) der letzten Kerze."""
+    return int(np.searchsorted(times, times[-1] // DAY * DAY))
+
+
+# --- Inkrementell ---
+class AnchorTracker:
+    """
+    Hält letzte Swing-Pivot, Session-VWAP und die VWAP ab der Pivot eines Symbols
+    inkrementell: jede neu abgeschlossene Kerze kostet O(bars), statt den Frame neu zu scannen.
+    Die laufende (letzte) Kerze des Frames wird nur bei der Abfrage hinzugenommen.
+    """
+    def __init__(self, bars=PIVOT_BARS):
+        self.bars = bars
+        self.resets = 0
+        self.reset()
+
+    def reset(self):
+        self.last_time = None
+        self.window = deque(maxlen=2 * self.bars + 1)   # (time, high, low, pv, volume)
+        self.pivot_time = None
+        self.day = None
+        self.session_pv = self.session_v = 0.0
+        self.anchor_pv = self.anchor_v = 0.0
+
+    def _push(self, t, h, l, pv, v):
+        day = t // DAY
+        if day != self.day:
+            self.day = day
+            self.session_pv = self.session_v = 0.0
+        self.session_pv += pv
+        self.session_v += v
+        self.anchor_pv += pv
+        self.anchor_v += v
+
+        self.window.append((t, h, l, pv, v))
+        if len(self.window) < self.window.maxlen: return
+        center = self.window[self.bars]
+        if center[1] >= max(b[1] for b in self.window) or center[2] <= min(b[2] for b in self.window):
+            # Neue Pivot: Summen ab der Pivot-Kerze neu aufbauen (bars + 1 Kerzen)
+            self.pivot_time = center[0]
+            self.anchor_pv = self.anchor_v = 0.0
+            for b in list(self.window)[self.bars:]:
+                self.anchor_pv += b[3]
+                self.anchor_v += b[4]
+
+    def new_bars(self, times):
+        """Bereich [start, closed) der noch nicht übernommenen abgeschlossenen Kerzen (Reset bei Lücke)."""
+        closed = len(times) - 1
+        if closed <= 0 or self.last_time is None: return 0, max(closed, 0)
+        pos = int(np.searchsorted(times[:closed], self.last_time))
+        if pos < closed and times[pos] == self.last_time:
+            return pos + 1, closed
+        if pos == closed:
+            return closed, closed   # Frame endet vor unserem Stand (z.B. ältere Kopie) -> nichts Neues
+        self.reset()   # Lücke: Frame beginnt nach unserem Stand
+        self.resets += 1
+        return 0, closed
+
+    def push_bars(self, times, high, low, close, volume):
+        """Übernimmt abgeschlossene Kerzen (älteste zuerst)."""
+        if len(times) == 0: return
+        pv = typical_price(high, low, close) * volume
+        for i in range(len(times)):
+            self._push(int(times[i]), high[i], low[i], pv[i], volume[i])
+        self.last_time = int(times[-1])
+
+    def update(self, times, high, low, close, volume):
+        """Übernimmt alle abgeschlossenen Kerzen (alle außer der letzten) seit dem letzten Aufruf."""
+        start, closed = self.new_bars(times)
+        self.push_bars(times[start:closed], high[start:closed], low[start:closed],
+                       close[start:closed], volume[start:closed])
+
+    def update_frame(self, df):
+        """Wie update, liest aber nur die Zeilen der neuen Kerzen aus dem Frame. Gibt die Zeiten zurück."""
+        times = frame_times(df)
+        start, closed = self.new_bars(times)
+        if start < closed: self.push_bars(*frame_arrays(df.iloc[start:closed]))
+        return times
+
+    def session_vwap(self, t, h, l, c, v):
+        """Session-VWAP inkl. der laufenden Kerze (t, h, l, c, v)."""
+        pv = typical_price(h, l, c) * v
+        if t // DAY != self.day:
+            return c if v <= 0 else pv / v
+        total_v = self.session_v + v
+        return (self.session_pv + pv) / total_v if total_v > 0 else c
+
+    def anchored_vwap(self, h, l, c, v):
+        """VWAP ab der letzten Pivot-Kerze inkl. der laufenden Kerze (None ohne Pivot)."""
+        if self.pivot_time is None: return None
+        total_v = self.anchor_v + v
+        return (self.anchor_pv + typical_price(h, l, c) * v) / total_v if total_v > 0 else c
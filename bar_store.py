@@ -0,0 +1,155 @@
+# bar_store.py
+import os
+import numpy as np
+import pandas as pd
+from infrastructure import log
+
+# Layout von mt5.copy_rates_* (gepackt, 60 Bytes pro Kerze)
+BAR_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+BAR_SUFFIX = ".bars"
+
+_EMPTY = np.zeros(0, dtype=BAR_DTYPE)
+
+
+class BarStore:
+    """
+    Lokale Kerzen-Historie auf der Platte: eine Datei pro (Symbol, Timeframe) mit den
+    Roh-Records im MT5-Layout, nur abgeschlossene Kerzen, nur Anhängen.
+    - sync(): holt nur den fehlenden Schwanz vom Terminal (wie CandleCache: klein anfangen,
+      bei Lücke vergrößern); ist die Lücke größer als die Historie oder wird mehr Historie
+      angefordert, als gespeichert ist (und das Terminal hat sie), wird die Datei neu aufgebaut
+    - bars(): read-only np.memmap-View der letzten `count` Kerzen (keine Kopie)
+    Pro Datei darf nur ein Prozess schreiben (Trainer-Jobs sind pro Symbol/TF getrennt).
+    Unter Windows sollten Views vor einem Neuaufbau freigegeben werden (release()).
+    """
+    def __init__(self, mt5_module, root="bar_store", history=50000):
+        self.mt5 = mt5_module
+        self.root = root
+        self.history = history
+        self._maps = {}        # key -> (Dateigröße, memmap)
+        self._exhausted = set()  # Terminal hat nicht mehr Historie als gespeichert
+        self.stats = {"rebuilds": 0, "appends": 0, "bars_fetched": 0}
+
+    def _tf_name(self, timeframe):
+        for name in dir(self.mt5):
+            if name.startswith("TIMEFRAME_") and getattr(self.mt5, name) == timeframe:
+                return name[len("TIMEFRAME_"):]
+        return str(timeframe)
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol}_{self._tf_name(timeframe)}{BAR_SUFFIX}")
+
+    # --- Lesen ---
+    def _map(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        fn = self.path(symbol, timeframe)
+        try:
+            size = os.path.getsize(fn)
+        except OSError:
+            self._maps.pop(key, None)
+            return _EMPTY
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        if size % BAR_DTYPE.itemsize:
+            # Abgebrochener Schreibvorgang: unvollständigen letzten Record abschneiden
+            size -= size % BAR_DTYPE.itemsize
+            log.warning(f"⚠️ Bar-Store {fn}: unvollständiger Record entfernt")
+            with open(fn, "r+b") as f: f.truncate(size)
+        mm = np.memmap(fn, dtype=BAR_DTYPE, mode="r") if size else _EMPTY
+        self._maps[key] = (size, mm)
+        return mm
+
+    def release(self, symbol=None, timeframe=None):
+        """Gibt die Memory-Maps frei (alle oder eine)."""
+        if symbol is None: self._maps.clear()
+        else: self._maps.pop((symbol, timeframe), None)
+
+    def bars(self, symbol, timeframe, count=None, sync=True):
+        """Abgeschlossene Kerzen (älteste zuerst) als read-only View; leeres Array, wenn keine Daten."""
+        if sync: self.sync(symbol, timeframe, count)
+        mm = self._map(symbol, timeframe)
+        return mm if count is None else mm[max(len(mm) - count, 0):]
+
+    def frame(self, symbol, timeframe, count=None, sync=True):
+        """DataFrame im Format von fetch_candles (time-Index, 'volume'); kopiert die Daten."""
+        df = pd.DataFrame(self.bars(symbol, timeframe, count, sync))
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        df.rename(columns={'tick_volume': 'volume'}, inplace=True)
+        df.set_index('time', inplace=True)
+        return df
+
+    # --- Schreiben ---
+    def _fetch(self, symbol, timeframe, n):
+        rates = self.mt5.copy_rates_from_pos(symbol, timeframe, 0, n)
+        if rates is None or len(rates) == 0: return None
+        self.stats["bars_fetched"] += len(rates)
+        return rates
+
+    def _rebuild(self, symbol, timeframe, count):
+        """Komplette Historie neu laden (die letzte, laufende Kerze wird nicht gespeichert)."""
+        key = (symbol, timeframe)
+        rates = self._fetch(symbol, timeframe, count + 1)
+        if rates is None: return 0
+        closed = np.ascontiguousarray(rates[:-1]).astype(BAR_DTYPE, copy=False)
+        fn = self.path(symbol, timeframe)
+        os.makedirs(self.root, exist_ok=True)
+        self._maps.pop(key, None)
+        tmp = fn + ".tmp"
+        with open(tmp, "wb") as f: f.write(closed.tobytes())
+        os.replace(tmp, fn)
+        if len(closed) < count: self._exhausted.add(key)
+        self.stats["rebuilds"] += 1
+        log.info(f"💽 Bar-Store {os.path.basename(fn)}: {len(closed)} Kerzen geladen")
+        return len(closed)
+
+    def _append(self, symbol, timeframe, closed):
+        with open(self.path(symbol, timeframe), "ab") as f:
+            f.write(np.ascontiguousarray(closed).astype(BAR_DTYPE, copy=False).tobytes())
+        self.stats["appends"] += 1
+
+    def _has_older(self, symbol, timeframe):
+        """Hat das Terminal Kerzen vor der ersten gespeicherten? (ein Abruf mit einer Kerze)"""
+        stored = self._map(symbol, timeframe)
+        # Nach dem Schwanz-Sync liegt Position len+1 direkt vor der ersten gespeicherten Kerze
+        older = self.mt5.copy_rates_from_pos(symbol, timeframe, len(stored) + 1, 1)
+        if older is None or len(older) == 0 or older['time'][0] >= stored['time'][0]:
+            self._exhausted.add((symbol, timeframe))
+            return False
+        return True
+
+    def _sync_tail(self, symbol, timeframe, stored, want):
+        """Hängt die seit der letzten gespeicherten Kerze abgeschlossenen Kerzen an."""
+        # Klein anfangen, bei Lücke vergrößern
+        last = int(stored['time'][-1])
+        n = 2
+        while True:
+            rates = self._fetch(symbol, timeframe, n)
+            if rates is None: return 0
+            if rates['time'][0] <= last: break
+            if len(rates) < n or n >= want:
+                # Historie des Terminals beginnt nach unserer letzten Kerze -> Lücke
+                log.warning(f"⚠️ Bar-Store {symbol} {self._tf_name(timeframe)}: Lücke, baue neu auf")
+                return self._rebuild(symbol, timeframe, want)
+            n = min(n * 4, want)
+
+        closed = rates[:-1]
+        fresh = closed[closed['time'] > last]
+        if len(fresh): self._append(symbol, timeframe, fresh)
+        return len(fresh)
+
+    def sync(self, symbol, timeframe, count=None):
+        """Bringt die Datei auf den Stand des Terminals. Rückgabe: Anzahl neuer Kerzen."""
+        key = (symbol, timeframe)
+        want = max(count or 0, self.history)
+        stored = self._map(symbol, timeframe)
+        if len(stored) == 0:
+            return self._rebuild(symbol, timeframe, want)
+        added = self._sync_tail(symbol, timeframe, stored, want)
+        if len(self._map(symbol, timeframe)) < want and key not in self._exhausted \
+                and self._has_older(symbol, timeframe):
+            return self._rebuild(symbol, timeframe, want)   # Mehr Historie angefordert als gespeichert
+        return added
@@ -0,0 +1,1307 @@
+# benchmark.py
+"""
+Reproduzierbare Offline-Benchmarks gegen das Fake-Terminal (fake_mt5).
+Läuft in einem temporären Arbeitsverzeichnis, damit DB/JSON-Dateien des Bots unberührt bleiben.
+
+    python benchmark.py loop --passes 20 --latency 0.002
+    python benchmark.py parity        # Exit-Code 1, wenn die Features von pandas_ta abweichen
+    python benchmark.py features
+    python benchmark.py kernel --bars 1000000
+    python benchmark.py forest --trees 1000
+    python benchmark.py labels
+    python benchmark.py profile --bars 50000
+    python benchmark.py lva
+    python benchmark.py anchors
+    python benchmark.py ticks
+    python benchmark.py bars
+    python benchmark.py shadows
+    python benchmark.py shadoweval
+    python benchmark.py mfe
+    python benchmark.py exitopt
+    python benchmark.py journal --rows 1000000
+    python benchmark.py persist
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+import fake_mt5
+fake_mt5.install()
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _enter_sandbox():
+    """Wechselt in ein Temp-Verzeichnis (vor dem Import der Bot-Module wegen Log-Datei)."""
+    sandbox = tempfile.mkdtemp(prefix="bot_bench_")
+    os.chdir(sandbox)
+    return sandbox
+
+
+def _timings(samples):
+    a = np.asarray(samples) * 1000
+    return f"mean {a.mean():.2f} ms | p50 {np.percentile(a, 50):.2f} ms | p95 {np.percentile(a, 95):.2f} ms"
+
+
+def _scan_pass(bot, cfg):
+    """Der datenseitige Teil eines Durchlaufs von run_strategy_loop (ohne Order-Ausführung)."""
+    m5, m1 = bot.mt5.mt5.TIMEFRAME_M5, bot.mt5.mt5.TIMEFRAME_M1
+    bot.mt5.refresh_snapshot(cfg.SYMBOLS)
+    bot.manage_running_trades()
+    bot.adv_engine.update_shadow_trades()
+    positions = bot.mt5.snapshot.positions
+    if positions:
+        bot.adv_engine.update_trade_performance_stats(positions)
+
+    for symbol in cfg.SYMBOLS:
+        bot.db.get_minutes_since_last_trade(symbol)
+        tick = bot.mt5.get_tick(symbol)
+        if not tick or tick.ask == 0: continue
+        df_m5 = bot.fetch_candles(symbol, timeframe=m5)
+        df_m1 = bot.fetch_candles(symbol, timeframe=m1)
+        if df_m5 is None or df_m1 is None: continue
+        bot.mt5.get_live_price(symbol)
+        bot.adv_engine.check_entry_signal(symbol, df_m5, bot.vp_engine)
+        bot.ai.get_ai_prediction(symbol, df_m5, tf_name="M5")
+        # Feature-Pfad auch ohne trainierte Modelle messen (M5-Prognose + M1-Bestätigung)
+        bot.ai.get_features(symbol, df_m5, tf_name="M5")
+        bot.ai.get_features(symbol, df_m1, tf_name="M1")
+        bot.adv_engine.get_tick_velocity(symbol)
+
+
+def bench_loop(args):
+    fake_mt5.configure(latency=args.latency, now=time.time(), history_bars=2000, future_bars=args.passes * 10)
+    _enter_sandbox()
+    from main import EnterpriseBot
+    from settings import cfg
+
+    bot = EnterpriseBot()
+    if args.models:
+        bot.ai.models.models_dir = os.path.abspath(os.path.join(REPO_DIR, args.models))
+        bot.ai.models.preload(workers=cfg.MODEL_PRELOAD_WORKERS)
+
+    _scan_pass(bot, cfg)  # Warmup (erste Vollladung der Caches)
+    fake_mt5.reset_counters()
+    samples = []
+    for _ in range(args.passes):
+        fake_mt5.advance(args.step)
+        t0 = time.perf_counter()
+        _scan_pass(bot, cfg)
+        samples.append(time.perf_counter() - t0)
+
+    calls = fake_mt5.call_counts()
+    print(f"\n=== LOOP: {len(cfg.SYMBOLS)} Symbole, {args.passes} Durchläufe, Latenz {args.latency * 1000:.1f} ms/Call ===")
+    print(f"Durchlauf: {_timings(samples)} | {1 / np.mean(samples):.2f} Durchläufe/s")
+    print(f"Terminal-Calls pro Durchlauf: {sum(calls.values()) / args.passes:.1f}")
+    for name, n in sorted(calls.items(), key=lambda kv: -kv[1]):
+        print(f"   {name:<22} {n / args.passes:8.1f}")
+    fc = bot.ai.feature_cache
+    print(f"Feature-Cache: Hit-Rate {fc.hit_rate():.1%} | {fc.stats}")
+    pc = bot.vp_engine.cache
+    print(f"Profil-Cache:  Hit-Rate {pc.hit_rate():.1%} | {pc.stats}")
+
+
+def _synthetic_frame(symbol, timeframe, bars):
+    fake_mt5.configure(history_bars=bars, future_bars=0)
+    import pandas as pd
+    return pd.DataFrame(fake_mt5.terminal().rates(symbol, timeframe))
+
+
+def bench_parity(args):
+    """Vergleicht die inkrementellen Features mit AIEngine.feature_engineering (pandas_ta)."""
+    _enter_sandbox()
+    from infrastructure import AIEngine
+    import pandas_ta as ta
+    from features import FEATURE_LIST, RMA_SMA_SEED, StreamingFeatureEngine, compute_feature_matrix
+
+    version = getattr(ta, "version", None) or getattr(ta, "__version__", "?")
+    print(f"pandas_ta {version} | RMA: {'SMA-Seed, adjust=False' if RMA_SMA_SEED else 'adjust=True (0.3.14b)'}")
+    ai = AIEngine()
+    failed = False
+    for symbol in args.symbols:
+        for tf in (fake_mt5.TIMEFRAME_M1, fake_mt5.TIMEFRAME_M5):
+            df = _synthetic_frame(symbol, tf, args.bars)
+            ref = ai.feature_engineering(df)[FEATURE_LIST].values
+            engine = StreamingFeatureEngine()
+            cols = [df[c].values for c in ('time', 'open', 'high', 'low', 'close', 'tick_volume')]
+            stream = np.array([engine.update(*bar) for bar in zip(*cols)])
+            batch = compute_feature_matrix(*cols[1:])
+
+            warm = args.warmup
+            tol = args.atol + args.rtol * np.abs(ref)
+            print(f"\n=== PARITY {symbol} {fake_mt5.TF_NAMES[tf]} ({args.bars} Bars, Streaming ab Bar {warm}) ===")
+            print(f"   {'feature':<16} {'streaming':>10} {'batch':>10}")
+            for i, name in enumerate(FEATURE_LIST):
+                d_stream = np.abs(stream[warm:, i] - ref[warm:, i])
+                d_batch = np.abs(batch[:, i] - ref[:, i])
+                ok = bool((d_stream <= tol[warm:, i]).all() and (d_batch <= tol[:, i]).all())
+                failed |= not ok
+                print(f"   {name:<16} {d_stream.max():10.2e} {d_batch.max():10.2e}  {'OK' if ok else 'FAIL'}")
+    print("\nERGEBNIS:", "FAIL" if failed else "OK")
+    sys.exit(1 if failed else 0)
+
+
+def bench_features(args):
+    """Kosten pro Bar: inkrementelle Engine vs. pandas_ta über ein 500-Bar-Fenster."""
+    _enter_sandbox()
+    from infrastructure import AIEngine
+    from features import FeatureStreams
+
+    ai = AIEngine()
+    df = _synthetic_frame("EURUSD", fake_mt5.TIMEFRAME_M5, args.bars + 500)
+    t = df['time'].values
+    o, h, l, c = (df[k].values for k in ('open', 'high', 'low', 'close'))
+    v = df['tick_volume'].values.astype(float)
+
+    samples = []
+    for end in range(500, 500 + min(args.bars, 50)):
+        t0 = time.perf_counter()
+        ai.feature_engineering(df.iloc[end - 500:end])
+        samples.append(time.perf_counter() - t0)
+    print(f"\n=== FEATURES (500-Bar-Fenster, letzte Zeile) ===")
+    print(f"pandas_ta feature_engineering: {_timings(samples)}")
+
+    streams = FeatureStreams()
+    streams.latest("k", t[:501], o[:501], h[:501], l[:501], c[:501], v[:501])
+    samples = []
+    for end in range(502, 500 + args.bars):
+        s = slice(end - 500, end)
+        t0 = time.perf_counter()
+        streams.latest("k", t[s], o[s], h[s], l[s], c[s], v[s])
+        samples.append(time.perf_counter() - t0)
+    print(f"Streaming (neue Bar + peek):   {_timings(samples)}")
+
+
+def bench_kernel(args):
+    """Batch-Features fürs Training: pandas_ta-Pfad vs. NumPy-Kernel (Bars/s)."""
+    _enter_sandbox()
+    from infrastructure import AIEngine
+    from features import FEATURE_LIST, compute_feature_matrix
+
+    df = _synthetic_frame("EURUSD", fake_mt5.TIMEFRAME_M1, args.bars)
+    cols = [df[c].values for c in ('open', 'high', 'low', 'close', 'tick_volume')]
+    print(f"\n=== KERNEL: {args.bars:,} Bars ===")
+
+    t0 = time.perf_counter()
+    ref = AIEngine().feature_engineering(df)[FEATURE_LIST].values
+    base = time.perf_counter() - t0
+    print(f"feature_engineering (pandas_ta): {base:7.2f} s | {args.bars / base:12,.0f} Bars/s")
+
+    for dtype in (np.float64, np.float32):
+        t0 = time.perf_counter()
+        out = compute_feature_matrix(*cols, dtype=dtype)
+        took = time.perf_counter() - t0
+        diff = np.abs(out - ref).max(axis=0)
+        worst = FEATURE_LIST[int(diff.argmax())]
+        print(f"compute_feature_matrix {np.dtype(dtype).name:<8}: {took:7.2f} s | {args.bars / took:12,.0f} Bars/s "
+              f"| x{base / took:.1f} | max|diff| {diff.max():.2e} ({worst})")
+
+
+def bench_forest(args):
+    """Kompilierter Forest vs. sklearn predict_proba: Bitgleichheit und Latenz."""
+    _enter_sandbox()
+    from sklearn.ensemble import RandomForestClassifier
+    from features import compute_feature_matrix
+    from forest_compiler import CompiledForest
+
+    df = _synthetic_frame("EURUSD", fake_mt5.TIMEFRAME_M5, args.rows + 48)
+    X = compute_feature_matrix(*(df[c].values for c in ('open', 'high', 'low', 'close', 'tick_volume')))
+    fwd = df['close'].shift(-48).values - df['close'].values
+    atr = X[:, 11]
+    y = np.where(fwd > atr, 1, np.where(fwd < -atr, 2, 0))[:args.rows]
+    X = X[:args.rows]
+
+    t0 = time.perf_counter()
+    model = RandomForestClassifier(n_estimators=args.trees, random_state=42, n_jobs=-1).fit(X, y)
+    model.n_jobs = 1
+    print(f"\n=== FOREST: {args.trees} Bäume, {args.rows} Zeilen (Training {time.perf_counter() - t0:.1f} s) ===")
+    t0 = time.perf_counter()
+    forest = CompiledForest.compile(model)
+    print(f"Kompiliert in {(time.perf_counter() - t0) * 1000:.0f} ms | {forest.nbytes / 1024 / 1024:.1f} MB | Tiefe {forest.max_depth}")
+
+    # Neue Zeilen (nicht im Training) + die Trainingszeilen selbst
+    rng = np.random.default_rng(7)
+    probe = np.vstack([X[rng.integers(0, len(X), 500)], X[:500] * rng.normal(1, 0.05, (500, X.shape[1]))])
+    same_batch = np.array_equal(model.predict_proba(probe), forest.predict_proba(probe))
+    same_rows = all(np.array_equal(model.predict_proba(r[None]), forest.predict_proba(r[None])) for r in probe[:50])
+    print(f"Bitgleich: Batch {'ja' if same_batch else 'NEIN'} | Einzelzeilen {'ja' if same_rows else 'NEIN'}")
+
+    for name, fn in (("sklearn", model.predict_proba), ("compiled", forest.predict_proba)):
+        samples = []
+        for r in probe[:args.samples]:
+            t0 = time.perf_counter()
+            fn(r[None])
+            samples.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        fn(probe)
+        batch = time.perf_counter() - t0
+        print(f"{name:<9} 1 Zeile: {_timings(samples)} | Batch {len(probe)}: {batch * 1000:.1f} ms")
+    sys.exit(0 if same_batch and same_rows else 1)
+
+
+def _iterrows_outcome(df, start_idx, side, lookahead=48):
+    """Referenz: das frühere StrategyAITrainer.simulate_outcome (iterrows pro Signal)."""
+    subset = df.iloc[start_idx + 1: start_idx + lookahead + 1]
+    if subset.empty: return 0
+    entry, atr = df['close'].iloc[start_idx], df['atr'].iloc[start_idx]
+    tp = entry + (atr * 2.5) if side == "LONG" else entry - (atr * 2.5)
+    sl = entry - (atr * 1.5) if side == "LONG" else entry + (atr * 1.5)
+    for _, row in subset.iterrows():
+        if side == "LONG":
+            if row['high'] >= tp: return 1
+            if row['low'] <= sl: return 2
+        else:
+            if row['low'] <= tp: return 1
+            if row['high'] >= sl: return 2
+    return 0
+
+
+def bench_labels(args):
+    """Vektorisierte Triple-Barrier-Labels vs. iterrows-Referenz."""
+    from features import FEATURE_LIST, compute_feature_matrix
+    from labels import triple_barrier_labels
+
+    df = _synthetic_frame("EURUSD", fake_mt5.TIMEFRAME_M5, args.bars)
+    df['atr'] = compute_feature_matrix(*(df[c].values for c in ('open', 'high', 'low', 'close', 'tick_volume')))[
+        :, FEATURE_LIST.index('atr')]
+    rng = np.random.default_rng(11)
+    idx = np.sort(rng.choice(len(df), args.signals, replace=False))
+    sides = rng.choice(["LONG", "SHORT"], args.signals)
+    h, l, c, a = (df[k].values for k in ('high', 'low', 'close', 'atr'))
+
+    t0 = time.perf_counter()
+    ref = np.array([_iterrows_outcome(df, i, s) for i, s in zip(idx, sides)])
+    base = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    out = triple_barrier_labels(h, l, c, a, idx, sides)[0]
+    took = time.perf_counter() - t0
+    grid = [(tp, sl, hz) for tp in (1.5, 2.0, 2.5, 3.0) for sl in (1.0, 1.5) for hz in (24, 48, 96)]
+    t0 = time.perf_counter()
+    triple_barrier_labels(h, l, c, a, idx, sides, barriers=grid)
+    took_grid = time.perf_counter() - t0
+
+    same = np.array_equal(ref, out)
+    print(f"\n=== LABELS: {args.signals} Signale auf {args.bars} Bars ===")
+    print(f"iterrows:    {base * 1000:9.1f} ms")
+    print(f"vektorisiert:{took * 1000:9.1f} ms | x{base / took:.0f} | identisch: {'ja' if same else 'NEIN'} "
+          f"| TP/SL/Timeout {np.bincount(out, minlength=3)[[1, 2, 0]].tolist()}")
+    print(f"{len(grid)} Konfigurationen in einem Durchlauf: {took_grid * 1000:.1f} ms")
+    sys.exit(0 if same else 1)
+
+
+def bench_profile(args):
+    """Signal-Scan des Trainers: check_entry_signal pro Fenster vs. scan_entry_signals."""
+    _enter_sandbox()
+    from infrastructure import VolumeProfileEngine
+    from advanced_engine import AdvancedMarketEngine
+
+    df = _synthetic_frame("EURUSD", fake_mt5.TIMEFRAME_M5, args.bars)
+    engine, vp = AdvancedMarketEngine(None, None), VolumeProfileEngine()
+    lookback = args.lookback
+    candidates = np.arange(lookback + 50, len(df) - 50)
+
+    t0 = time.perf_counter()
+    directions, strategies = engine.scan_entry_signals(df, lookback, candidates)
+    took = time.perf_counter() - t0
+
+    check = candidates[np.linspace(0, len(candidates) - 1, min(args.check, len(candidates))).astype(int)]
+    pos = {i: k for k, i in enumerate(candidates)}
+    t0 = time.perf_counter()
+    ref = [engine.check_entry_signal("EURUSD", df.iloc[i - lookback:i + 1], vp) for i in check]
+    per_bar = (time.perf_counter() - t0) / len(check)
+    same = all(ref[k] == (directions[pos[i]], strategies[pos[i]]) for k, i in enumerate(check))
+
+    print(f"\n=== PROFILE-SCAN: {len(candidates):,} Fenster (Lookback {lookback}) ===")
+    print(f"check_entry_signal pro Fenster: {per_bar * 1000:.2f} ms -> hochgerechnet {per_bar * len(candidates):.1f} s")
+    print(f"scan_entry_signals:             {took:.2f} s | x{per_bar * len(candidates) / took:.0f} "
+          f"| {sum(d is not None for d in directions)} Signale")
+    print(f"Stichprobe {len(check)} Fenster identisch: {'ja' if same else 'NEIN'}")
+    sys.exit(0 if same else 1)
+
+
+def _iterrows_lva(vp, current_price, direction):
+    """Bisherige find_nearest_lva (Filter, Sortierung, iterrows) als Referenz."""
+    threshold = vp.profile_data['vol'].mean() * 0.40
+    if direction == "DOWN":
+        cands = vp.profile_data[vp.profile_data['price'] < current_price].sort_values(by='price', ascending=False)
+    else:
+        cands = vp.profile_data[vp.profile_data['price'] > current_price].sort_values(by='price', ascending=True)
+    for _, r in cands.iterrows():
+        if r['vol'] < threshold: return r['price']
+    return None
+
+
+def bench_lva(args):
+    """find_nearest_lva: iterrows-Referenz vs. searchsorted-Index (einzeln und als Batch)."""
+    _enter_sandbox()
+    from infrastructure import VolumeProfileEngine
+
+    df = _synthetic_frame("EURUSD", fake_mt5.TIMEFRAME_M5, args.bars)
+    vp = VolumeProfileEngine()
+    ref_t, new_t, batch_t, queries, same = 0.0, 0.0, 0.0, 0, True
+    for end in np.linspace(100, len(df), args.profiles).astype(int):
+        vp.calculate_enhanced_profile(df.iloc[:end])
+        lo, hi = vp.profile_prices[0], vp.profile_prices[-1]
+        prices = np.concatenate([np.linspace(lo - (hi - lo) * 0.1, hi + (hi - lo) * 0.1, args.prices),
+                                 vp.profile_prices])
+        for direction in ("DOWN", "UP"):
+            t0 = time.perf_counter()
+            ref = [_iterrows_lva(vp, p, direction) for p in prices]
+            ref_t += time.perf_counter() - t0
+            t0 = time.perf_counter()
+            new = [vp.find_nearest_lva(df, p, direction) for p in prices]
+            new_t += time.perf_counter() - t0
+            t0 = time.perf_counter()
+            batch = vp.nearest_lva_batch(prices, direction)
+            batch_t += time.perf_counter() - t0
+            queries += len(prices)
+            same &= ref == new
+            same &= all((r is None and np.isnan(b)) or r == b for r, b in zip(ref, batch))
+
+    print(f"\n=== LVA-LOOKUP: {args.profiles} Profile, {queries:,} Abfragen ===")
+    print(f"iterrows (bisher):     {ref_t / queries * 1e6:8.1f} µs/Abfrage")
+    print(f"find_nearest_lva:      {new_t / queries * 1e6:8.1f} µs/Abfrage | x{ref_t / new_t:.0f}")
+    print(f"nearest_lva_batch:     {batch_t / queries * 1e6:8.2f} µs/Preis    | x{ref_t / batch_t:.0f}")
+    print(f"Identisch: {'ja' if same else 'NEIN'}")
+    sys.exit(0 if same else 1)
+
+
+def bench_anchors(args):
+    """Pivot & VWAP: inkrementell pro Symbol vs. Scan über den ganzen Frame (Gleichheit, Kosten pro Bar)."""
+    _enter_sandbox()
+    import pandas as pd
+    from infrastructure import VolumeProfileEngine
+
+    rates = fake_mt5.configure(history_bars=args.bars, future_bars=0).rates("EURUSD", fake_mt5.TIMEFRAME_M5)
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df = df.rename(columns={'tick_volume': 'volume'}).set_index('time')
+    vp = VolumeProfileEngine()
+
+    inc_t, scan_t, again_t, steps, same = 0.0, 0.0, 0.0, 0, True
+    for end in range(args.frame, len(df) + 1):
+        frame = df.iloc[end - args.frame:end]   # Wie CandleCache.get_frame: letzte Kerze läuft noch
+        t0 = time.perf_counter()
+        inc = (vp.find_last_pivot(frame, "EURUSD"), vp.calculate_vwap(frame, "EURUSD"),
+               vp.calculate_vwap(frame, "EURUSD", anchor="pivot"))
+        inc_t += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ref = (vp.find_last_pivot(frame), vp.calculate_vwap(frame), vp.calculate_vwap(frame, anchor="pivot"))
+        scan_t += time.perf_counter() - t0
+        same &= inc == ref
+        steps += 1
+        # Weitere Abfrage innerhalb derselben Kerze (z.B. zweites Signal im Durchlauf)
+        t0 = time.perf_counter()
+        vp.find_last_pivot(frame, "EURUSD"), vp.calculate_vwap(frame, "EURUSD")
+        again_t += time.perf_counter() - t0
+
+    tracker = vp.anchors["EURUSD"]
+    print(f"\n=== ANCHORS: {steps:,} neue Kerzen, Frame {args.frame} Kerzen ===")
+    print(f"Scan über den Frame:  {scan_t / steps * 1e6:8.1f} µs/Kerze")
+    print(f"Inkrementell:         {inc_t / steps * 1e6:8.1f} µs/Kerze | x{scan_t / inc_t:.1f} | Resets {tracker.resets}")
+    print(f"Ohne neue Kerze:      {again_t / steps * 1e6:8.1f} µs (Pivot + Session-VWAP)")
+    print(f"Pivot & VWAP identisch: {'ja' if same else 'NEIN'}")
+    sys.exit(0 if same else 1)
+
+
+def bench_ticks(args):
+    """Tick-Profil: Kosten pro Tick (Sync aller Symbole, reines Histogramm-Update) und Speicher."""
+    _enter_sandbox()
+    from settings import cfg
+    from tick_profile import TickProfileBook, DecayingHistogram
+    from volume_profile import histogram_levels
+
+    fake_mt5.configure(history_bars=args.minutes + 600, future_bars=args.minutes + 1)
+    fake_mt5.advance(0)
+    book = TickProfileBook(fake_mt5, cfg.TICK_PROFILE_BINS, cfg.TICK_PROFILE_POINTS,
+                           cfg.TICK_PROFILE_HALFLIFE, cfg.TICK_PROFILE_WARMUP)
+    t0 = time.perf_counter()
+    for symbol in cfg.SYMBOLS: book.sync(symbol)
+    warmup, warm_ticks = time.perf_counter() - t0, book.stats["ticks"]
+
+    sync_t, level_t = 0.0, 0.0
+    for _ in range(args.minutes):
+        fake_mt5.advance(60)
+        t0 = time.perf_counter()
+        for symbol in cfg.SYMBOLS: book.sync(symbol)
+        sync_t += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for symbol in cfg.SYMBOLS: histogram_levels(*book.profile(symbol, sync=False))
+        level_t += time.perf_counter() - t0
+    live_ticks = book.stats["ticks"] - warm_ticks
+    syncs = args.minutes * len(cfg.SYMBOLS)
+
+    # Reines Update ohne Terminal: Einzelticks und Blöcke
+    rng = np.random.default_rng(1)
+    prices = 1.1 + np.cumsum(rng.normal(0, 0.00002, args.ticks))
+    times = np.arange(args.ticks) * 0.25
+    hist = DecayingHistogram(cfg.TICK_PROFILE_BINS, 0.0001, cfg.TICK_PROFILE_HALFLIFE)
+    t0 = time.perf_counter()
+    for i in range(min(args.ticks, 20000)): hist.add(times[i:i + 1], prices[i:i + 1])
+    single = (time.perf_counter() - t0) / min(args.ticks, 20000)
+    hist = DecayingHistogram(cfg.TICK_PROFILE_BINS, 0.0001, cfg.TICK_PROFILE_HALFLIFE)
+    t0 = time.perf_counter()
+    for i in range(0, args.ticks, 256): hist.add(times[i:i + 256], prices[i:i + 256])
+    batched = (time.perf_counter() - t0) / args.ticks
+
+    print(f"\n=== TICK-PROFIL: {len(cfg.SYMBOLS)} Symbole, {args.minutes} Minuten ===")
+    print(f"Erstes Laden:        {warmup * 1000:.0f} ms | {warm_ticks:,} Ticks ({cfg.TICK_PROFILE_WARMUP / 3600:.0f} h)")
+    print(f"Sync pro Symbol:     {sync_t / syncs * 1e6:.1f} µs | {live_ticks / syncs:.1f} neue Ticks | "
+          f"{sync_t / max(live_ticks, 1) * 1e6:.1f} µs/Tick inkl. Terminal-Abruf")
+    print(f"POC/VA pro Symbol:   {level_t / syncs * 1e6:.1f} µs")
+    print(f"Histogramm-Update:   {single * 1e6:.2f} µs/Tick einzeln | {batched * 1e6:.3f} µs/Tick in 256er-Blöcken")
+    print(f"Speicher:            {book.nbytes / 1024:.0f} KB für {len(cfg.SYMBOLS)} Symbole "
+          f"({cfg.TICK_PROFILE_BINS} Bins à 8 Byte pro Symbol)")
+
+
+def bench_bars(args):
+    """Bar-Store: Erstaufbau vs. Schwanz-Sync vs. kompletter Abruf vom Terminal."""
+    _enter_sandbox()
+    from bar_store import BarStore
+
+    fake_mt5.configure(history_bars=args.bars + 1, future_bars=args.steps * 12 + 1)
+    fake_mt5.advance(0)
+    tf = fake_mt5.TIMEFRAME_M5
+    store = BarStore(fake_mt5, "bar_store", history=args.bars)
+
+    t0 = time.perf_counter()
+    store.sync("EURUSD", tf)
+    cold = time.perf_counter() - t0
+    cold_fetched = store.stats["bars_fetched"]
+
+    syncs, fetched = [], store.stats["bars_fetched"]
+    for _ in range(args.steps):
+        fake_mt5.advance(3600)   # 12 neue M5-Kerzen
+        t0 = time.perf_counter()
+        store.bars("EURUSD", tf, args.bars)
+        syncs.append(time.perf_counter() - t0)
+    tail_fetched = (store.stats["bars_fetched"] - fetched) / args.steps
+
+    t0 = time.perf_counter()
+    full = fake_mt5.copy_rates_from_pos("EURUSD", tf, 0, args.bars + 1)
+    direct = time.perf_counter() - t0
+    view = store.bars("EURUSD", tf, args.bars, sync=False)
+    same = np.array_equal(np.asarray(view), full[:-1].astype(view.dtype))
+
+    print(f"\n=== BAR-STORE: {args.bars:,} M5-Kerzen, {args.steps} Syncs à 12 neue Kerzen ===")
+    print(f"Erstaufbau:               {cold * 1000:.1f} ms | {cold_fetched:,} Kerzen vom Terminal")
+    print(f"Sync + View:              {_timings(syncs)} | {tail_fetched:.0f} Kerzen vom Terminal")
+    print(f"copy_rates_from_pos:      {direct * 1000:.1f} ms | {len(full):,} Kerzen vom Terminal")
+    print(f"View ohne Kopie (memmap): {'ja' if isinstance(view, np.memmap) else 'NEIN'} | "
+          f"Datei {os.path.getsize(store.path('EURUSD', tf)) / 1024 / 1024:.1f} MB")
+    print(f"Identisch mit dem Terminal: {'ja' if same else 'NEIN'}")
+    sys.exit(0 if same else 1)
+
+
+LEGACY_VARIANTS = [("Scalp_Sniper", 1.0, 1.5), ("Day_Standard", 1.5, 3.0), ("Swing_Runner", 2.5, 6.0),
+                   ("Tight_Guard", 0.8, 2.0), ("Loose_Risk", 2.0, 4.0)]
+
+
+def _legacy_shadows(i, status="OPEN"):
+    """Die 5 Zeilen eines Spawns wie bisher in shadow_trades.json."""
+    return [{"id": f"EURUSD_{i}_{name}", "symbol": "EURUSD", "side": "LONG", "entry": 1.1,
+             "sl": 1.1 - 0.001 * sl_m, "tp": 1.1 + 0.001 * tp_m, "status": status,
+             "start_time": "2024-01-01T00:00:00", "strategy_variant": name,
+             "features": {f"f{k}": float(k) for k in range(20)}} for name, sl_m, tp_m in LEGACY_VARIANTS]
+
+
+def bench_shadows(args):
+    """Shadow-Trades: komplette JSON-Datei neu schreiben (bisher, 5 Varianten) vs. ShadowStore (Raster)."""
+    _enter_sandbox()
+    import json
+    from settings import cfg
+    from shadow_store import ShadowStore
+    from shadow_book import variant_grid
+
+    history = [s for i in range(args.history) for s in _legacy_shadows(i, "WIN" if i % 2 else "LOSS")]
+    with open("shadow_trades.json", "w") as f: json.dump(history, f, indent=4, default=str)
+    t0 = time.perf_counter()
+    store = ShadowStore("shadow_trades.db", legacy_json="shadow_trades.json")   # übernimmt die JSON-Datei
+    migrate = time.perf_counter() - t0
+    grid = variant_grid(cfg.SHADOW_SL_MULTS, cfg.SHADOW_TP_MULTS, cfg.SHADOW_BREAKEVEN, cfg.SHADOW_TRAIL)
+    gid = store.add_grid(grid)
+    n = len(grid["sl_m"])
+    shadows = list(history)
+    size_before = os.path.getsize("shadow_trades.db")
+
+    json_t, store_t = [], []
+    for step in range(args.steps):
+        # Bisher: Spawn und Ergebnis schreiben jeweils die ganze Datei
+        t0 = time.perf_counter()
+        shadows.extend(_legacy_shadows(args.history + step))
+        with open("legacy.json", "w") as f: json.dump(shadows, f, indent=4, default=str)
+        for s in shadows[-5:]: s["status"] = "WIN"
+        with open("legacy.json", "w") as f: json.dump(shadows, f, indent=4, default=str)
+        json_t.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        entry = {"id": f"EURUSD_{step}", "symbol": "EURUSD", "side": "LONG", "entry": 1.1, "atr": 0.001,
+                 "entry_time": 0, "grid_id": gid, "features": shadows[-1]["features"]}
+        store.add_entries([entry])
+        entry["outcomes"][:] = 1
+        entry["status"] = "DONE"
+        store.update_entries([entry])
+        store_t.append(time.perf_counter() - t0)
+    per_entry = (os.path.getsize("shadow_trades.db") - size_before) / args.steps
+
+    t0 = time.perf_counter()
+    with open("legacy.json") as f: pending = [s for s in json.load(f) if s["status"] == "OPEN"]
+    json_open = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    open_now = store.load_open()
+    store_open = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    closed, _ = store.closed_since(store.get_cursor("bench"))
+    feed = time.perf_counter() - t0
+    same = len(pending) == len(open_now) == 0 and len(closed) == args.history + args.steps
+
+    print(f"\n=== SHADOW-TRADES: {args.history:,} Einstiege in der Historie, {args.steps} Zyklen (Spawn + Ergebnis) ===")
+    print(f"JSON neu schreiben (bisher, 5 Varianten): {_timings(json_t)} | Datei {os.path.getsize('legacy.json') / 1024 / 1024:.1f} MB")
+    print(f"ShadowStore ({n} Varianten):            {_timings(store_t)} | ~{per_entry / 1024:.1f} KB pro Einstieg")
+    print(f"Offene laden:                JSON {json_open * 1000:.1f} ms | Store {store_open * 1000:.2f} ms")
+    print(f"Übernahme der JSON-Datei:    {migrate * 1000:.0f} ms (einmalig)")
+    print(f"feed_shadows (ab Cursor 0):  {feed * 1000:.0f} ms für {len(closed):,} abgeschlossene Einstiege")
+    print(f"Vollständig: {'ja' if same else 'NEIN'}")
+    sys.exit(0 if same else 1)
+
+
+def _legacy_outcome(trade, bid, ask):
+    if trade["side"] == "LONG":
+        if bid <= trade["sl"]: return "LOSS"
+        if bid >= trade["tp"]: return "WIN"
+    else:
+        if ask >= trade["sl"]: return "LOSS"
+        if ask <= trade["tp"]: return "WIN"
+    return None
+
+
+def _legacy_shadow_outcomes(shadows, mt5h):
+    """Bisherige Schleife aus update_shadow_trades: ein Tick-Abruf und Vergleich pro Shadow."""
+    out = {}
+    for trade in shadows:
+        tick = mt5h.get_tick(trade["symbol"])
+        if not tick: continue
+        outcome = _legacy_outcome(trade, tick.bid, tick.ask)
+        if outcome: out[trade["key"]] = outcome
+    return out
+
+
+def _bench_entries(rng, symbols, per_symbol, mt5h, seq):
+    """Zufällige Einstiege (Seite, Entry = Bid) mit ATR ~ 5 Pips je Symbol."""
+    entries = []
+    for symbol in symbols:
+        tick = mt5h.get_tick(symbol)
+        for _ in range(per_symbol):
+            entries.append({"seq": seq, "id": f"{symbol}_{seq}", "symbol": symbol,
+                            "side": "LONG" if rng.random() < 0.5 else "SHORT", "entry": tick.bid,
+                            "atr": tick.bid * 0.0005, "entry_time": int(tick.time)})
+            seq += 1
+    return entries, seq
+
+
+def _book_with(entries, grid, **kwargs):
+    from shadow_book import ShadowBook
+    book = ShadowBook(**kwargs)
+    n = len(grid["sl_m"])
+    for e in entries:
+        book.add(dict(e, grid_id="bench", outcomes=np.zeros(n, dtype=np.int8), exits=np.zeros(n, dtype=np.float32)), grid)
+    return book
+
+
+def _expand_legacy(entries, grid):
+    """Einstiege als einzelne Shadows mit SL/TP wie im bisherigen spawn_shadow_trades."""
+    out = []
+    for e in entries:
+        for v, (sl_m, tp_m) in enumerate(zip(grid["sl_m"], grid["tp_m"])):
+            sign = 1 if e["side"] == "LONG" else -1
+            out.append({"key": (e["seq"], v), "symbol": e["symbol"], "side": e["side"],
+                        "sl": e["entry"] - sign * e["atr"] * sl_m, "tp": e["entry"] + sign * e["atr"] * tp_m})
+    return out
+
+
+def _book_pass(book, symbols, mt5h, bars_for=None, collect=True):
+    """Ein Durchlauf wie update_shadow_trades; collect=True liefert {(seq, Variante): Ergebnis} zum Vergleich."""
+    from shadow_book import TP
+    out = {}
+    for symbol in book.symbols():
+        tick = mt5h.get_tick(symbol)
+        bars = bars_for(book, symbol, tick) if bars_for else None
+        changed = book.evaluate(symbol, tick.bid, tick.ask, tick.time, bars)
+        for e in changed if collect else ():
+            for v in np.flatnonzero(e["outcomes"]).tolist():
+                out[(e["seq"], v)] = "WIN" if e["outcomes"][v] == TP else "LOSS"
+    return out
+
+
+def bench_shadow_eval(args):
+    """Offene Shadows: ShadowBook (5 bzw. Raster-Varianten) vs. Schleife pro Shadow; M1-Nachprüfung nach einer Pause."""
+    _enter_sandbox()
+    from mt5_handler import MT5Handler
+    from settings import cfg
+    from shadow_book import variant_grid
+
+    rng = np.random.default_rng(7)
+    fake_mt5.configure(history_bars=1000, future_bars=args.passes + args.gap + 200)
+    fake_mt5.advance(0)
+    mt5h = MT5Handler()
+    symbols = cfg.SYMBOLS
+    mt5h.refresh_snapshot(symbols)
+    legacy_grid = {"sl_m": [v[1] for v in LEGACY_VARIANTS], "tp_m": [v[2] for v in LEGACY_VARIANTS],
+                   "be_m": [None] * 5, "trail_m": [None] * 5}
+    grid = variant_grid(cfg.SHADOW_SL_MULTS, cfg.SHADOW_TP_MULTS, cfg.SHADOW_BREAKEVEN, cfg.SHADOW_TRAIL)
+
+    # 1. Tick-Prüfung: 5 Varianten wie bisher (Ergebnisse identisch) und das volle Raster
+    entries, seq = _bench_entries(rng, symbols, args.entries, mt5h, 0)
+    legacy = _expand_legacy(entries, legacy_grid)
+    book5, book_grid = _book_with(entries, legacy_grid), _book_with(entries, grid)
+    legacy_t, book5_t, grid_t, ref_all, new_all = [], [], [], {}, {}
+    calls = {"legacy": [], "book5": [], "grid": []}   # Tick-Abrufe pro Durchlauf (bisher: einer pro Shadow)
+    for i in range(args.passes):
+        fake_mt5.advance(args.step)
+        mt5h.refresh_snapshot(symbols)
+        calls["legacy"].append(len(legacy))
+        calls["book5"].append(len(book5.symbols()))
+        calls["grid"].append(len(book_grid.symbols()))
+        t0 = time.perf_counter()
+        ref = _legacy_shadow_outcomes(legacy, mt5h)
+        legacy_t.append(time.perf_counter() - t0)
+        legacy = [s for s in legacy if s["key"] not in ref]
+        t0 = time.perf_counter()
+        new = _book_pass(book5, symbols, mt5h)
+        book5_t.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        _book_pass(book_grid, symbols, mt5h, collect=False)
+        grid_t.append(time.perf_counter() - t0)
+        ref_all.update({k: (i, o) for k, o in ref.items()})
+        for k, o in new.items(): new_all.setdefault(k, (i, o))   # Einstiege melden alle entschiedenen Varianten
+    same, resolved = ref_all == new_all, len(ref_all)
+
+    # 2. Pause ohne Prüfung: M1-Nachprüfung vs. nur aktueller Tick vs. kompletter Tick-Pfad (5 Varianten)
+    fake_mt5.advance(60 - fake_mt5.terminal().now % 60 + 7)   # Einstiege mitten in einer Kerze
+    mt5h.refresh_snapshot(symbols)
+    gap_entries, seq = _bench_entries(rng, symbols, args.entries, mt5h, seq)
+    with_bars, tick_only = _book_with(gap_entries, legacy_grid), _book_with(gap_entries, legacy_grid)
+    grid_bars = _book_with(gap_entries, grid)
+    fake_mt5.advance(args.gap * 60)
+    mt5h.refresh_snapshot(symbols)
+
+    def m1(book, symbol, tick):
+        count = book.catchup_bars(symbol, tick.time)
+        return mt5h.candles.get_rates(symbol, fake_mt5.TIMEFRAME_M1, count) if count else None
+
+    t0 = time.perf_counter()
+    caught = _book_pass(with_bars, symbols, mt5h, m1)
+    catchup_t = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _book_pass(grid_bars, symbols, mt5h, m1, collect=False)
+    grid_catchup_t = time.perf_counter() - t0
+    ticked = _book_pass(tick_only, symbols, mt5h)
+    agree, reference_hits, gap_legacy = 0, 0, _expand_legacy(gap_entries, legacy_grid)
+    for s in gap_legacy:
+        # Referenz: alle Ticks ab der ersten vollen Kerze nach dem Einstieg, bisherige Regel pro Tick
+        e = gap_entries[s["key"][0] - gap_entries[0]["seq"]]
+        start = -(-e["entry_time"] // 60) * 60
+        path = fake_mt5.copy_ticks_range(s["symbol"], start, fake_mt5.terminal().now, fake_mt5.COPY_TICKS_ALL)
+        ref = next((o for o in (_legacy_outcome(s, t['bid'], t['ask']) for t in path) if o), None)
+        reference_hits += ref is not None
+        agree += ref == caught.get(s["key"])
+
+    def vs_legacy(samples):
+        ratio = np.mean(samples) / np.mean(legacy_t)
+        return f"x{ratio:.2f} der bisherigen Schleife ({'langsamer' if ratio > 1 else 'schneller'})"
+
+    def break_even(samples, book_calls):
+        """Terminal-Latenz pro Tick-Abruf, ab der ein Tick pro Symbol die Mehrkosten der Auswertung aufwiegt."""
+        extra = np.mean(samples) - np.mean(legacy_t)
+        saved = np.mean(calls["legacy"]) - np.mean(book_calls)
+        if extra <= 0: return "schon ohne Latenz günstiger"
+        if saved <= 0: return "keine eingesparten Abrufe"
+        return f"günstiger ab {extra / saved * 1e6:.2f} µs pro Abruf"
+
+    n_entries, n_grid = len(entries), len(grid["sl_m"])
+    print(f"\n=== SHADOW-AUSWERTUNG: {n_entries} offene Einstiege auf {len(symbols)} Symbolen, {args.passes} Durchläufe ===")
+    print(f"Schleife pro Shadow (bisher, 5 Varianten): {_timings(legacy_t)}")
+    print(f"ShadowBook, 5 Varianten:                   {_timings(book5_t)} | {vs_legacy(book5_t)}")
+    print(f"ShadowBook, {n_grid} Varianten:                {_timings(grid_t)} | "
+          f"{n_entries * n_grid:,} Varianten, {vs_legacy(grid_t)}")
+    print(f"Ergebnisse: {resolved} | Identisch mit der bisherigen Schleife: {'ja' if same else 'NEIN'}")
+    # Zeiten oben ohne Terminal-Latenz (Ticks aus dem Snapshot); bisher kostete jeder Shadow einen symbol_info_tick()
+    print(f"Tick-Abrufe pro Durchlauf: bisher Ø {np.mean(calls['legacy']):.0f} (einer pro Shadow), "
+          f"ShadowBook Ø {np.mean(calls['book5']):.1f} (einer pro Symbol)")
+    print(f"Break-even Terminal-Latenz:  5 Varianten {break_even(book5_t, calls['book5'])} | "
+          f"{n_grid} Varianten {break_even(grid_t, calls['grid'])}")
+    print(f"\nPause von {args.gap} Minuten ohne Prüfung, {len(gap_legacy)} neue Shadows (5 Varianten):")
+    print(f"Nur aktueller Tick:           {len(ticked)} Ergebnisse")
+    print(f"Mit M1-Nachprüfung:           {len(caught)} Ergebnisse in {catchup_t * 1000:.1f} ms "
+          f"| {n_grid} Varianten: {grid_catchup_t * 1000:.1f} ms")
+    print(f"Tick-Pfad (Referenz):         {reference_hits} Ergebnisse | "
+          f"Übereinstimmung {agree / len(gap_legacy) * 100:.1f}% (Rest: SL und TP in derselben Kerze, Spread)")
+    sys.exit(0 if same else 1)
+
+
+def _legacy_mfe_update(trade_stats, positions, mt5h):
+    """Bisheriger Tracker: ein Tick pro Position, JSON bei jeder Änderung, Historie komplett neu schreiben."""
+    import json
+    changed, writes = False, 0
+    current = [str(p.ticket) for p in positions]
+    for pos in positions:
+        ticket = str(pos.ticket)
+        tick = mt5h.get_tick(pos.symbol)
+        if not tick: continue
+        price = tick.bid if pos.type == 0 else tick.ask
+        if ticket not in trade_stats:
+            trade_stats[ticket] = {"symbol": pos.symbol, "max_profit_pips": 0.0, "max_drawdown_pips": 0.0,
+                                   "entry": pos.price_open, "type": "BUY" if pos.type == 0 else "SELL"}
+        stats = trade_stats[ticket]
+        point = mt5h.symbols.get_static(pos.symbol).point
+        diff = (price - stats["entry"]) / point if stats["type"] == "BUY" else (stats["entry"] - price) / point
+        if diff > stats["max_profit_pips"]: stats["max_profit_pips"] = diff; changed = True
+        if diff < stats["max_drawdown_pips"]: stats["max_drawdown_pips"] = diff; changed = True
+    archive = {t: trade_stats.pop(t) for t in [t for t in trade_stats if t not in current]}
+    if changed or archive:
+        with open("trade_perf_stats.json", "w") as f: json.dump(trade_stats, f, indent=4, default=str)
+        writes += 1
+    if archive:
+        with open("trade_history_stats.json", "r") as f: existing = json.load(f)
+        existing = (existing + list(archive.values()))[-500:]
+        with open("trade_history_stats.json", "w") as f: json.dump(existing, f, indent=4)
+        writes += 1
+    return archive, writes
+
+
+def _reference_mfe(stats, opened, until, point):
+    """MFE/MAE über alle Ticks von der Eröffnung bis `until` (Buy zum Bid, Sell zum Ask)."""
+    ticks = fake_mt5.copy_ticks_range(stats["symbol"], opened, until, fake_mt5.COPY_TICKS_ALL)
+    if stats["type"] == "BUY": diff = (ticks['bid'] - stats["entry"]) / point
+    else: diff = (stats["entry"] - ticks['ask']) / point
+    return max(diff.max(), 0.0), min(diff.min(), 0.0)
+
+
+def _mfe_errors(results, opened, until, mt5h):
+    """(Anteil exakt, Ø Abweichung MFE, Ø Abweichung MAE) in Points gegenüber dem Tick-Pfad."""
+    exact, mfe_err, mae_err = 0, [], []
+    for ticket, stats in results.items():
+        point = mt5h.symbols.get_static(stats["symbol"]).point
+        mfe, mae = _reference_mfe(stats, opened[ticket], until.get(ticket, fake_mt5.terminal().now), point)
+        mfe_err.append(mfe - stats["max_profit_pips"])
+        mae_err.append(stats["max_drawdown_pips"] - mae)
+        exact += abs(mfe_err[-1]) < 1e-6 and abs(mae_err[-1]) < 1e-6
+    return exact / max(len(results), 1), np.mean(mfe_err), np.mean(mae_err)
+
+
+def bench_mfe(args):
+    """MFE/MAE: Tracker im Speicher (alle Ticks, SQLite) vs. bisher (ein Tick pro Durchlauf, JSON)."""
+    _enter_sandbox()
+    import json
+    from mt5_handler import MT5Handler
+    from settings import cfg
+    from trade_stats import TradeStatsStore, MfeMaeTracker
+
+    fake_mt5.configure(history_bars=1000, future_bars=(args.passes * args.step + args.gap * 60) // 60 + 200)
+    fake_mt5.advance(0)
+    mt5h = MT5Handler()
+    symbols = cfg.SYMBOLS[:args.positions]
+    history = [{"symbol": "EURUSD", "max_profit_pips": 10.0, "max_drawdown_pips": -5.0, "entry": 1.1, "type": "BUY"}] * 500
+    with open("trade_history_stats.json", "w") as f: json.dump(history, f, indent=4)
+    store = TradeStatsStore("trade_stats.db", legacy_active=None, legacy_history=None)
+    tracker = MfeMaeTracker(mt5h, store, cfg.MFE_CHECKPOINT_SECONDS, cfg.MFE_TICK_WINDOW, cfg.CANDLE_CACHE_SIZE)
+
+    def open_trade(i):
+        res = fake_mt5.order_send({"action": fake_mt5.TRADE_ACTION_DEAL, "symbol": symbols[i % len(symbols)],
+                                   "volume": 0.1, "type": i % 2})
+        return str(res.order), fake_mt5.terminal().now
+
+    opened = dict(open_trade(i) for i in range(args.positions))
+    closed_at, legacy_state, legacy_closed, tracker_closed = {}, {}, {}, {}
+    legacy_t, tracker_t, legacy_writes = [], [], 0
+    for i in range(args.passes):
+        fake_mt5.advance(args.step)
+        mt5h.refresh_snapshot(symbols)
+        positions = mt5h.snapshot.positions
+        t0 = time.perf_counter()
+        archive, writes = _legacy_mfe_update(legacy_state, positions, mt5h)
+        legacy_t.append(time.perf_counter() - t0)
+        legacy_closed.update(archive)
+        legacy_writes += writes
+        t0 = time.perf_counter()
+        tracker_closed.update(tracker.update(positions))
+        tracker_t.append(time.perf_counter() - t0)
+        if i % args.rotate == args.rotate - 1:
+            # Älteste Position schließen (gleicher Tick wie die letzte Prüfung), neue eröffnen
+            pos = min(positions, key=lambda p: p.ticket)
+            fake_mt5.order_send({"action": fake_mt5.TRADE_ACTION_DEAL, "symbol": pos.symbol, "volume": pos.volume,
+                                 "type": 1 - pos.type, "position": pos.ticket})
+            closed_at[str(pos.ticket)] = fake_mt5.terminal().now
+            opened.update([open_trade(i)])
+    legacy_acc = _mfe_errors({**legacy_closed, **legacy_state}, opened, closed_at, mt5h)
+    tracker_acc = _mfe_errors({**tracker_closed, **tracker.stats}, opened, closed_at, mt5h)
+
+    # Neustart nach einer Pause: Checkpoint laden, Lücke aus Ticks bzw. (erzwungen) aus M1-Kerzen
+    tracker.checkpoint()
+    fake_mt5.advance(args.gap * 60)
+    mt5h.refresh_snapshot(symbols)
+    positions = mt5h.snapshot.positions
+    restarts = {}
+    for name, window in (("Ticks", cfg.MFE_TICK_WINDOW), ("M1", 0)):
+        restarted = MfeMaeTracker(mt5h, TradeStatsStore("trade_stats.db", legacy_active=None, legacy_history=None),
+                                  cfg.MFE_CHECKPOINT_SECONDS, window, cfg.CANDLE_CACHE_SIZE)
+        t0 = time.perf_counter()
+        restarted.update(positions)
+        restarts[name] = (time.perf_counter() - t0, _mfe_errors(restarted.stats, opened, {}, mt5h))
+
+    print(f"\n=== MFE/MAE: {args.positions} offene Positionen, {args.passes} Durchläufe à {args.step} s, "
+          f"{len(closed_at)} geschlossen ===")
+    print(f"Bisher (1 Tick, JSON):   {_timings(legacy_t)} | {legacy_writes} Dateischreibvorgänge "
+          f"(Historie: 500 Einträge pro Schließung neu geschrieben)")
+    print(f"MfeMaeTracker:           {_timings(tracker_t)} | {store.count()} Einträge in trade_history")
+    for name, (exact, mfe_err, mae_err) in (("Bisher", legacy_acc), ("MfeMaeTracker", tracker_acc)):
+        print(f"{name + ':':<24} exakt {exact * 100:.0f}% | MFE Ø {mfe_err:.1f} Points zu niedrig | "
+              f"MAE Ø {mae_err:.1f} Points zu flach")
+    for name, (took, (exact, mfe_err, mae_err)) in restarts.items():
+        print(f"Neustart nach {args.gap} min ({name}): {took * 1000:.1f} ms | exakt {exact * 100:.0f}% | "
+              f"MFE Ø {mfe_err:.1f} / MAE Ø {mae_err:.1f} Points")
+    sys.exit(0 if tracker_acc[0] == 1.0 and restarts["Ticks"][1][0] == 1.0 else 1)
+
+
+def _synthetic_exits(rng, n, grid):
+    """Ergebnisse/Ausstiege (ATR) aller Varianten aus zufälligem MFE/MAE und Reihenfolge (ohne BE/Trailing)."""
+    from shadow_book import TP, STOP, EXPIRED
+    sl, tp = np.asarray(grid["sl_m"]), np.asarray(grid["tp_m"])
+    mfe, mae = rng.exponential(2.0, n), rng.exponential(1.6, n)
+    stop_first, last = rng.random(n) < 0.5, rng.normal(0, 0.5, n)
+    tp_hit, sl_hit = mfe[:, None] >= tp, mae[:, None] >= sl
+    stopped = sl_hit & (~tp_hit | stop_first[:, None])
+    outcomes = np.where(stopped, STOP, np.where(tp_hit, TP, EXPIRED)).astype(np.int8)
+    exits = np.where(stopped, -sl, np.where(tp_hit, tp, last[:, None])).astype(np.float32)
+    return outcomes, exits
+
+
+def bench_exit_opt(args):
+    """Exit-Optimierer: alle Varianten pro Symbol/Setup aus der Shadow-Historie + SL/TP-Fläche der Trades."""
+    _enter_sandbox()
+    from settings import cfg
+    from shadow_store import ShadowStore
+    from shadow_book import variant_grid
+    from trade_stats import TradeStatsStore
+    import exit_optimizer
+
+    rng = np.random.default_rng(3)
+    store = ShadowStore("shadow_trades.db", legacy_json=None)
+    grid = variant_grid(cfg.SHADOW_SL_MULTS, cfg.SHADOW_TP_MULTS, cfg.SHADOW_BREAKEVEN, cfg.SHADOW_TRAIL)
+    gid = store.add_grid(grid)
+    setups = ["VAH_Break_Smart", "VAL_Rej_Smart", "VAH_Rej_Smart", "POC_Bounce_Smart"]
+    symbols = cfg.SYMBOLS[:args.symbols]
+    for symbol in symbols:
+        for setup in setups:
+            outcomes, exits = _synthetic_exits(rng, args.entries, grid)
+            store.add_entries([{"symbol": symbol, "side": "LONG", "setup": setup, "entry": 1.0, "atr": 0.001,
+                                "grid_id": gid, "outcomes": o, "exits": x, "status": "DONE"}
+                               for o, x in zip(outcomes, exits)])
+    stats = TradeStatsStore("trade_stats.db", legacy_active=None, legacy_history=None)
+    mfe, mae = rng.exponential(150, args.trades), -rng.exponential(120, args.trades)
+    stats.archive({str(i): {"symbol": symbols[i % len(symbols)], "type": "BUY", "entry": 1.0,
+                            "max_profit_pips": mfe[i], "max_drawdown_pips": mae[i]} for i in range(args.trades)})
+
+    t0 = time.perf_counter()
+    sums = exit_optimizer.shadow_sums(store)
+    load = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    params = exit_optimizer.best_shadow_params(store, sums, cfg.EXIT_OPT_MIN_SAMPLES)
+    search = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    trades = exit_optimizer.best_trade_params(stats.history(args.trades), {}, cfg.EXIT_OPT_MIN_SAMPLES)
+    trade_t = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    report = exit_optimizer.optimize(store, stats)
+    path = exit_optimizer.write_params(report)
+    total = time.perf_counter() - t0
+
+    # Referenz: Erwartungswert pro Variante in einer Schleife über die Einstiege (ein Symbol, alle Setups)
+    n = len(grid["sl_m"])
+    t0 = time.perf_counter()
+    ref_sum, count = [0.0] * n, 0
+    for rows in store.iter_done():
+        for r in rows:
+            if r["symbol"] != symbols[0]: continue
+            count += 1
+            exits = np.frombuffer(r["exits"], dtype=np.float32).tolist()
+            for v in range(n): ref_sum[v] += exits[v]
+    ref_r = np.array([ref_sum[v] / count / grid["sl_m"][v] for v in range(n)])
+    loop_t = time.perf_counter() - t0
+    mean_r = exit_optimizer.expectancy(grid, sums[(symbols[0], exit_optimizer.ALL, gid)])[0]
+    same = np.allclose(mean_r, ref_r, rtol=1e-6, atol=1e-9)
+    groups = sum(len(v) for v in params.values())
+    best = params[symbols[0]][exit_optimizer.ALL]
+
+    print(f"\n=== EXIT-OPTIMIERER: {len(symbols)} Symbole x {len(setups)} Setups x {args.entries} Einstiege, "
+          f"{n} Varianten ===")
+    print(f"Shadow-Historie laden + summieren: {load * 1000:.0f} ms | {len(symbols) * len(setups) * args.entries:,} Einstiege")
+    print(f"Suche ({groups} Gruppen inkl. '*'):  {search * 1000:.1f} ms | {groups * n:,} Kombinationen "
+          f"({groups * n / max(load + search, 1e-9) / 1e6:.2f} Mio./s inkl. Laden)")
+    print(f"Trade-Historie ({args.trades:,} Trades):  {trade_t * 1000:.1f} ms | "
+          f"{sum(len(v) for v in trades.values())} Gruppen à bis zu 40x40 SL/TP-Stufen")
+    print(f"optimize() + Datei schreiben:      {total * 1000:.0f} ms -> {path}")
+    print(f"Schleife pro Einstieg ({symbols[0]}):    {loop_t * 1000:.0f} ms für {count} Einstiege")
+    print(f"{symbols[0]} '*': SL {best['sl_m']} / TP {best['tp_m']} ATR, BE {best['be_m']}, Trail {best['trail_m']} "
+          f"| {best['expectancy_r']:+.3f} R")
+    print(f"Erwartungswerte identisch mit der Schleife: {'ja' if same else 'NEIN'}")
+    sys.exit(0 if same else 1)
+
+
+LEGACY_JOURNAL_SCHEMA = """
+    CREATE TABLE trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT, side TEXT, qty REAL, price REAL,
+        setup TEXT, features TEXT, result REAL DEFAULT 0,
+        status TEXT DEFAULT 'OPEN', ticket_id INTEGER DEFAULT 0,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )"""
+JOURNAL_SETUPS = [("VAH_Break_Smart", "LONG"), ("VAL_Rej_Smart", "LONG"), ("VAH_Rej_Smart", "SHORT"),
+                  ("POC_Bounce_Smart", "LONG"), ("POC_Bounce_Smart", "SHORT")]
+JOURNAL_KEYS = ["VAH_Break", "VAL_Rej", "VAH_Rej", "POC_Bounce_Long", "POC_Bounce_Short"]
+
+
+def _legacy_journal_pass(conn, symbols):
+    """Bisherige Abfragen pro Symbol und Durchlauf (Cooldown + has_traded_today je Setup)."""
+    out = {}
+    for symbol in symbols:
+        row = conn.execute("SELECT timestamp FROM trades WHERE symbol=? ORDER BY timestamp DESC LIMIT 1", (symbol,)).fetchone()
+        out[symbol] = row[0] if row else None
+        for key in JOURNAL_KEYS:
+            out[symbol, key] = conn.execute("SELECT count(*) FROM trades WHERE symbol=? AND setup LIKE ? AND "
+                                            "date(timestamp) = date('now')", (symbol, f"%{key}%")).fetchone()[0] > 0
+    return out
+
+
+def _indexed_journal_pass(conn, symbols):
+    """Gleiche Fragen als Abfragen über die Indizes (setup_norm, trade_date)."""
+    from infrastructure import split_setup_key
+    out = {}
+    for symbol in symbols:
+        row = conn.execute("SELECT timestamp FROM trades WHERE symbol=? ORDER BY timestamp DESC LIMIT 1", (symbol,)).fetchone()
+        out[symbol] = row[0] if row else None
+        for key in JOURNAL_KEYS:
+            setup, side = split_setup_key(key)
+            out[symbol, key] = conn.execute("SELECT 1 FROM trades WHERE symbol=? AND trade_date=date('now') AND setup_norm=? "
+                                            "AND side=? LIMIT 1" if side else
+                                            "SELECT 1 FROM trades WHERE symbol=? AND trade_date=date('now') AND setup_norm=? LIMIT 1",
+                                            (symbol, setup, side) if side else (symbol, setup)).fetchone() is not None
+    return out
+
+
+def bench_journal(args):
+    """Trade-Journal: 1M Trades, bisherige Abfragen (Full Scan) vs. Indizes vs. TradeIndex im Speicher."""
+    _enter_sandbox()
+    import sqlite3
+    from settings import cfg
+
+    rng = np.random.default_rng(11)
+    symbols = cfg.SYMBOLS
+    now = np.datetime64(int(time.time()), 's')
+    # Zeitstempel (UTC wie CURRENT_TIMESTAMP) über 3 Jahre, die letzten Trades von heute
+    stamps = np.sort(now - rng.integers(0, 3 * 365 * 86400, args.rows).astype('timedelta64[s]'))
+    stamps[-args.today:] = now - rng.integers(0, 3600, args.today).astype('timedelta64[s]')
+    stamps = np.char.replace(stamps.astype(str), "T", " ")
+    sym_idx = rng.integers(0, len(symbols), args.rows)
+    setup_idx = rng.integers(0, len(JOURNAL_SETUPS), args.rows)
+    conn = sqlite3.connect(cfg.DB_NAME)
+    conn.execute(LEGACY_JOURNAL_SCHEMA)
+    t0 = time.perf_counter()
+    with conn:
+        conn.executemany("INSERT INTO trades (symbol, side, qty, price, setup, features, status, ticket_id, timestamp) "
+                         "VALUES (?, ?, 0.1, 1.0, ?, '{}', 'CLOSED', ?, ?)",
+                         ((symbols[s], JOURNAL_SETUPS[k][1], JOURNAL_SETUPS[k][0], i + 1, str(t))
+                          for i, (s, k, t) in enumerate(zip(sym_idx.tolist(), setup_idx.tolist(), stamps))))
+    build = time.perf_counter() - t0
+
+    legacy_t = []
+    for _ in range(args.passes):
+        t0 = time.perf_counter()
+        legacy = _legacy_journal_pass(conn, symbols)
+        legacy_t.append(time.perf_counter() - t0)
+    legacy_insert = []
+    for i in range(args.inserts):
+        t0 = time.perf_counter()
+        conn.execute("INSERT INTO trades (symbol, side, qty, price, setup, features, status, ticket_id) "
+                     "VALUES ('XAUUSD', 'LONG', 0.1, 1.0, 'VAH_Break_Smart', '{}', 'CLOSED', 0)")
+        conn.commit()
+        legacy_insert.append(time.perf_counter() - t0)
+    conn.execute("DELETE FROM trades WHERE symbol = 'XAUUSD'")
+    conn.commit()
+    conn.close()
+
+    from infrastructure import DatabaseHandler
+    t0 = time.perf_counter()
+    db = DatabaseHandler()
+    migrate = time.perf_counter() - t0
+
+    sql_t, index_t = [], []
+    for _ in range(args.passes):
+        t0 = time.perf_counter()
+        new = _indexed_journal_pass(db.conn, symbols)
+        sql_t.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        cached = {}
+        for symbol in symbols:
+            cached[symbol] = db.get_minutes_since_last_trade(symbol)
+            for key in JOURNAL_KEYS: cached[symbol, key] = db.has_traded_today(symbol, key)
+        index_t.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    db.index.load(db.conn)
+    index_load = time.perf_counter() - t0
+    new_insert = []
+    for i in range(args.inserts):
+        t0 = time.perf_counter()
+        db.log_trade("XAUUSD", "LONG", 0.1, 1.0, "VAH_Break_Smart")
+        new_insert.append(time.perf_counter() - t0)
+
+    # Gleiche Antworten; POC_Bounce_Long/Short passten mit LIKE nie auf 'POC_Bounce_Smart' -> Referenz mit Richtung
+    mismatches = 0
+    for symbol in symbols:
+        mismatches += legacy[symbol] != new[symbol]
+        last = db.index.last_trade.get(symbol)
+        mismatches += new[symbol] != (time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(last)) if last is not None else None)
+        mismatches += abs(cached[symbol] - db.get_minutes_since_last_trade(symbol)) > 1
+        for key in JOURNAL_KEYS:
+            expected = legacy[symbol, key]
+            if key.startswith("POC_Bounce"):
+                expected = db.conn.execute("SELECT count(*) FROM trades WHERE symbol=? AND setup LIKE '%POC_Bounce%' AND side=? "
+                                           "AND date(timestamp) = date('now') AND symbol != 'XAUUSD'",
+                                           (symbol, key.rsplit("_", 1)[1].upper())).fetchone()[0] > 0
+            mismatches += (expected != new[symbol, key]) + (expected != cached[symbol, key])
+    plans = [db.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()[-1][-1] for sql, params in (
+        ("SELECT 1 FROM trades WHERE symbol=? AND trade_date=date('now') AND setup_norm=? AND side=? LIMIT 1", ("EURUSD", "POC_Bounce", "LONG")),
+        ("SELECT timestamp FROM trades WHERE symbol=? ORDER BY timestamp DESC LIMIT 1", ("EURUSD",)),
+        ("SELECT id FROM trades WHERE status='OPEN'", ()))]
+    journal = db.conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    print(f"\n=== TRADE-JOURNAL: {args.rows:,} Trades, {len(symbols)} Symbole x (Cooldown + {len(JOURNAL_KEYS)} Setups) pro Durchlauf ===")
+    print(f"Aufbau (altes Schema):     {build:.1f} s")
+    print(f"Bisher (Full Scans):       {_timings(legacy_t)} pro Durchlauf | Insert {_timings(legacy_insert)}")
+    print(f"Migration (einmalig):      {migrate:.1f} s | journal_mode={journal}")
+    print(f"Indizes + setup_norm:      {_timings(sql_t)} pro Durchlauf | Insert {_timings(new_insert)}")
+    print(f"TradeIndex (Speicher):     {_timings(index_t)} pro Durchlauf | Laden beim Start {index_load * 1000:.0f} ms")
+    print(f"Faktor:                    Indizes x{np.mean(legacy_t) / np.mean(sql_t):.0f} | "
+          f"TradeIndex x{np.mean(sql_t) / np.mean(index_t):.0f} gegenüber den Indizes")
+    for plan in plans: print(f"Plan: {plan}")
+    print(f"Antworten identisch: {'ja' if mismatches == 0 else f'NEIN ({mismatches})'}")
+    sys.exit(0 if mismatches == 0 else 1)
+
+
+def _persist_run(workdir, writer, args):
+    """Schreiblast des Bots über args.passes Durchläufe; Rückgabe: Zeit im Loop pro Durchlauf."""
+    import json
+    from features import FEATURE_LIST
+    from infrastructure import DatabaseHandler, AIEngine
+    from settings import cfg
+    from shadow_book import variant_grid
+    from shadow_store import ShadowStore
+    from trade_stats import TradeStatsStore
+
+    os.makedirs(workdir)
+    os.chdir(workdir)
+    db = DatabaseHandler(writer)
+    ai = AIEngine(writer)
+    store = ShadowStore(cfg.SHADOW_DB, legacy_json=None)
+    stats = TradeStatsStore(cfg.TRADE_STATS_DB, None, None)
+    store.writer = stats.writer = writer
+    grid = variant_grid(cfg.SHADOW_SL_MULTS, cfg.SHADOW_TP_MULTS, cfg.SHADOW_BREAKEVEN, cfg.SHADOW_TRAIL)
+    gid = store.add_grid(grid)
+    n = len(grid["sl_m"])
+
+    rng = np.random.default_rng(5)
+    symbols = cfg.SYMBOLS
+    open_entries, open_trades, times = [], {}, []
+    for i in range(args.passes):
+        t0 = time.perf_counter()
+        for k in range(args.trades):
+            symbol = symbols[int(rng.integers(len(symbols)))]
+            features = {f: float(rng.random()) for f in FEATURE_LIST}
+            ticket = i * args.trades + k + 1
+            db.log_trade(symbol, "LONG", 0.1, 1.0, "VAH_Break_Smart", features, ticket)
+            ai.save_experience(symbol, features, int(rng.integers(2)))
+            open_trades[str(ticket)] = {"symbol": symbol, "type": "BUY", "entry": 1.0,
+                                        "max_profit_pips": float(rng.random() * 50), "max_drawdown_pips": -float(rng.random() * 50)}
+        entries = [{"id": f"{symbols[j % len(symbols)]}_{i}", "symbol": symbols[j % len(symbols)], "side": "LONG",
+                    "setup": "VAH_Break_Smart", "entry": 1.0, "atr": 0.001, "entry_time": i, "grid_id": gid,
+                    "features": {"rsi": float(rng.random())}} for j in range(args.shadows)]
+        store.add_entries(entries)
+        open_entries.extend(entries)
+        for e in open_entries:
+            e["outcomes"] = rng.integers(-1, 2, n).astype(np.int8)
+            e["exits"] = rng.random(n).astype(np.float32)
+            e["status"] = "DONE" if rng.random() < 0.1 else "OPEN"
+        store.update_entries(open_entries)
+        open_entries = [e for e in open_entries if e["status"] == "OPEN"]
+        closed = {t: open_trades.pop(t) for t in list(open_trades)[:args.trades]}
+        stats.archive(closed, closed_at=float(i))
+        stats.checkpoint(open_trades)
+        monitor = {"equity": 10000.0 + i, "open_trades": len(open_trades), "last_update": i}
+        if writer is not None:
+            writer.write_json("monitor.json", monitor)
+        else:
+            with open("monitor.json", "w") as f: json.dump(monitor, f)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def _persist_contents(workdir):
+    """Inhalt aller Dateien ohne Zeitstempel/ids, die von der Uhr abhängen."""
+    import sqlite3
+    from settings import cfg
+    out = {}
+    with open(os.path.join(workdir, "ai_models", "smart_memory.csv")) as f: out["csv"] = f.read()
+    with open(os.path.join(workdir, "monitor.json")) as f: out["monitor"] = f.read()
+    for db, sql in ((cfg.DB_NAME, "SELECT symbol, side, setup, features, ticket_id, setup_norm, trade_date FROM trades ORDER BY id"),
+                    (cfg.SHADOW_DB, "SELECT seq, symbol, outcomes, exits, status, closed_seq FROM entries ORDER BY seq"),
+                    (cfg.TRADE_STATS_DB, "SELECT ticket, max_profit_pips, closed_at FROM trade_history ORDER BY id"),
+                    (cfg.TRADE_STATS_DB, "SELECT * FROM open_trades ORDER BY ticket")):
+        conn = sqlite3.connect(os.path.join(workdir, db))
+        out[sql] = conn.execute(sql).fetchall()
+        conn.close()
+    return out
+
+
+def bench_persist(args):
+    """Schreibpfade im Loop: sofort (eigener Commit/open() pro Aufruf) vs. Schreib-Thread (Group Commit)."""
+    sandbox = _enter_sandbox()
+    from persistence import WriteBehind
+
+    sync_t = _persist_run(os.path.join(sandbox, "sync"), None, args)
+    writer = WriteBehind(args.flush, args.queue)
+    queued_t = _persist_run(os.path.join(sandbox, "queued"), writer, args)
+    depth = writer.depth
+    t0 = time.perf_counter()
+    writer.close()
+    close = time.perf_counter() - t0
+    os.chdir(sandbox)
+
+    same = _persist_contents(os.path.join(sandbox, "sync")) == _persist_contents(os.path.join(sandbox, "queued"))
+    s = writer.stats
+    print(f"\n=== PERSISTENZ: {args.passes} Durchläufe à {args.trades} Trades (+ CSV), {args.shadows} Shadow-Einstiege, "
+          f"Shadow-Updates, MFE-Checkpoint, monitor.json ===")
+    print(f"Sofort im Loop:            {_timings(sync_t)} pro Durchlauf")
+    print(f"Schreib-Thread:            {_timings(queued_t)} pro Durchlauf | Faktor x{np.mean(sync_t) / np.mean(queued_t):.0f}")
+    print(f"Queue:                     max {s['max_depth']} Aufträge (Limit {args.queue}) | {depth} beim Beenden offen")
+    print(f"Flush:                     {s['flushes']} Flushes, {s['commits']} Commits für {s['jobs']} Aufträge | "
+          f"max {s['max_flush_ms']:.1f} ms | Latenz bis geschrieben max {s['max_latency_ms']:.0f} ms")
+    print(f"close() beim Beenden:      {close * 1000:.1f} ms")
+    print(f"Inhalte identisch: {'ja' if same else 'NEIN'}")
+    sys.exit(0 if same else 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline-Benchmarks (Fake-Terminal)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("loop", help="Durchsatz & Terminal-Calls eines Scan-Durchlaufs")
+    p.add_argument("--passes", type=int, default=20)
+    p.add_argument("--latency", type=float, default=0.0, help="Sekunden pro Terminal-Call")
+    p.add_argument("--step", type=int, default=5, help="Simulierte Sekunden zwischen Durchläufen")
+    p.add_argument("--models", default=None, help="Ordner mit *_model.pkl (relativ zum Repo)")
+    p.set_defaults(func=bench_loop)
+
+    p = sub.add_parser("parity", help="Inkrementelle Features vs. pandas_ta (Exit-Code 1 bei Abweichung)")
+    p.add_argument("--symbols", nargs="+", default=["EURUSD", "USDJPY"])
+    p.add_argument("--bars", type=int, default=3000)
+    p.add_argument("--warmup", type=int, default=100, help="Bars ohne Vergleich (bfill in der Warmup-Phase)")
+    p.add_argument("--rtol", type=float, default=1e-6)
+    p.add_argument("--atol", type=float, default=1e-9)
+    p.set_defaults(func=bench_parity)
+
+    p = sub.add_parser("features", help="Kosten der Live-Features pro Bar")
+    p.add_argument("--bars", type=int, default=500)
+    p.set_defaults(func=bench_features)
+
+    p = sub.add_parser("kernel", help="Batch-Feature-Kernel vs. pandas_ta (Bars/s)")
+    p.add_argument("--bars", type=int, default=1_000_000)
+    p.set_defaults(func=bench_kernel)
+
+    p = sub.add_parser("forest", help="Kompilierter Forest vs. sklearn (Bitgleichheit, Latenz)")
+    p.add_argument("--trees", type=int, default=1000)
+    p.add_argument("--rows", type=int, default=5000)
+    p.add_argument("--samples", type=int, default=50, help="Einzelzeilen-Messungen")
+    p.set_defaults(func=bench_forest)
+
+    p = sub.add_parser("labels", help="Triple-Barrier-Labels vs. iterrows-Referenz")
+    p.add_argument("--bars", type=int, default=50000)
+    p.add_argument("--signals", type=int, default=3000)
+    p.set_defaults(func=bench_labels)
+
+    p = sub.add_parser("profile", help="Rolling Volume Profile / Signal-Scan vs. pro Fenster")
+    p.add_argument("--bars", type=int, default=50000)
+    p.add_argument("--lookback", type=int, default=200)
+    p.add_argument("--check", type=int, default=2000, help="Fenster, die mit check_entry_signal verglichen werden")
+    p.set_defaults(func=bench_profile)
+
+    p = sub.add_parser("lva", help="LVA-Lookup: searchsorted-Index vs. iterrows")
+    p.add_argument("--bars", type=int, default=5000)
+    p.add_argument("--profiles", type=int, default=50)
+    p.add_argument("--prices", type=int, default=50, help="Abfragepreise pro Profil (zusätzlich alle Bin-Preise)")
+    p.set_defaults(func=bench_lva)
+
+    p = sub.add_parser("anchors", help="Pivot & VWAP: inkrementell vs. Scan über den Frame")
+    p.add_argument("--bars", type=int, default=5000)
+    p.add_argument("--frame", type=int, default=500)
+    p.set_defaults(func=bench_anchors)
+
+    p = sub.add_parser("ticks", help="Tick-Profil: Update-Kosten pro Tick über alle Symbole")
+    p.add_argument("--minutes", type=int, default=120, help="Simulierte Minuten nach dem ersten Laden")
+    p.add_argument("--ticks", type=int, default=200000, help="Ticks für das reine Histogramm-Update")
+    p.set_defaults(func=bench_ticks)
+
+    p = sub.add_parser("bars", help="Bar-Store: Schwanz-Sync & memmap-Views vs. kompletter Abruf")
+    p.add_argument("--bars", type=int, default=50000)
+    p.add_argument("--steps", type=int, default=20)
+    p.set_defaults(func=bench_bars)
+
+    p = sub.add_parser("shadows", help="Shadow-Trades: SQLite-Store vs. JSON-Datei neu schreiben")
+    p.add_argument("--history", type=int, default=4000, help="Abgeschlossene Einstiege in der Historie")
+    p.add_argument("--steps", type=int, default=50)
+    p.set_defaults(func=bench_shadows)
+
+    p = sub.add_parser("shadoweval", help="Offene Shadows: Varianten-Raster + M1-Nachprüfung vs. Schleife")
+    p.add_argument("--entries", type=int, default=8, help="Offene Einstiege pro Symbol")
+    p.add_argument("--passes", type=int, default=200)
+    p.add_argument("--step", type=int, default=5, help="Simulierte Sekunden zwischen Durchläufen")
+    p.add_argument("--gap", type=int, default=30, help="Minuten ohne Prüfung für die Nachprüfung")
+    p.set_defaults(func=bench_shadow_eval)
+
+    p = sub.add_parser("mfe", help="MFE/MAE: alle Ticks seit der letzten Prüfung + SQLite vs. ein Tick + JSON")
+    p.add_argument("--positions", type=int, default=12)
+    p.add_argument("--passes", type=int, default=360)
+    p.add_argument("--step", type=int, default=20, help="Simulierte Sekunden zwischen Durchläufen")
+    p.add_argument("--rotate", type=int, default=10, help="Alle N Durchläufe eine Position schließen und neu eröffnen")
+    p.add_argument("--gap", type=int, default=30, help="Minuten Pause vor dem Neustart")
+    p.set_defaults(func=bench_mfe)
+
+    p = sub.add_parser("exitopt", help="Exit-Optimierer: Varianten-Raster pro Symbol/Setup aus der Shadow-Historie")
+    p.add_argument("--symbols", type=int, default=24)
+    p.add_argument("--entries", type=int, default=50, help="Abgeschlossene Einstiege pro Symbol und Setup")
+    p.add_argument("--trades", type=int, default=5000, help="Geschlossene Trades in der MFE/MAE-Historie")
+    p.set_defaults(func=bench_exit_opt)
+
+    p = sub.add_parser("journal", help="Trade-Journal: Indizes + WAL vs. Full Scans (altes Schema wird migriert)")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--today", type=int, default=200, help="Davon Trades von heute")
+    p.add_argument("--passes", type=int, default=3)
+    p.add_argument("--inserts", type=int, default=50)
+    p.set_defaults(func=bench_journal)
+
+    p = sub.add_parser("persist", help="Schreib-Thread (Group Commit, gepufferte Dateien) vs. Schreiben im Loop")
+    p.add_argument("--passes", type=int, default=200)
+    p.add_argument("--trades", type=int, default=2, help="Trades (+ smart_memory.csv) pro Durchlauf")
+    p.add_argument("--shadows", type=int, default=4, help="Neue Shadow-Einstiege pro Durchlauf")
+    p.add_argument("--flush", type=float, default=1.0, help="Flush-Intervall in Sekunden")
+    p.add_argument("--queue", type=int, default=10000)
+    p.set_defaults(func=bench_persist)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
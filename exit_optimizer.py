@@ -0,0 +1,222 @@
+# exit_optimizer.py
+"""
+Exit-Optimierer: beste SL/TP/Breakeven/Trailing-Kombination pro Symbol und Setup.
+- Shadow-Historie: jeder abgeschlossene Einstieg enthält den Ausstieg (in ATR) aller Varianten seines
+  Rasters. Die Blobs werden blockweise als (Einstiege x Varianten)-Matrix gelesen und pro
+  (Symbol, Setup, Raster) aufsummiert -> Erwartungswert jeder Variante in R (Ausstieg / SL-Abstand)
+- Trade-Historie (MFE/MAE der echten Trades): SL/TP-Fläche in Points über die Quantile von MAE/MFE,
+  als Matrixprodukt statt Schleife über Trades
+Ergebnis: EXIT_PARAMS_FILE (JSON), wird vom Live-Loop bei Änderung neu geladen.
+
+    python exit_optimizer.py
+    python exit_optimizer.py --surface EURUSD --setup VAH_Break_Smart
+"""
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+import numpy as np
+from infrastructure import log
+from settings import cfg
+from shadow_book import TP
+
+ALL = "*"   # Alle Setups eines Symbols zusammen
+
+
+class _Sums:
+    """Summen pro Variante eines Rasters: Einstiege, TP-Treffer, Summe und Quadratsumme der Ausstiege (ATR)."""
+    def __init__(self, n):
+        self.count = 0
+        self.wins = np.zeros(n)
+        self.total = np.zeros(n)
+        self.squares = np.zeros(n)
+
+    def add(self, outcomes, exits):
+        self.count += len(exits)
+        self.wins += (outcomes == TP).sum(axis=0)
+        self.total += exits.sum(axis=0)
+        self.squares += np.square(exits).sum(axis=0)
+
+
+def shadow_sums(store, chunk=2000):
+    """{(Symbol, Setup, Raster-ID): _Sums} über alle abgeschlossenen Einstiege; jeder zählt auch unter ALL."""
+    sums = {}
+    for rows in store.iter_done(chunk):
+        groups = {}
+        for r in rows:
+            groups.setdefault((r["symbol"], r["setup"], r["grid_id"]), []).append(r)
+        for (symbol, setup, gid), group in groups.items():
+            n = len(store.grid(gid)["sl_m"])
+            outcomes = np.frombuffer(b"".join(r["outcomes"] for r in group), dtype=np.int8).reshape(-1, n)
+            exits = np.frombuffer(b"".join(r["exits"] for r in group), dtype=np.float32).reshape(-1, n)
+            exits = exits.astype(np.float64)
+            for key in ((symbol, ALL, gid),) + (((symbol, setup, gid),) if setup else ()):
+                if key not in sums: sums[key] = _Sums(n)
+                sums[key].add(outcomes, exits)
+    return sums
+
+
+def expectancy(grid, sums):
+    """(Erwartungswert in R, Standardfehler in R, Ø Ausstieg in ATR, Trefferquote TP) pro Variante."""
+    sl = np.asarray(grid["sl_m"], dtype=np.float64)
+    mean = sums.total / sums.count
+    var = np.maximum(sums.squares / sums.count - mean ** 2, 0.0)
+    return mean / sl, np.sqrt(var / sums.count) / sl, mean, sums.wins / sums.count
+
+
+def surface(grid, values):
+    """SL x TP-Matrix (bester Wert über Breakeven/Trailing) -> (SL-Stufen, TP-Stufen, Matrix)."""
+    sl_levels, sl_idx = np.unique(np.asarray(grid["sl_m"], dtype=np.float64), return_inverse=True)
+    tp_levels, tp_idx = np.unique(np.asarray(grid["tp_m"], dtype=np.float64), return_inverse=True)
+    out = np.full((len(sl_levels), len(tp_levels)), -np.inf)
+    np.maximum.at(out, (sl_idx, tp_idx), values)
+    return sl_levels, tp_levels, out
+
+
+def best_shadow_params(store, sums, min_samples=30, z=1.0):
+    """
+    Pro (Symbol, Setup) die Variante mit dem höchsten Erwartungswert abzüglich z Standardfehlern
+    (bei wenigen Einstiegen gewinnt sonst der Zufall). Gruppen unter min_samples werden übersprungen.
+    'plain' ist die beste Variante ohne Breakeven/Trailing: nur sie darf der Live-Loop übernehmen,
+    da echte Trades diese Regeln aus dem Raster nicht anwenden.
+    """
+    params = {}
+    for (symbol, setup, gid), s in sums.items():
+        if s.count < min_samples: continue
+        grid = store.grid(gid)
+        mean_r, se_r, mean_atr, win_rate = expectancy(grid, s)
+        score = mean_r - z * se_r
+        v = int(np.argmax(score))
+        best = params.get(symbol, {}).get(setup)
+        if best is not None and best["score"] >= score[v]: continue
+        entry = {
+            "sl_m": grid["sl_m"][v], "tp_m": grid["tp_m"][v], "be_m": grid["be_m"][v], "trail_m": grid["trail_m"][v],
+            "expectancy_r": round(float(mean_r[v]), 4), "expectancy_atr": round(float(mean_atr[v]), 4),
+            "win_rate": round(float(win_rate[v]), 4), "score": round(float(score[v]), 4),
+            "samples": s.count, "variants": len(score), "grid_id": gid}
+        plain = np.flatnonzero([b is None and t is None for b, t in zip(grid["be_m"], grid["trail_m"])])
+        if len(plain):
+            p = int(plain[np.argmax(score[plain])])
+            entry["plain"] = {"sl_m": grid["sl_m"][p], "tp_m": grid["tp_m"][p],
+                              "expectancy_r": round(float(mean_r[p]), 4), "win_rate": round(float(win_rate[p]), 4),
+                              "score": round(float(score[p]), 4)}
+        params.setdefault(symbol, {})[setup] = entry
+    return params
+
+
+def trade_surface(mfe, mae, levels=40):
+    """
+    SL/TP-Fläche in Points aus MFE/MAE geschlossener Trades (Stufen = Quantile von |MAE| bzw. MFE).
+    Pro Trade: SL erreicht -> -SL (auch wenn der TP ebenfalls erreicht wurde, die Reihenfolge ist
+    unbekannt), sonst TP erreicht -> +TP, sonst 0. Rückgabe: (SL-Stufen, TP-Stufen, Ø Ergebnis in Points).
+    """
+    q = np.linspace(0.05, 1.0, levels)
+    sl = np.unique(np.quantile(-mae, q))
+    tp = np.unique(np.quantile(mfe, q))
+    sl, tp = sl[sl > 0], tp[tp > 0]
+    survived = (-mae[:, None] < sl[None, :]).astype(np.float64)   # (Trades, SL): SL nicht erreicht
+    reached = (mfe[:, None] >= tp[None, :]).astype(np.float64)     # (Trades, TP): TP erreicht
+    n = len(mfe)
+    # Anteil "SL nicht erreicht und TP erreicht" für alle Paare in einem Matrixprodukt
+    wins = survived.T @ reached / n
+    stopped = 1.0 - survived.mean(axis=0)
+    return sl, tp, wins * tp[None, :] - stopped[:, None] * sl[:, None]
+
+
+def _trade_setups(db_path):
+    """{Ticket: Setup} aus der Trade-Datenbank des Bots (leer, wenn es sie nicht gibt)."""
+    if not db_path or not os.path.exists(db_path): return {}
+    conn = sqlite3.connect(db_path)
+    try:
+        return {str(t): s for t, s in conn.execute("SELECT ticket_id, setup FROM trades WHERE ticket_id != 0")}
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+
+def best_trade_params(history, setups, min_samples=30, levels=40):
+    """Pro (Symbol, Setup) das beste SL/TP-Paar in Points aus der Trade-Historie."""
+    groups = {}
+    for t in history:
+        keys = [(t["symbol"], ALL)]
+        setup = setups.get(str(t.get("ticket")))
+        if setup: keys.append((t["symbol"], setup))
+        for key in keys: groups.setdefault(key, []).append((t["max_profit_pips"], t["max_drawdown_pips"]))
+
+    params = {}
+    for (symbol, setup), values in groups.items():
+        if len(values) < min_samples: continue
+        mfe, mae = np.asarray(values, dtype=np.float64).T
+        sl, tp, result = trade_surface(mfe, mae, levels)
+        if result.size == 0: continue
+        i, j = np.unravel_index(np.argmax(result / sl[:, None]), result.shape)
+        params.setdefault(symbol, {})[setup] = {
+            "sl_points": round(float(sl[i]), 1), "tp_points": round(float(tp[j]), 1),
+            "expectancy_points": round(float(result[i, j]), 2), "expectancy_r": round(float(result[i, j] / sl[i]), 4),
+            "samples": len(values)}
+    return params
+
+
+def optimize(shadow_store, stats_store=None, db_path=None, min_samples=None):
+    """Shadow- und Trade-Historie auswerten. Rückgabe: Inhalt für EXIT_PARAMS_FILE."""
+    min_samples = cfg.EXIT_OPT_MIN_SAMPLES if min_samples is None else min_samples
+    sums = shadow_sums(shadow_store)
+    report = {"created": datetime.now().isoformat(),
+              "shadow_entries": sum(s.count for (_, setup, _), s in sums.items() if setup == ALL),
+              "params": best_shadow_params(shadow_store, sums, min_samples)}
+    if stats_store is not None:
+        history = stats_store.history(limit=stats_store.count() or 1)
+        report["trades"] = best_trade_params(history, _trade_setups(db_path), min_samples)
+    return report
+
+
+def write_params(report, path=None):
+    """Atomar schreiben (der Live-Loop liest die Datei bei Änderung neu)."""
+    path = path or cfg.EXIT_PARAMS_FILE
+    with open(path + ".tmp", "w") as f: json.dump(report, f, indent=4)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def print_surface(shadow_store, symbol, setup=ALL):
+    """Erwartungsfläche SL x TP in R (bester Wert über Breakeven/Trailing) für Symbol/Setup."""
+    sums = shadow_sums(shadow_store)
+    for (sym, st, gid), s in sums.items():
+        if sym != symbol or st != setup: continue
+        grid = shadow_store.grid(gid)
+        sl_levels, tp_levels, values = surface(grid, expectancy(grid, s)[0])
+        print(f"\n{symbol} / {setup} | Raster {gid} | {s.count} Einstiege | Erwartungswert in R (Zeilen SL, Spalten TP in ATR)")
+        print("SL\\TP " + "".join(f"{tp:>6.1f}" for tp in tp_levels))
+        for sl, row in zip(sl_levels, values):
+            print(f"{sl:>5.2f} " + "".join(f"{v:>+6.2f}" for v in row))
+
+
+def main():
+    from shadow_store import ShadowStore
+    from trade_stats import TradeStatsStore
+
+    parser = argparse.ArgumentParser(description="Exit-Parameter aus Shadow- und Trade-Historie")
+    parser.add_argument("--surface", metavar="SYMBOL", help="Erwartungsfläche ausgeben statt Datei schreiben")
+    parser.add_argument("--setup", default=ALL)
+    parser.add_argument("--min-samples", type=int, default=None)
+    args = parser.parse_args()
+
+    shadow_store = ShadowStore(cfg.SHADOW_DB, legacy_json="shadow_trades.json")
+    if args.surface:
+        print_surface(shadow_store, args.surface, args.setup)
+        return
+    stats_store = TradeStatsStore(cfg.TRADE_STATS_DB, "trade_perf_stats.json", "trade_history_stats.json")
+    report = optimize(shadow_store, stats_store, cfg.DB_NAME, args.min_samples)
+    path = write_params(report)
+    groups = sum(len(v) for v in report["params"].values())
+    log.info(f"🎯 Exit-Parameter für {groups} Symbol/Setup-Gruppen aus {report['shadow_entries']} Shadow-Einstiegen -> {path}")
+    for symbol, by_setup in sorted(report["params"].items()):
+        for setup, p in sorted(by_setup.items()):
+            log.info(f"   {symbol} {setup}: SL {p['sl_m']} / TP {p['tp_m']} ATR, BE {p['be_m']}, Trail {p['trail_m']} "
+                     f"| {p['expectancy_r']:+.2f} R, {p['win_rate']:.0%} TP ({p['samples']} Einstiege)")
+
+
+if __name__ == "__main__":
+    main()
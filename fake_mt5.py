@@ -0,0 +1,421 @@
+# fake_mt5.py
+"""
+Offline-Ersatz für das MetaTrader5-Paket (Benchmarks, Replay, Linux-Boxen).
+
+Liefert Kerzen, Ticks, Symbol-Infos, Positionen, Orders, Deals und Kontodaten aus
+aufgezeichneten Dateien (DATA_DIR/{SYMBOL}_{TF}.npy|.csv, {SYMBOL}_ticks.npy) oder aus
+synthetischen Daten (deterministischer Random Walk pro Symbol & Timeframe).
+Jeder API-Aufruf kann künstlich verzögert werden, um die IPC-Latenz des Terminals
+nachzustellen; alle Aufrufe werden gezählt.
+
+Nutzung:
+    import fake_mt5
+    fake_mt5.install()                        # registriert sich als 'MetaTrader5'
+    fake_mt5.configure(latency=0.002, data_dir="replay_data")
+    from main import EnterpriseBot            # nutzt ab jetzt das Fake-Terminal
+"""
+import os
+import sys
+import time
+import zlib
+from collections import namedtuple, Counter
+from datetime import datetime
+import numpy as np
+
+# --- KONSTANTEN (Werte wie im echten MetaTrader5-Paket) ---
+TIMEFRAME_M1, TIMEFRAME_M5, TIMEFRAME_M15, TIMEFRAME_M30 = 1, 5, 15, 30
+TIMEFRAME_H1, TIMEFRAME_H4, TIMEFRAME_D1 = 16385, 16388, 16408
+
+ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+TRADE_ACTION_DEAL, TRADE_ACTION_SLTP = 1, 6
+ORDER_FILLING_FOK, ORDER_FILLING_IOC, ORDER_FILLING_RETURN = 0, 1, 2
+ORDER_TIME_GTC = 0
+DEAL_ENTRY_IN, DEAL_ENTRY_OUT = 0, 1
+TRADE_RETCODE_DONE, TRADE_RETCODE_INVALID, TRADE_RETCODE_INVALID_STOPS = 10009, 10013, 10016
+COPY_TICKS_ALL, COPY_TICKS_INFO, COPY_TICKS_TRADE = -1, 1, 2
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+TICKS_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+    ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')
+])
+TF_NAMES = {TIMEFRAME_M1: "M1", TIMEFRAME_M5: "M5", TIMEFRAME_M15: "M15", TIMEFRAME_M30: "M30",
+            TIMEFRAME_H1: "H1", TIMEFRAME_H4: "H4", TIMEFRAME_D1: "D1"}
+
+Tick = namedtuple("Tick", "time bid ask last volume time_msc flags volume_real")
+SymbolInfo = namedtuple("SymbolInfo", "name point digits spread trade_contract_size trade_tick_size "
+                        "trade_tick_value trade_tick_value_profit trade_tick_value_loss volume_min "
+                        "volume_max volume_step filling_mode currency_profit visible")
+AccountInfo = namedtuple("AccountInfo", "login name server currency balance equity profit margin "
+                         "margin_free margin_level leverage")
+TradePosition = namedtuple("TradePosition", "ticket time type magic identifier volume price_open sl tp "
+                           "price_current swap profit symbol comment")
+TradeDeal = namedtuple("TradeDeal", "ticket order time type entry magic position_id volume price "
+                       "commission swap profit symbol comment")
+OrderSendResult = namedtuple("OrderSendResult", "retcode deal order volume price bid ask comment request")
+
+TICK_STEP = 15  # Sekunden zwischen synthetischen Ticks (4 Ticks pro M1-Kerze)
+
+
+def tf_seconds(timeframe):
+    if timeframe < TIMEFRAME_H1: return timeframe * 60
+    if timeframe == TIMEFRAME_D1: return 86400
+    return (timeframe - 16384) * 3600
+
+
+def _ts(value):
+    """datetime (naiv = lokale Zeit, wie beim echten Terminal) oder Epoch -> Epoch-Sekunden"""
+    if isinstance(value, datetime): return int(value.timestamp())
+    return int(value)
+
+
+def _structured(data, dtype):
+    """Übernimmt Felder per Name (Aufzeichnungen können weniger Spalten haben)."""
+    data = np.asarray(data)
+    out = np.zeros(len(data), dtype=dtype)
+    for name in dtype.names:
+        if name in data.dtype.names: out[name] = data[name]
+    return out
+
+
+def save_rates(path, rates):
+    """Speichert MT5-Kerzen (z.B. vom echten Terminal) für den Replay."""
+    np.save(path, _structured(rates, RATES_DTYPE))
+
+
+class FakeTerminal:
+    def __init__(self):
+        self.data_dir = None
+        self.history_bars = 60000
+        self.future_bars = 5000
+        self.seed = 42
+        self.latency = 0.0
+        self.latency_per_call = {}
+        self.fixed_now = None
+        self.balance = 10000.0
+        self.leverage = 100
+        self.calls = Counter()
+        self.reset()
+
+    def reset(self):
+        self._rates = {}
+        self._ticks = {}
+        self._anchor = int(time.time()) // 60 * 60
+        self.positions = {}
+        self.deals = []
+        self._next_ticket = 1000
+        self.calls.clear()
+
+    # --- ZEIT ---
+    @property
+    def now(self):
+        return self.fixed_now if self.fixed_now is not None else int(time.time())
+
+    def advance(self, seconds):
+        """Replay-Modus: Uhr vorstellen und SL/TP der offenen Positionen prüfen."""
+        if self.fixed_now is None: self.fixed_now = int(time.time())
+        self.fixed_now += int(seconds)
+        self._check_stops()
+
+    # --- DATEN ---
+    def _load_file(self, symbol, suffix):
+        if not self.data_dir: return None
+        base = os.path.join(self.data_dir, f"{symbol}_{suffix}")
+        if os.path.exists(base + ".npy"):
+            return np.load(base + ".npy")
+        if os.path.exists(base + ".csv"):
+            return np.genfromtxt(base + ".csv", delimiter=",", names=True, dtype=None, encoding=None)
+        return None
+
+    def _synthetic_rates(self, symbol, timeframe):
+        rng = np.random.default_rng(zlib.crc32(f"{symbol}:{timeframe}:{self.seed}".encode()))
+        n = self.history_bars + self.future_bars
+        step = tf_seconds(timeframe)
+        base = 150.0 if "JPY" in symbol else 1.0 + (zlib.crc32(symbol.encode()) % 500) / 1000
+        sigma = 0.0004 * np.sqrt(step / 60)
+        close = base * np.exp(np.cumsum(rng.normal(0, sigma, n)))
+        open_ = np.concatenate(([base], close[:-1]))
+        wick = np.abs(rng.normal(0, sigma * 0.6, (2, n))) * close
+        rates = np.zeros(n, dtype=RATES_DTYPE)
+        first = (self._anchor // step) * step - (self.history_bars - 1) * step
+        rates['time'] = first + np.arange(n) * step
+        rates['open'], rates['close'] = open_, close
+        rates['high'] = np.maximum(open_, close) + wick[0]
+        rates['low'] = np.minimum(open_, close) - wick[1]
+        rates['tick_volume'] = rng.poisson(40 * step / 60, n) + 1
+        rates['spread'] = 10
+        return rates
+
+    def rates(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self._rates:
+            data = self._load_file(symbol, TF_NAMES.get(timeframe, str(timeframe)))
+            if data is not None:
+                data = _structured(data, RATES_DTYPE)
+                if self.fixed_now is None: self.fixed_now = int(data['time'][-1])
+            else:
+                data = self._synthetic_rates(symbol, timeframe)
+            self._rates[key] = data
+        return self._rates[key]
+
+    def visible_rates(self, symbol, timeframe):
+        data = self.rates(symbol, timeframe)
+        return data[:np.searchsorted(data['time'], self.now, side='right')]
+
+    def ticks(self, symbol, date_from, date_to):
+        recorded = self._ticks.get(symbol)
+        if recorded is None and symbol not in self._ticks:
+            recorded = self._load_file(symbol, "ticks")
+            if recorded is not None: recorded = _structured(recorded, TICKS_DTYPE)
+            self._ticks[symbol] = recorded
+        date_to = min(date_to, self.now)
+        if recorded is not None:
+            t = recorded['time']
+            return recorded[np.searchsorted(t, date_from):np.searchsorted(t, date_to, side='right')]
+
+        # Synthetisch: 4 Ticks pro M1-Kerze (Open, Low/High, High/Low, Close)
+        m1 = self.rates(symbol, TIMEFRAME_M1)
+        lo = max(np.searchsorted(m1['time'], date_from, side='right') - 1, 0)
+        hi = np.searchsorted(m1['time'], date_to, side='right')
+        bars = m1[lo:hi]
+        up = bars['close'] >= bars['open']
+        path = np.stack([bars['open'], np.where(up, bars['low'], bars['high']),
+                         np.where(up, bars['high'], bars['low']), bars['close']], axis=1)
+        out = np.zeros(len(bars) * 4, dtype=TICKS_DTYPE)
+        out['time'] = (bars['time'][:, None] + np.arange(4) * TICK_STEP).ravel()
+        out['bid'] = path.ravel()
+        out['ask'] = out['bid'] + np.repeat(bars['spread'], 4) * self.point(symbol)
+        out['time_msc'] = out['time'] * 1000
+        out['volume'] = 1
+        out['flags'] = 6
+        return out[(out['time'] >= date_from) & (out['time'] <= date_to)]
+
+    def last_tick(self, symbol):
+        ticks = self.ticks(symbol, self.now - 120, self.now)
+        if len(ticks) == 0: return None
+        return Tick(*ticks[-1].tolist())
+
+    def point(self, symbol):
+        return 0.001 if "JPY" in symbol else 0.00001
+
+    def symbol_info(self, symbol):
+        point = self.point(symbol)
+        tick = self.last_tick(symbol)
+        price = tick.bid if tick else 1.0
+        tick_value = 100000 * point / (price if not symbol.endswith("USD") else 1.0)
+        return SymbolInfo(symbol, point, 3 if point == 0.001 else 5, 10, 100000.0, point,
+                          tick_value, tick_value, tick_value, 0.01, 100.0, 0.01, 3,
+                          symbol[-3:], True)
+
+    # --- HANDEL ---
+    def _tick_value_profit(self, pos, close_price):
+        info = self.symbol_info(pos.symbol)
+        diff = close_price - pos.price_open if pos.type == ORDER_TYPE_BUY else pos.price_open - close_price
+        return diff / info.trade_tick_size * info.trade_tick_value * pos.volume
+
+    def _close(self, pos, price, comment):
+        profit = self._tick_value_profit(pos, price)
+        self.balance += profit
+        self._next_ticket += 1
+        self.deals.append(TradeDeal(self._next_ticket, self._next_ticket, self.now,
+                                    1 - pos.type, DEAL_ENTRY_OUT, pos.magic, pos.ticket, pos.volume,
+                                    price, 0.0, 0.0, profit, pos.symbol, comment))
+        del self.positions[pos.ticket]
+        return self._next_ticket
+
+    def _check_stops(self):
+        for pos in list(self.positions.values()):
+            tick = self.last_tick(pos.symbol)
+            if tick is None: continue
+            price = tick.bid if pos.type == ORDER_TYPE_BUY else tick.ask
+            sign = 1 if pos.type == ORDER_TYPE_BUY else -1
+            if pos.sl and (price - pos.sl) * sign <= 0: self._close(pos, pos.sl, "[sl]")
+            elif pos.tp and (price - pos.tp) * sign >= 0: self._close(pos, pos.tp, "[tp]")
+
+    def order_send(self, request):
+        action = request.get("action")
+        tick = self.last_tick(request.get("symbol", "")) if request.get("symbol") else None
+
+        def result(retcode, deal=0, price=0.0, comment="Request executed"):
+            return OrderSendResult(retcode, deal, deal, request.get("volume", 0.0), price,
+                                   tick.bid if tick else 0.0, tick.ask if tick else 0.0, comment, request)
+
+        if action == TRADE_ACTION_SLTP:
+            pos = self.positions.get(request.get("position"))
+            if pos is None: return result(TRADE_RETCODE_INVALID, comment="Position not found")
+            self.positions[pos.ticket] = pos._replace(sl=float(request.get("sl", pos.sl)),
+                                                      tp=float(request.get("tp", pos.tp)))
+            return result(TRADE_RETCODE_DONE)
+
+        if action != TRADE_ACTION_DEAL or tick is None:
+            return result(TRADE_RETCODE_INVALID, comment="Invalid request")
+
+        side = request.get("type", ORDER_TYPE_BUY)
+        price = tick.ask if side == ORDER_TYPE_BUY else tick.bid
+        if request.get("position"):
+            pos = self.positions.get(request["position"])
+            if pos is None: return result(TRADE_RETCODE_INVALID, comment="Position not found")
+            return result(TRADE_RETCODE_DONE, self._close(pos, price, request.get("comment", "")), price)
+
+        self._next_ticket += 1
+        ticket = self._next_ticket
+        self.positions[ticket] = TradePosition(
+            ticket, self.now, side, request.get("magic", 0), ticket, float(request.get("volume", 0.0)),
+            price, float(request.get("sl", 0.0)), float(request.get("tp", 0.0)), price, 0.0, 0.0,
+            request["symbol"], request.get("comment", ""))
+        self.deals.append(TradeDeal(ticket, ticket, self.now, side, DEAL_ENTRY_IN, request.get("magic", 0),
+                                    ticket, request.get("volume", 0.0), price, 0.0, 0.0, 0.0,
+                                    request["symbol"], request.get("comment", "")))
+        return result(TRADE_RETCODE_DONE, ticket, price)
+
+    def marked_positions(self):
+        out = []
+        for pos in self.positions.values():
+            tick = self.last_tick(pos.symbol)
+            if tick is None:
+                out.append(pos)
+                continue
+            price = tick.bid if pos.type == ORDER_TYPE_BUY else tick.ask
+            out.append(pos._replace(price_current=price, profit=self._tick_value_profit(pos, price)))
+        return out
+
+    def account_info(self):
+        floating = sum(p.profit for p in self.marked_positions())
+        equity = self.balance + floating
+        margin = sum(p.volume * 100000 * p.price_open / self.leverage for p in self.positions.values())
+        level = equity / margin * 100 if margin else 0.0
+        return AccountInfo(5000001, "Fake Terminal", "Fake-Demo", "USD", self.balance, equity,
+                           floating, margin, equity - margin, level, self.leverage)
+
+
+_terminal = FakeTerminal()
+
+
+def configure(data_dir=None, latency=None, latency_per_call=None, now=None, history_bars=None,
+              future_bars=None, seed=None, balance=None):
+    """Setzt Datenquelle, Latenz (Sekunden pro Aufruf) und Uhr (now=None -> Wanduhr)."""
+    t = _terminal
+    if data_dir is not None: t.data_dir = data_dir
+    if latency is not None: t.latency = latency
+    if latency_per_call is not None: t.latency_per_call = dict(latency_per_call)
+    if history_bars is not None: t.history_bars = history_bars
+    if future_bars is not None: t.future_bars = future_bars
+    if seed is not None: t.seed = seed
+    if balance is not None: t.balance = balance
+    t.reset()
+    if now is not None: t.fixed_now = _ts(now)
+    return t
+
+
+def terminal():
+    return _terminal
+
+
+def call_counts():
+    """Anzahl der API-Aufrufe pro Funktion seit dem letzten reset_counters()."""
+    return dict(_terminal.calls)
+
+
+def reset_counters():
+    _terminal.calls.clear()
+
+
+def advance(seconds):
+    _terminal.advance(seconds)
+
+
+def install():
+    """Registriert dieses Modul als 'MetaTrader5' (vor dem Import von mt5_handler aufrufen)."""
+    sys.modules["MetaTrader5"] = sys.modules[__name__]
+
+
+def _api(func):
+    name = func.__name__
+
+    def wrapper(*args, **kwargs):
+        _terminal.calls[name] += 1
+        delay = _terminal.latency_per_call.get(name, _terminal.latency)
+        if delay: time.sleep(delay)
+        return func(*args, **kwargs)
+    wrapper.__name__ = name
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+# --- API (gleiche Signaturen wie MetaTrader5) ---
+@_api
+def initialize(*args, **kwargs): return True
+
+@_api
+def login(*args, **kwargs): return True
+
+@_api
+def shutdown(): return True
+
+@_api
+def last_error(): return (1, "Success")
+
+@_api
+def symbol_select(symbol, enable=True): return True
+
+@_api
+def symbol_info(symbol): return _terminal.symbol_info(symbol)
+
+@_api
+def symbol_info_tick(symbol): return _terminal.last_tick(symbol)
+
+@_api
+def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+    visible = _terminal.visible_rates(symbol, timeframe)
+    end = len(visible) - start_pos
+    if end <= 0: return None
+    return visible[max(0, end - count):end].copy()
+
+@_api
+def copy_rates_from(symbol, timeframe, date_from, count):
+    visible = _terminal.visible_rates(symbol, timeframe)
+    end = np.searchsorted(visible['time'], _ts(date_from), side='right')
+    return visible[max(0, end - count):end].copy()
+
+@_api
+def copy_rates_range(symbol, timeframe, date_from, date_to):
+    visible = _terminal.visible_rates(symbol, timeframe)
+    t = visible['time']
+    return visible[np.searchsorted(t, _ts(date_from)):np.searchsorted(t, _ts(date_to), side='right')].copy()
+
+@_api
+def copy_ticks_range(symbol, date_from, date_to, flags=COPY_TICKS_ALL):
+    return _terminal.ticks(symbol, _ts(date_from), _ts(date_to)).copy()
+
+@_api
+def positions_get(symbol=None, ticket=None, group=None):
+    positions = _terminal.marked_positions()
+    if symbol is not None: positions = [p for p in positions if p.symbol == symbol]
+    if ticket is not None: positions = [p for p in positions if p.ticket == ticket]
+    return tuple(positions)
+
+@_api
+def positions_total(): return len(_terminal.positions)
+
+@_api
+def order_send(request): return _terminal.order_send(request)
+
+@_api
+def order_calc_margin(action, symbol, volume, price):
+    return volume * 100000 * price / _terminal.leverage
+
+@_api
+def history_deals_get(date_from=None, date_to=None, group=None, position=None, ticket=None):
+    deals = _terminal.deals
+    if position is not None: return tuple(d for d in deals if d.position_id == position)
+    if ticket is not None: return tuple(d for d in deals if d.ticket == ticket)
+    # Fehlende Grenze = offen (ohne Datum: alle Deals)
+    lo = _ts(date_from) if date_from is not None else float("-inf")
+    hi = _ts(date_to) if date_to is not None else float("inf")
+    return tuple(d for d in deals if lo <= d.time <= hi)
+
+@_api
+def account_info(): return _terminal.account_info()
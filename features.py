@@ -0,0 +1,519 @@
+# features.py
+import copy
+import math
+import sys
+from collections import OrderedDict, deque
+import numpy as np
+from scipy.signal import lfilter
+
+# Reihenfolge = Spaltenreihenfolge der trainierten Modelle
+FEATURE_LIST = [
+    'rsi', 'stoch_k', 'cci', 'rsi_prev1', 'rsi_prev2',
+    'macd_hist', 'trend_strength', 'macd_hist_prev1', 'macd_hist_prev2',
+    'bb_pct', 'bb_width', 'atr', 'mfi', 'obv_slope',
+    'wick_upper', 'wick_lower', 'is_doji', 'engulfing'
+]
+
+NAN = float('nan')
+
+
+def _detect_rma_seed():
+    """
+    RMA-Variante des installierten pandas_ta (keine Version gepinnt):
+    True  = SMA der ersten `length` Werte als Startwert, danach ewm(adjust=False) (pandas_ta 0.4.x, pandas-ta-classic)
+    False = ewm(alpha=1/length, min_periods=length, adjust=True) (pandas_ta 0.3.14b)
+    Ohne pandas_ta gilt die aktuelle Variante.
+    """
+    try:
+        import pandas as pd
+        import pandas_ta as ta
+        # length=2: SMA-Seed -> (1 + 2) / 2 = 1.5, adjust=True -> (0.5 * 1 + 2) / 1.5 = 1.67
+        return abs(float(ta.rma(pd.Series([1.0, 2.0, 4.0]), length=2).iloc[1]) - 1.5) < 1e-9
+    except Exception:
+        return True
+
+
+RMA_SMA_SEED = _detect_rma_seed()
+
+
+def _div(a, b):
+    """IEEE-Division wie in pandas (x/0 -> ±inf, 0/0 -> NaN) statt ZeroDivisionError."""
+    if b == 0:
+        if a == 0 or a != a: return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _window_ready(window):
+    return len(window) == window.maxlen and all(v == v for v in window)
+
+
+# --- 1. STREAMING BAUSTEINE (gleiche Rekursionen wie pandas ewm / pandas_ta) ---
+class _EWM:
+    """pandas .ewm(com=..., adjust=...).mean() als Rekursion (inkl. min_periods)."""
+    def __init__(self, com, adjust, min_periods=1):
+        self.alpha = 1.0 / (1.0 + com)
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, x):
+        is_obs = x == x
+        self.nobs += is_obs
+        if self.weighted == self.weighted:
+            if is_obs:
+                new_wt = 1.0 if self.adjust else self.alpha
+                self.old_wt *= 1.0 - self.alpha
+                if self.weighted != x:
+                    self.weighted = (self.old_wt * self.weighted + new_wt * x) / (self.old_wt + new_wt)
+                self.old_wt = self.old_wt + new_wt if self.adjust else 1.0
+        elif is_obs:
+            self.weighted = x
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+
+class _RMA(_EWM):
+    """pandas_ta.rma in der Variante des installierten pandas_ta (RMA_SMA_SEED)."""
+    def __init__(self, length):
+        self.length = length
+        if RMA_SMA_SEED:
+            # SMA der ersten `length` gültigen Werte (führende NaN übersprungen), danach ewm(alpha=1/length, adjust=False)
+            self.seed = []
+            super().__init__(length - 1.0, adjust=False)
+        else:
+            self.seed = None
+            super().__init__(length - 1.0, adjust=True, min_periods=length)
+
+    def update(self, x):
+        if self.seed is not None:
+            if x != x: return NAN
+            self.seed.append(x)
+            if len(self.seed) < self.length: return NAN
+            x = float(np.mean(self.seed))
+            self.seed = None
+        return super().update(x)
+
+
+class _EMA:
+    """pandas_ta.ema: SMA der ersten `length` Werte als Startwert, danach ewm(span, adjust=False)."""
+    def __init__(self, length):
+        self.length = length
+        self.seed = []
+        self.ewm = _EWM((length - 1) / 2.0, adjust=False)
+
+    def update(self, x):
+        if self.seed is not None:
+            self.seed.append(x)
+            if len(self.seed) < self.length: return NAN
+            x = float(np.mean(self.seed))
+            self.seed = None
+        return self.ewm.update(x)
+
+
+class _SMA:
+    def __init__(self, length):
+        self.window = deque(maxlen=length)
+
+    def update(self, x):
+        self.window.append(x)
+        if not _window_ready(self.window): return NAN
+        return float(np.mean(self.window))
+
+
+# --- 2. INKREMENTELLE FEATURE ENGINE ---
+class StreamingFeatureEngine:
+    """
+    Zustandsbehaftete Berechnung der 18 Modell-Features pro (Symbol, Timeframe).
+    update() verarbeitet eine abgeschlossene Kerze in O(1) (nur Fenster fester Länge <= 20)
+    und liefert dieselben Werte wie AIEngine.feature_engineering(...).iloc[-1]
+    (pandas_ta-Formeln inkl. ffill). Einzige Abweichung: in der Warmup-Phase (< ~35 Bars)
+    gibt es kein bfill, fehlende Werte sind dort 0.
+    """
+    def __init__(self):
+        self.last_time = None
+        self.bars = 0
+        self.prev_close = NAN
+        self.prev_tp = NAN
+        self.rsi_pos, self.rsi_neg = _RMA(14), _RMA(14)
+        self.atr = _RMA(14)
+        self.ema12, self.ema26 = _EMA(12), _EMA(26)
+        self.ema20, self.ema50 = _EMA(20), _EMA(50)
+        self.macd_signal = _EMA(9)
+        self.tp_window = deque(maxlen=20)
+        self.rsi_window = deque(maxlen=14)
+        self.stoch_k = _SMA(3)
+        self.close_window = deque(maxlen=5)
+        self.mf_pos, self.mf_neg = deque(maxlen=14), deque(maxlen=14)
+        self.obv = 0.0
+        self.obv_window = deque(maxlen=6)
+        self.raw_hist = {k: deque([NAN, NAN, NAN], maxlen=3) for k in ('rsi', 'macd_hist', 'trend_strength')}
+        self.last_valid = [NAN] * len(FEATURE_LIST)
+
+    def update(self, time, o, h, l, c, v):
+        """Verarbeitet eine abgeschlossene Kerze und gibt den Feature-Vektor zurück."""
+        o, h, l, c, v = float(o), float(h), float(l), float(c), float(v)
+        prev_close, prev_tp = self.prev_close, self.prev_tp
+
+        # RSI (RMA von Gewinnen/Verlusten)
+        diff = c - prev_close
+        pos = self.rsi_pos.update(max(diff, 0.0) if diff == diff else NAN)
+        neg = self.rsi_neg.update(min(diff, 0.0) if diff == diff else NAN)
+        rsi = _div(100 * pos, pos + abs(neg))
+
+        # ATR (True Range, RMA)
+        if prev_close == prev_close:
+            hl = h - l
+            if hl == 0: hl += sys.float_info.epsilon
+            tr = max(abs(hl), abs(h - prev_close), abs(prev_close - l))
+        else:
+            tr = NAN
+        atr = self.atr.update(tr)
+
+        # CCI (20)
+        tp = (h + l + c) / 3
+        self.tp_window.append(tp)
+        if _window_ready(self.tp_window):
+            arr = np.fromiter(self.tp_window, float, len(self.tp_window))
+            mean_tp = arr.mean()
+            mad = np.fabs(arr - arr.mean()).mean()
+            cci = _div(tp - mean_tp, 0.015 * mad)
+        else:
+            cci = NAN
+
+        # StochRSI %K (14, 14, 3)
+        self.rsi_window.append(rsi)
+        if _window_ready(self.rsi_window):
+            lo, hi = min(self.rsi_window), max(self.rsi_window)
+            rng = hi - lo
+            if rng == 0: rng = sys.float_info.epsilon
+            stoch = _div(100 * (rsi - lo), rng)
+        else:
+            stoch = NAN
+        stoch_k = self.stoch_k.update(stoch)
+
+        # MACD Histogramm (12, 26, 9)
+        macd = self.ema12.update(c) - self.ema26.update(c)
+        macd_hist = macd - self.macd_signal.update(macd) if macd == macd else NAN
+
+        # Trend (EMA20 - EMA50)
+        trend = self.ema20.update(c) - self.ema50.update(c)
+
+        # Bollinger (5, 2)
+        self.close_window.append(c)
+        if _window_ready(self.close_window):
+            arr = np.fromiter(self.close_window, float, len(self.close_window))
+            mid = arr.mean()
+            dev = 2.0 * math.sqrt(arr.var())
+            lower, upper = mid - dev, mid + dev
+            bb_pct = _div(c - lower, upper - lower)
+            bb_width = _div(upper - lower, c)
+        else:
+            bb_pct = bb_width = NAN
+
+        # MFI (14)
+        rmf = tp * v
+        tp_diff = tp - prev_tp
+        self.mf_pos.append(rmf if tp_diff > 0 else 0.0)
+        self.mf_neg.append(rmf if tp_diff < 0 else 0.0)
+        if len(self.mf_pos) == self.mf_pos.maxlen:
+            psum, nsum = sum(self.mf_pos), sum(self.mf_neg)
+            mfi = _div(100 * psum, psum + nsum)
+        else:
+            mfi = NAN
+
+        # OBV Steigung (diff 5)
+        if prev_close != prev_close: sign = 1.0
+        else: sign = 1.0 if c > prev_close else (-1.0 if c < prev_close else 0.0)
+        self.obv += sign * v
+        self.obv_window.append(self.obv)
+        obv_slope = self.obv_window[-1] - self.obv_window[0] if len(self.obv_window) == 6 else NAN
+
+        # Verzögerte Werte (shift 1 / 2 auf den Rohwerten, wie in feature_engineering)
+        for key, val in (('rsi', rsi), ('macd_hist', macd_hist), ('trend_strength', trend)):
+            self.raw_hist[key].append(val)
+        r, m, t = self.raw_hist['rsi'], self.raw_hist['macd_hist'], self.raw_hist['trend_strength']
+
+        body_hi, body_lo = max(o, c), min(o, c)
+        is_doji = 1.0 if abs(c - o) <= (h - l) * 0.1 else 0.0
+
+        row = [rsi, stoch_k, cci, r[1], r[0], macd_hist, trend, m[1], m[0],
+               bb_pct, bb_width, atr, mfi, obv_slope, h - body_hi, body_lo - l, is_doji, 0.0]
+
+        # ffill (NaN -> letzter gültiger Wert), sonst 0
+        for i, val in enumerate(row):
+            if val == val: self.last_valid[i] = val
+            else: row[i] = self.last_valid[i] if self.last_valid[i] == self.last_valid[i] else 0.0
+
+        self.prev_close, self.prev_tp = c, tp
+        self.last_time = time
+        self.bars += 1
+        return np.array(row)
+
+    def peek(self, time, o, h, l, c, v):
+        """Features für die laufende (nicht abgeschlossene) Kerze, ohne den Zustand zu ändern."""
+        return copy.deepcopy(self).update(time, o, h, l, c, v)
+
+
+class FeatureStreams:
+    """
+    Verwaltet eine StreamingFeatureEngine pro (Symbol, Timeframe).
+    Die letzte Kerze eines Fensters gilt als laufende Kerze: abgeschlossene Bars werden
+    committet, die laufende nur per peek() ausgewertet. Bei Lücken (z.B. nach Reconnect)
+    wird die Engine aus der Historie des Fensters neu aufgebaut.
+    """
+    def __init__(self):
+        self.engines = {}
+        self.stats = {"rebuilds": 0, "bars": 0}
+
+    def bulk_init(self, key, times, o, h, l, c, v):
+        engine = StreamingFeatureEngine()
+        for i in range(len(times)):
+            engine.update(times[i], o[i], h[i], l[i], c[i], v[i])
+        self.engines[key] = engine
+        self.stats["rebuilds"] += 1
+        self.stats["bars"] += len(times)
+        return engine
+
+    def latest(self, key, times, o, h, l, c, v):
+        n = len(times)
+        if n < 2: return None
+        engine = self.engines.get(key)
+        start = n - 1
+        if engine is not None:
+            idx = int(np.searchsorted(times, engine.last_time))
+            if idx < n - 1 and times[idx] == engine.last_time:
+                start = idx + 1
+            else:
+                engine = None
+        if engine is None:
+            engine = self.bulk_init(key, times[:-1], o[:-1], h[:-1], l[:-1], c[:-1], v[:-1])
+        for i in range(start, n - 1):
+            engine.update(times[i], o[i], h[i], l[i], c[i], v[i])
+            self.stats["bars"] += 1
+        return engine.peek(times[-1], o[-1], h[-1], l[-1], c[-1], v[-1])
+
+    def latest_from_frame(self, key, df):
+        """Wie latest(), aber direkt aus einem OHLCV-DataFrame (Index oder Spalte 'time')."""
+        cols = {c.lower(): c for c in df.columns}
+        vol_col = next((cols[c] for c in ['tick_volume', 'volume', 'real_volume'] if c in cols), None)
+        if vol_col is None: return None
+        times = df[cols['time']].values if 'time' in cols else df.index.values
+        times = np.asarray(times).astype('int64')
+        return self.latest(key, times, df[cols['open']].values, df[cols['high']].values,
+                           df[cols['low']].values, df[cols['close']].values,
+                           df[vol_col].values.astype(float))
+
+
+class FeatureCache:
+    """
+    Begrenzter LRU-Cache für berechnete Features pro (Symbol, Timeframe, Art, letzte abgeschlossene Bar).
+    Die laufende Kerze (OHLCV) dient als Validator: solange sie sich nicht ändert, wird nichts
+    neu berechnet (z.B. Prognose, Shadow-Snapshot und DB-Features im selben Durchlauf).
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def signature(df):
+        """(Zeit der letzten abgeschlossenen Bar, Validator der laufenden Bar) eines Kerzen-Frames."""
+        times = df['time'].values if 'time' in df.columns else df.index.values
+        closed = times[-2] if len(times) > 1 else None
+        return closed, (times[-1],) + tuple(df.iloc[-1].tolist())
+
+    def get(self, key, df, compute):
+        closed, validator = self.signature(df)
+        full_key = key + (closed,)
+        entry = self._entries.get(full_key)
+        if entry is not None and entry[0] == validator:
+            self._entries.move_to_end(full_key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+        self.stats["misses"] += 1
+        value = compute()
+        self._entries[full_key] = (validator, value)
+        self._entries.move_to_end(full_key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+
+# --- 3. VEKTORISIERTER BATCH-KERNEL (Training) ---
+def _ewm_batch(x, com, adjust, min_periods=1):
+    """pandas .ewm(com=...).mean() für Serien, die nur am Anfang NaN enthalten (per lfilter)."""
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0: return out
+    first = valid[0]
+    decay = com / (1.0 + com)
+    xs = x[first:]
+    if adjust:
+        num = lfilter([1.0], [1.0, -decay], xs)
+        den = lfilter([1.0], [1.0, -decay], np.ones(len(xs)))
+        out[first:] = num / den
+    else:
+        alpha = 1.0 - decay
+        out[first:], _ = lfilter([alpha], [1.0, -decay], xs, zi=[decay * xs[0]])
+    out[first:first + max(min_periods, 1) - 1] = np.nan
+    return out
+
+
+def _seeded_ewm_batch(x, length, com):
+    """Ab dem ersten gültigen Wert: SMA der ersten `length` Werte als Startwert, dann ewm(com, adjust=False)."""
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) < length: return out
+    first = valid[0]
+    seeded = x[first:].copy()
+    seeded[length - 1] = seeded[:length].mean()
+    seeded[:length - 1] = np.nan
+    out[first:] = _ewm_batch(seeded, com, adjust=False)
+    return out
+
+
+def _rma_batch(x, length):
+    """pandas_ta.rma in der Variante des installierten pandas_ta (RMA_SMA_SEED)."""
+    if RMA_SMA_SEED:
+        return _seeded_ewm_batch(x, length, length - 1.0)
+    return _ewm_batch(x, length - 1.0, adjust=True, min_periods=length)
+
+
+def _ema_batch(x, length):
+    """pandas_ta.ema ab dem ersten gültigen Wert (SMA-Seed, dann ewm(span, adjust=False))."""
+    return _seeded_ewm_batch(x, length, (length - 1) / 2.0)
+
+
+def _windows(x, length):
+    """Die `length` Offsets eines Rolling-Fensters als Views (ältester zuerst), ohne n x length Kopie."""
+    n = len(x) - length + 1
+    return [x[k:k + n] for k in range(length)]
+
+
+def _rolling(x, length, reduce):
+    out = np.full(len(x), np.nan)
+    if len(x) >= length:
+        views = _windows(x, length)
+        acc = views[0].copy()
+        for v in views[1:]: reduce(acc, v, out=acc)
+        out[length - 1:] = acc
+    return out
+
+
+def _rolling_mean(x, length):
+    return _rolling(x, length, np.add) / length
+
+
+def _rolling_dev(x, length, power):
+    """Mittlere (absolute bzw. quadratische) Abweichung vom Fenster-Mittelwert (MAD / Varianz ddof=0)."""
+    out = np.full(len(x), np.nan)
+    if len(x) >= length:
+        mean = _rolling_mean(x, length)[length - 1:]
+        acc = np.zeros(len(mean))
+        for v in _windows(x, length):
+            d = np.abs(v - mean) if power == 1 else (v - mean) ** 2
+            acc += d
+        out[length - 1:] = acc / length
+    return out
+
+
+def _non_zero_range(diff):
+    """pandas_ta.non_zero_range: epsilon auf die ganze Serie, sobald irgendwo 0 vorkommt."""
+    return diff + sys.float_info.epsilon if (diff == 0).any() else diff
+
+
+def _shift(x, n):
+    out = np.empty_like(x)
+    out[:n] = np.nan
+    out[n:] = x[:-n]
+    return out
+
+
+def _fill(col):
+    """ffill, bfill, fillna(0) wie in feature_engineering (für eine Spalte)."""
+    mask = np.isnan(col)
+    if not mask.any(): return col
+    idx = np.where(mask, 0, np.arange(len(col)))
+    np.maximum.accumulate(idx, out=idx)
+    col = col[idx]
+    valid = np.flatnonzero(~mask)
+    if len(valid) == 0: return np.zeros_like(col)
+    col[:valid[0]] = col[valid[0]]
+    return col
+
+
+def compute_feature_matrix(o, h, l, c, v, dtype=np.float64):
+    """
+    Feature-Matrix (n x 18, Spalten = FEATURE_LIST) direkt aus OHLCV-Arrays.
+    Gleiche Formeln wie AIEngine.feature_engineering (pandas_ta + ffill/bfill/0),
+    aber ohne DataFrames: EWMs per lfilter, Rolling-Fenster als Summen über Offset-Views.
+    Gedacht für den Trainings-Batch (50k+ Bars); Eingabe ohne NaN, mindestens ~50 Bars.
+    """
+    o, h, l, c, v = (np.asarray(a, dtype=np.float64) for a in (o, h, l, c, v))
+    n = len(c)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # RSI (14)
+        diff = np.empty(n); diff[0] = np.nan; diff[1:] = np.diff(c)
+        pos_avg = _rma_batch(np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0)), 14)
+        neg_avg = _rma_batch(np.where(diff < 0, diff, np.where(np.isnan(diff), np.nan, 0.0)), 14)
+        rsi = 100 * pos_avg / (pos_avg + np.abs(neg_avg))
+
+        # ATR (14)
+        prev_close = _shift(c, 1)
+        tr = np.maximum.reduce([np.abs(_non_zero_range(h - l)), np.abs(h - prev_close), np.abs(prev_close - l)])
+        tr[0] = np.nan
+        atr = _rma_batch(tr, 14)
+
+        # CCI (20)
+        tp = (h + l + c) / 3
+        cci = (tp - _rolling_mean(tp, 20)) / (0.015 * _rolling_dev(tp, 20, power=1))
+
+        # StochRSI %K (14, 14, 3)
+        lo, hi = _rolling(rsi, 14, np.minimum), _rolling(rsi, 14, np.maximum)
+        stoch_k = _rolling_mean(100 * (rsi - lo) / _non_zero_range(hi - lo), 3)
+
+        # MACD Histogramm (12, 26, 9) und Trend (EMA20 - EMA50)
+        macd = _ema_batch(c, 12) - _ema_batch(c, 26)
+        macd_hist = macd - _ema_batch(macd, 9)
+        trend = _ema_batch(c, 20) - _ema_batch(c, 50)
+
+        # Bollinger (5, 2)
+        mid = _rolling_mean(c, 5)
+        dev = 2.0 * np.sqrt(_rolling_dev(c, 5, power=2))
+        band = (mid + dev) - (mid - dev)
+        bb_pct = (c - (mid - dev)) / band
+        bb_width = band / c
+
+        # MFI (14) und OBV-Steigung
+        rmf = tp * v
+        tp_diff = np.empty(n); tp_diff[0] = np.nan; tp_diff[1:] = np.diff(tp)
+        psum = _rolling(np.where(tp_diff > 0, rmf, 0.0), 14, np.add)
+        nsum = _rolling(np.where(tp_diff < 0, rmf, 0.0), 14, np.add)
+        mfi = 100 * psum / (psum + nsum)
+        sign = np.sign(diff); sign[0] = 1.0
+        obv = np.cumsum(sign * v)
+        obv_slope = np.full(n, np.nan); obv_slope[5:] = obv[5:] - obv[:-5]
+
+        columns = [
+            rsi, stoch_k, cci, _shift(rsi, 1), _shift(rsi, 2),
+            macd_hist, trend, _shift(macd_hist, 1), _shift(macd_hist, 2),
+            bb_pct, bb_width, atr, mfi, obv_slope,
+            h - np.maximum(o, c), np.minimum(o, c) - l,
+            (np.abs(c - o) <= (h - l) * 0.1).astype(np.float64), np.zeros(n)
+        ]
+    # Spaltenweise (Fortran-Order): jede Feature-Spalte liegt zusammenhängend im Speicher
+    matrix = np.empty((len(columns), n), dtype=dtype)
+    for j, col in enumerate(columns):
+        matrix[j] = _fill(col)
+    return matrix.T
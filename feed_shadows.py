@@ -1,60 +1,59 @@
-import json
 import pandas as pd
 import os
-from infrastructure import AIEngine, log
+from infrastructure import log
+from settings import cfg
+from shadow_store import ShadowStore
+from shadow_book import TP, STOP, reference_variant
 
 # Konfiguration
-shadow_file = "shadow_trades.json"
 memory_file = "ai_models/smart_memory.csv"
+cursor_name = "feed_memory"
 
 def feed_memory():
     log.info("👻 ANALYSE: Prüfe Shadow-Trades auf Lernerfolge...")
 
-    if not os.path.exists(shadow_file):
-        log.warning("❌ Keine Shadow-Trades Datei gefunden.")
-        return
-
     try:
-        # 1. Shadow Trades laden
-        with open(shadow_file, "r") as f:
-            shadows = json.load(f)
+        # 1. Nur seit dem letzten Lauf abgeschlossene Shadow Trades laden
+        store = ShadowStore(cfg.SHADOW_DB, legacy_json="shadow_trades.json")
+        entries, position = store.closed_since(store.get_cursor(cursor_name))
         
-        # 2. Nur fertige Trades (WIN/LOSS) filtern, die Features haben
+        # 2. Pro Einstieg das Ergebnis der Referenz-Variante (TP/SL), nur mit Features
         new_memories = []
-        pending_shadows = [] # Die noch offen sind, behalten wir
-
-        for s in shadows:
-            if s["status"] in ["WIN", "LOSS"]:
-                # Check: Haben wir Features?
-                if "features" not in s or not s["features"]:
-                    continue # Alte Shadows ohne Features überspringen
-                
-                # Datenpaket schnüren
-                data_point = s["features"].copy()
-                data_point["symbol"] = s["symbol"]
-                # WICHTIG: KI lernt 1 für WIN, 0 für LOSS
-                data_point["outcome"] = 1 if s["status"] == "WIN" else 0
-                
-                new_memories.append(data_point)
-            else:
-                pending_shadows.append(s)
-
-        if not new_memories:
-            log.info("ℹ️ Keine neuen abgeschlossenen Shadow-Trades zum Lernen.")
-            return
+        reference = {}
+
+        for e in entries:
+            # Check: Haben wir Features?
+            if not e["features"]:
+                continue # Alte Shadows ohne Features überspringen
+
+            if e["grid_id"] not in reference:
+                reference[e["grid_id"]] = reference_variant(store.grid(e["grid_id"]), *cfg.SHADOW_REFERENCE)
+            outcome = e["outcomes"][reference[e["grid_id"]]]
+            if outcome not in (TP, STOP):
+                continue # Abgelaufen: kein WIN/LOSS
+            
+            # Datenpaket schnüren
+            data_point = e["features"].copy()
+            data_point["symbol"] = e["symbol"]
+            # WICHTIG: KI lernt 1 für WIN, 0 für LOSS
+            data_point["outcome"] = 1 if outcome == TP else 0
+            
+            new_memories.append(data_point)
 
-        # 3. In CSV speichern
-        df_new = pd.DataFrame(new_memories)
-        
-        # Header-Check: Existiert die Datei schon?
-        header = not os.path.exists(memory_file)
-        
-        df_new.to_csv(memory_file, mode='a', header=header, index=False)
-        log.info(f"✅ ERFOLG: {len(new_memories)} Shadow-Trades ins Gedächtnis integriert!")
+        if new_memories:
+            # 3. In CSV speichern
+            df_new = pd.DataFrame(new_memories)
+            
+            # Header-Check: Existiert die Datei schon?
+            header = not os.path.exists(memory_file)
+            
+            df_new.to_csv(memory_file, mode='a', header=header, index=False)
+            log.info(f"✅ ERFOLG: {len(new_memories)} Shadow-Trades ins Gedächtnis integriert!")
+        else:
+            log.info("ℹ️ Keine neuen abgeschlossenen Shadow-Trades zum Lernen.")
 
-        # 4. Datei aufräumen (Nur offene behalten)
-        with open(shadow_file, "w") as f:
-            json.dump(pending_shadows, f, indent=4)
+        # 4. Cursor erst nach dem Schreiben weitersetzen (Einstiege bleiben für Auswertungen erhalten)
+        store.set_cursor(cursor_name, position)
             
     except Exception as e:
         log.error(f"❌ Fehler beim Füttern der Shadows: {e}")
@@ -0,0 +1,144 @@
+# forest_compiler.py
+import os
+import numpy as np
+
+FOREST_SUFFIX = ".forest.npz"
+
+
+def _leaves_need_normalizing():
+    """Vor sklearn 1.4 enthält tree_.value Gewichte, predict_proba normalisiert pro Zeile."""
+    import sklearn
+    major, minor = (int(p) for p in sklearn.__version__.split(".")[:2])
+    return (major, minor) < (1, 4)
+
+
+def forest_path(model_path):
+    """ai_models/EURUSD_M5_model.pkl -> ai_models/EURUSD_M5_model.forest.npz"""
+    return os.path.splitext(model_path)[0] + FOREST_SUFFIX
+
+
+class CompiledForest:
+    """
+    RandomForestClassifier als gepackte NumPy-Arrays (alle Bäume in einem Knoten-Array).
+    predict_proba() wertet alle Bäume gleichzeitig Ebene für Ebene aus und liefert
+    bitgenau dieselben Werte wie sklearn:
+    - X wird wie in sklearn nach float32 gecastet und mit den float64-Schwellen verglichen (<=)
+    - Blattwerte wie DecisionTreeClassifier.predict_proba der installierten sklearn-Version
+    - Summe in Baum-Reihenfolge (sequenziell), danach / Anzahl Bäume
+    """
+    BATCH_CELLS = 1 << 20   # Zeilen * Bäume pro Block (begrenzt den Zwischenspeicher)
+
+    def __init__(self, feature, threshold, left, right, values, roots, classes, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.values = values
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.n_jobs = 1   # Kompatibel zu Code, der n_jobs auf dem Modell setzt
+        self.is_leaf = left == np.arange(len(left))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.values, self.roots))
+
+    # --- Kompilieren / Speichern ---
+    @classmethod
+    def compile(cls, model):
+        estimators = getattr(model, "estimators_", None)
+        if not estimators:
+            raise ValueError("Modell ist kein trainierter Random Forest")
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Nur Klassifikation mit einem Output wird unterstützt")
+
+        n_classes = len(model.classes_)
+        normalize = _leaves_need_normalizing()
+        feature, threshold, left, right, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+
+            # Blätter zeigen auf sich selbst (Kennung für is_leaf)
+            feature.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            left.append(np.where(leaf, own, tree.children_left + offset))
+            right.append(np.where(leaf, own, tree.children_right + offset))
+
+            proba = tree.value[:, 0, :n_classes].astype(np.float64)
+            if normalize:
+                # sklearn < 1.4: proba /= normalizer (0 -> 1), identische Operation pro Knoten
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+            values.append(proba)
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(np.concatenate(feature), np.concatenate(threshold),
+                   np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+                   np.concatenate(values), np.asarray(roots, dtype=np.int64),
+                   np.asarray(model.classes_), max_depth, model.n_features_in_)
+
+    def save(self, path):
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                 values=self.values, roots=self.roots, classes=self.classes_,
+                 meta=np.array([self.max_depth, self.n_features_in_]))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            max_depth, n_features = data["meta"]
+            return cls(data["feature"], data["threshold"], data["left"], data["right"],
+                       data["values"], data["roots"], data["classes"], max_depth, n_features)
+
+    # --- Auswertung ---
+    def apply(self, X):
+        """Blatt-Index (global) pro Zeile und Baum, Form (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1: X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X hat {X.shape[1]} Features, Modell erwartet {self.n_features_in_}")
+
+        # Blätter zeigen auf sich selbst. Fertige Pfade werden erst aussortiert, wenn mindestens
+        # die Hälfte im Blatt ist (Kompaktieren kostet selbst einen Durchlauf)
+        idx = np.tile(self.roots, len(X))
+        rows = np.repeat(np.arange(len(X)), self.n_trees)
+        active = np.arange(idx.size)
+        node = idx
+        for _ in range(self.max_depth):
+            go_left = X[rows[active], self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+            idx[active] = node
+            pending = ~self.is_leaf[node]
+            n_pending = np.count_nonzero(pending)
+            if n_pending == 0: break
+            if n_pending * 2 <= len(active):
+                active, node = active[pending], node[pending]
+        return idx.reshape(len(X), self.n_trees)
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if X.ndim == 1: X = X.reshape(1, -1)
+        out = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        step = max(1, self.BATCH_CELLS // max(self.n_trees, 1))
+        for start in range(0, len(X), step):
+            leaves = self.apply(X[start:start + step])
+            # Sequenzielle Summe in Baum-Reihenfolge (wie sklearn: all_proba += pro Baum)
+            out[start:start + step] = np.cumsum(self.values[leaves], axis=1)[:, -1]
+        out /= self.n_trees
+        return out
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -11,10 +11,17 @@ import os
 import time
 import pickle
 import sys
+import calendar
+from functools import lru_cache
 from datetime import datetime, timedelta
 from colorama import init, Fore, Style
 from sklearn.ensemble import RandomForestClassifier
 from settings import cfg
+from features import FEATURE_LIST, FeatureCache, FeatureStreams
+from model_registry import ModelRegistry
+from tick_profile import TickProfileBook
+from volume_profile import histogram_levels
+from anchors import AnchorTracker, frame_arrays, last_bar, last_pivot, session_start, vwap
 # Unterdrückt die nervigen Parallel-Warnungen
 warnings.filterwarnings("ignore", category=UserWarning, module="sklearn.utils.parallel")
 warnings.filterwarnings("ignore", message=".*sklearn.utils.parallel.delayed.*")
@@ -53,12 +60,99 @@ if not log.handlers:
     log.addHandler(fh)
 
 # --- 2. DATENBANK HANDLER ---
-class DatabaseHandler:
+SETUP_SUFFIXES = ("_Smart",)
+
+
+def normalize_setup(setup):
+    """Setup ohne Varianten-Suffix ('VAH_Break_Smart' -> 'VAH_Break'), Inhalt der Spalte setup_norm."""
+    setup = setup or ""
+    for suffix in SETUP_SUFFIXES:
+        if setup.endswith(suffix): return setup[:-len(suffix)]
+    return setup
+
+
+@lru_cache(maxsize=256)
+def split_setup_key(setup_type):
+    """'POC_Bounce_Long' -> ('POC_Bounce', 'LONG'); ohne Richtungs-Suffix ist die Richtung None."""
+    setup = normalize_setup(setup_type)
+    for suffix, direction in (("_Long", "LONG"), ("_Short", "SHORT")):
+        if setup.endswith(suffix): return setup[:-len(suffix)], direction
+    return setup, None
+
+
+class TradeIndex:
+    """
+    Cooldown- und Tages-Index im Speicher, gefüllt aus dem Journal:
+    - pro Symbol der Zeitstempel des letzten Trades (UTC, wie CURRENT_TIMESTAMP)
+    - pro Symbol die heute (trade_date, UTC) gehandelten Setups mit ihren Richtungen
+    log_trade schreibt fort; wechselt das UTC-Datum, wird der Tagesteil geleert.
+    """
     def __init__(self):
+        self.last_trade = {}    # symbol -> Epoch-Sekunden
+        self.today = None       # 'YYYY-MM-DD'
+        self.traded = {}        # symbol -> {setup_norm: {side, ...}}
+        self._day_end = 0.0     # Epoch der nächsten UTC-Mitternacht
+
+    def _start_day(self):
+        now = time.time()
+        self.today = time.strftime("%Y-%m-%d", time.gmtime(now))
+        self._day_end = (int(now) // 86400 + 1) * 86400
+        self.traded = {}
+
+    @staticmethod
+    def _parse(timestamp):
+        try: return calendar.timegm(time.strptime(timestamp, "%Y-%m-%d %H:%M:%S"))
+        except (TypeError, ValueError): return None
+
+    def load(self, conn):
+        """Letzter Trade pro Symbol (Index symbol, timestamp) und die Trades von heute."""
+        rows = conn.execute("SELECT symbol, MAX(timestamp) FROM trades GROUP BY symbol").fetchall()
+        self.last_trade = {symbol: ts for symbol, ts in ((s, self._parse(t)) for s, t in rows) if ts is not None}
+        self.load_today(conn)
+
+    def load_today(self, conn):
+        """Tagesteil für das aktuelle UTC-Datum neu aus dem Journal (ein Index-Lookup pro Symbol)."""
+        self._start_day()
+        for symbol in self.last_trade:
+            for setup, side in conn.execute("SELECT setup_norm, side FROM trades WHERE symbol=? AND trade_date=?",
+                                            (symbol, self.today)):
+                self.traded.setdefault(symbol, {}).setdefault(setup, set()).add(side)
+
+    def _rollover(self):
+        if time.time() >= self._day_end: self._start_day()
+
+    def add(self, symbol, setup_norm, side, timestamp, trade_date):
+        ts = self._parse(timestamp)
+        if ts is not None and (symbol not in self.last_trade or ts > self.last_trade[symbol]):
+            self.last_trade[symbol] = ts
+        self._rollover()
+        if trade_date == self.today:
+            self.traded.setdefault(symbol, {}).setdefault(setup_norm, set()).add(side)
+
+    def traded_today(self, symbol, setup_norm, side=None):
+        self._rollover()
+        sides = self.traded.get(symbol, {}).get(setup_norm)
+        return bool(sides) if side is None else side in (sides or ())
+
+    def minutes_since(self, symbol):
+        last = self.last_trade.get(symbol)
+        if last is None: return 9999
+        return (time.time() - last) / 60
+
+
+class DatabaseHandler:
+    def __init__(self, writer=None):
         self.db_path = cfg.DB_NAME
+        # Optional persistence.WriteBehind: log_trade() schreibt dann im Hintergrund (Index sofort aktuell)
+        self.writer = writer
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL: Lesende Prozesse (Discord, Auswertungen) blockieren den Bot nicht, Commits ohne Journal-Kopie
+        self.conn.execute("PRAGMA journal_mode=WAL")
         self.create_tables()
         self.update_schema()
+        # Cooldown / "heute schon gehandelt" ohne Abfrage pro Durchlauf
+        self.index = TradeIndex()
+        self.index.load(self.conn)
 
     def create_tables(self):
         cursor = self.conn.cursor()
@@ -68,7 +162,8 @@ class DatabaseHandler:
                 symbol TEXT, side TEXT, qty REAL, price REAL,
                 setup TEXT, features TEXT, result REAL DEFAULT 0,
                 status TEXT DEFAULT 'OPEN', ticket_id INTEGER DEFAULT 0,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                setup_norm TEXT, trade_date TEXT
             )
         ''')
         self.conn.commit()
@@ -80,41 +175,84 @@ class DatabaseHandler:
             cols = [info[1] for info in cursor.fetchall()]
             if 'ticket_id' not in cols:
                 cursor.execute("ALTER TABLE trades ADD COLUMN ticket_id INTEGER DEFAULT 0")
+            if 'setup_norm' not in cols or 'trade_date' not in cols:
+                # Abfragefreundliche Spalten nachrüsten und für alle bestehenden Trades füllen
+                t0 = time.time()
+                if 'setup_norm' not in cols: cursor.execute("ALTER TABLE trades ADD COLUMN setup_norm TEXT")
+                if 'trade_date' not in cols: cursor.execute("ALTER TABLE trades ADD COLUMN trade_date TEXT")
+                self.conn.create_function("normalize_setup", 1, normalize_setup, deterministic=True)
+                cursor.execute("UPDATE trades SET setup_norm = normalize_setup(setup), trade_date = date(timestamp)")
+                log.info(f"📦 Trade-Journal migriert: setup_norm/trade_date für {cursor.rowcount} Trades ({time.time() - t0:.1f}s).")
+            # Covering-Indizes für die Abfragen pro Symbol und Durchlauf
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol_date_setup ON trades (symbol, trade_date, setup_norm, side)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol_time ON trades (symbol, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_open ON trades (status) WHERE status = 'OPEN'")
             self.conn.commit()
-        except: pass
+        except Exception as e:
+            self.conn.rollback()
+            log.error(f"❌ Schema-Update der Trade-Datenbank fehlgeschlagen: {e}")
 
     def log_trade(self, symbol, side, qty, price, setup, features_dict=None, ticket_id=0):
+        """Trade ins Journal. Rückgabe: neue id (None, wenn der Writer im Hintergrund schreibt)."""
         import json
         f_json = json.dumps(features_dict) if features_dict else "{}"
+        # Zeitstempel wie CURRENT_TIMESTAMP (UTC), trade_date wie date(timestamp), damit has_traded_today den Index nutzt
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        trade_date = timestamp[:10]
+        params = (symbol, side, float(qty), float(price), setup, f_json, int(ticket_id), normalize_setup(setup), timestamp, trade_date)
+        sql = ("INSERT INTO trades (symbol, side, qty, price, setup, features, status, ticket_id, setup_norm, timestamp, trade_date) "
+               "VALUES (?, ?, ?, ?, ?, ?, 'OPEN', ?, ?, ?, ?)")
+        self.index.add(symbol, normalize_setup(setup), side, timestamp, trade_date)
+        if self.writer is not None:
+            self.writer.execute(self.db_path, sql, params)
+            return None
         cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO trades (symbol, side, qty, price, setup, features, status, ticket_id) VALUES (?, ?, ?, ?, ?, ?, 'OPEN', ?)",
-                       (symbol, side, float(qty), float(price), setup, f_json, int(ticket_id)))
+        cursor.execute(sql, params)
         self.conn.commit()
         return cursor.lastrowid
 
     def has_traded_today(self, symbol, setup_type):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT count(*) FROM trades WHERE symbol=? AND setup LIKE ? AND date(timestamp) = date('now')", (symbol, f"%{setup_type}%"))
-        return cursor.fetchone()[0] > 0
+        """
+        Gab es heute (UTC) schon einen Trade mit diesem Setup? Vergleich über setup_norm,
+        ein '_Long'/'_Short' am Ende prüft zusätzlich die Richtung (z.B. 'POC_Bounce_Long').
+        """
+        setup, side = split_setup_key(setup_type)
+        return self.index.traded_today(symbol, setup, side)
 
     def get_minutes_since_last_trade(self, symbol):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT timestamp FROM trades WHERE symbol=? ORDER BY timestamp DESC LIMIT 1", (symbol,))
-        row = cursor.fetchone()
-        if row:
-            try:
-                diff = datetime.now() - datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-                return diff.total_seconds() / 60
-            except: return 9999
-        return 9999
+        """Minuten seit dem letzten Trade des Symbols (9999 ohne Trade); timestamp ist UTC."""
+        return self.index.minutes_since(symbol)
+
+    def reset_daily_trades(self):
+        """Neuer Handelstag: Tagesteil des Index für das aktuelle UTC-Datum neu aus dem Journal laden."""
+        if self.writer is not None: self.writer.flush()
+        self.index.load_today(self.conn)
+        log.info(f"📅 Tages-Index zurückgesetzt ({self.index.today}): {sum(len(v) for v in self.index.traded.values())} Setups heute gehandelt.")
 
 # --- 3. VOLUME PROFILE ENGINE ---
 class VolumeProfileEngine:
-    def __init__(self):
+    # Zustand eines berechneten Profils (wird pro Symbol gecacht)
+    PROFILE_STATE = ("poc", "vah", "val", "profile_data", "profile_prices", "_lva_below", "_lva_above")
+
+    def __init__(self, mt5_module=None):
         self.poc = None
         self.vah = None
         self.val = None
         self.profile_data = None
+        # Sortierter Preis-Index des Profils für LVA-Abfragen (bei jeder Neuberechnung aktualisiert)
+        self.profile_prices = None
+        self._lva_below = None   # Index der nächsten LVA-Bin <= i (sonst -1)
+        self._lva_above = None   # Index der nächsten LVA-Bin >= i (sonst Anzahl Bins)
+        # Profile pro (Symbol, Fenster, Anker, letzte abgeschlossene Bar), siehe get_profile
+        self.cache = FeatureCache(cfg.PROFILE_CACHE_SIZE)
+        # Letzte Pivot & VWAP pro Symbol (M5), siehe find_last_pivot / calculate_vwap
+        self.anchors = {}
+        # Optional: Profil aus gestreamten Ticks statt aus Kerzen (PROFILE_MODE = "ticks")
+        self.ticks = None
+        self._tick_states = {}
+        if cfg.PROFILE_MODE == "ticks" and mt5_module is not None:
+            self.ticks = TickProfileBook(mt5_module, cfg.TICK_PROFILE_BINS, cfg.TICK_PROFILE_POINTS,
+                                         cfg.TICK_PROFILE_HALFLIFE, cfg.TICK_PROFILE_WARMUP)
 
     def calculate_enhanced_profile(self, df, lookback=96, decay=0.95):
         if df is None or len(df) < 20: return 0,0,0
@@ -133,6 +271,7 @@ class VolumeProfileEngine:
         hist, bin_edges = np.histogram(subset['close'], bins=50, weights=subset['weighted_vol'])
         hist_smooth = pd.Series(hist).rolling(window=3, center=True, min_periods=1).mean().fillna(0).values
         self.profile_data = pd.DataFrame({'vol': hist_smooth, 'price': bin_edges[:-1]})
+        self._index_profile(hist_smooth, bin_edges[:-1], self.profile_data['vol'].mean() * 0.40)
         
         self.poc = self.profile_data.loc[self.profile_data['vol'].idxmax(), 'price']
         total_v = self.profile_data['vol'].sum()
@@ -147,22 +286,128 @@ class VolumeProfileEngine:
             self.vah = self.val = self.poc
         return self.poc, self.vah, self.val
 
-    def find_nearest_lva(self, df, current_price, direction="DOWN"):
-        if self.profile_data is None: return None
-        threshold = self.profile_data['vol'].mean() * 0.40
+    def get_profile(self, symbol, df, lookback=96, decay=0.95):
+        """
+        calculate_enhanced_profile mit Cache: höchstens eine Berechnung pro Bar und
+        (Symbol, Fenster, Anker = erste Kerze im Fenster); die laufende Kerze dient als Validator.
+        Lädt das Profil des Symbols in die Engine, find_nearest_lva gilt danach für dieses Symbol.
+        """
+        if self.ticks is not None and self._load_tick_profile(symbol):
+            return self.poc, self.vah, self.val
+        if df is None or len(df) < 20: return 0, 0, 0
+        window = df.iloc[-lookback:]
+        anchor = window['time'].values[0] if 'time' in window.columns else window.index.values[0]
+
+        def compute():
+            self.calculate_enhanced_profile(window, lookback, decay)
+            return {k: getattr(self, k) for k in self.PROFILE_STATE}
+
+        state = self.cache.get((symbol, lookback, decay, anchor), window, compute)
+        for k, v in state.items(): setattr(self, k, v)
+        return self.poc, self.vah, self.val
+
+    def _load_tick_profile(self, symbol):
+        """Tick-Profil des Symbols laden (nur bei neuen Ticks neu auswerten). False, solange keine Ticks da sind."""
+        self.ticks.sync(symbol)
+        version = self.ticks.version(symbol)
+        if version is None: return False
+        cached = self._tick_states.get(symbol)
+        if cached is None or cached[0] != version:
+            vol, prices = self.ticks.profile(symbol, sync=False)
+            vol, self.poc, self.vah, self.val = histogram_levels(vol, prices)
+            self.profile_data = pd.DataFrame({'vol': vol, 'price': prices})
+            self._index_profile(vol, prices, self.profile_data['vol'].mean() * 0.40)
+            cached = self._tick_states[symbol] = (version, {k: getattr(self, k) for k in self.PROFILE_STATE})
+        for k, v in cached[1].items(): setattr(self, k, v)
+        return True
+
+    def _anchor_tracker(self, symbol, df):
+        """Tracker des Symbols auf den Stand des Frames bringen. Rückgabe: (Tracker, Kerzenzeiten)."""
+        tracker = self.anchors.get(symbol)
+        if tracker is None:
+            tracker = self.anchors[symbol] = AnchorTracker()
+        return tracker, tracker.update_frame(df)
+
+    def find_last_pivot(self, df, symbol=None):
+        """
+        Index-Label der letzten bestätigten Swing-Pivot-Kerze (für df.loc[anchor:]), sonst die erste Kerze.
+        Mit symbol inkrementell (nur neue Kerzen), ohne symbol per Scan über den Frame.
+        """
+        if symbol is None:
+            _, high, low, _, _ = frame_arrays(df)
+            pos = last_pivot(high[:-1], low[:-1])
+            return df.index[0] if pos is None else df.index[pos]
+        tracker, times = self._anchor_tracker(symbol, df)
+        if tracker.pivot_time is None: return df.index[0]
+        pos = np.searchsorted(times, tracker.pivot_time)
+        return df.index[pos] if pos < len(times) and times[pos] == tracker.pivot_time else df.index[0]
+
+    def calculate_vwap(self, df, symbol=None, anchor="session"):
+        """
+        VWAP inkl. laufender Kerze: anchor="session" ab Tagesbeginn (Serverzeit), "pivot" ab der
+        letzten Swing-Pivot (sonst Session). Mit symbol inkrementell, ohne symbol über den Frame.
+        """
+        if symbol is None:
+            times, high, low, close, volume = frame_arrays(df)
+            start = last_pivot(high[:-1], low[:-1]) if anchor == "pivot" else None
+            if start is None: start = session_start(times)
+            return vwap(high[start:], low[start:], close[start:], volume[start:])
+        tracker, times = self._anchor_tracker(symbol, df)
+        t, h, l, c, v = last_bar(df, times)
+        if anchor == "pivot":
+            value = tracker.anchored_vwap(h, l, c, v)
+            if value is not None: return value
+        return tracker.session_vwap(t, h, l, c, v)
+
+    def _index_profile(self, vol, prices, threshold):
+        """LVA = Bins unter 40% des mittleren Volumens; nächste LVA links/rechts jeder Bin vorberechnen."""
+        n = len(prices)
+        idx = np.arange(n)
+        is_lva = vol < threshold
+        self.profile_prices = prices   # Bin-Untergrenzen, aufsteigend (np.histogram)
+        self._lva_below = np.maximum.accumulate(np.where(is_lva, idx, -1))
+        self._lva_above = np.minimum.accumulate(np.where(is_lva, idx, n)[::-1])[::-1]
+
+    def _lva_index(self, prices, direction):
+        """Bin-Index der nächsten LVA pro Preis und Maske, wo eine existiert."""
+        n = len(self.profile_prices)
         if direction == "DOWN":
-            cands = self.profile_data[self.profile_data['price'] < current_price].sort_values(by='price', ascending=False)
-        else:
-            cands = self.profile_data[self.profile_data['price'] > current_price].sort_values(by='price', ascending=True)
-        for _, r in cands.iterrows():
-            if r['vol'] < threshold: return r['price']
-        return None
+            # Bins mit Preis < current_price, davon die höchste LVA
+            k = np.searchsorted(self.profile_prices, prices, side='left') - 1
+            hit = self._lva_below[np.maximum(k, 0)]
+            return hit, (k >= 0) & (hit >= 0)
+        # Bins mit Preis > current_price, davon die niedrigste LVA
+        k = np.searchsorted(self.profile_prices, prices, side='right')
+        hit = self._lva_above[np.minimum(k, n - 1)]
+        return hit, (k < n) & (hit < n)
+
+    def nearest_lva_batch(self, prices, direction="DOWN"):
+        """Nächste LVA unterhalb ("DOWN") bzw. oberhalb ("UP") für viele Preise; NaN, wo es keine gibt."""
+        prices = np.asarray(prices, dtype=np.float64)
+        out = np.full(prices.shape, np.nan)
+        if self.profile_prices is None: return out
+        hit, ok = self._lva_index(prices, direction)
+        out[ok] = self.profile_prices[hit[ok]]
+        return out
+
+    def find_nearest_lva(self, df, current_price, direction="DOWN"):
+        if self.profile_prices is None: return None
+        hit, ok = self._lva_index(np.array([current_price], dtype=np.float64), direction)
+        return self.profile_prices[hit[0]] if ok[0] else None
 
 # --- 4. AI ENGINE ---
 class AIEngine:
-    def __init__(self):
+    def __init__(self, writer=None):
         self.models_dir = "ai_models"
-        self.models = {}
+        # Optional persistence.WriteBehind für save_experience()
+        self.writer = writer
+        # Modelle pro "SYMBOL_TF" (einmal laden, LRU bei Speicherbudget)
+        self.models = ModelRegistry(self.models_dir, cfg.MODEL_MEMORY_MB,
+                                    cfg.MODEL_MMAP_MODE, compile=cfg.MODEL_COMPILE)
+        # Inkrementelle Features pro (Symbol, TF) für die Live-Prognose
+        self.streams = FeatureStreams()
+        # Ergebnisse pro (Symbol, TF, letzte Bar), damit ein Durchlauf nichts doppelt rechnet
+        self.feature_cache = FeatureCache(cfg.FEATURE_CACHE_SIZE)
         if not os.path.exists(self.models_dir): os.makedirs(self.models_dir)
 
     def feature_engineering(self, df):
@@ -204,26 +449,30 @@ class AIEngine:
             log.error(f"Feature Error: {e}")
             return pd.DataFrame()
 
-    def get_prediction_proba_all(self, symbol, df, tf_name="M5"):
+    def get_features(self, symbol, df, tf_name="M5"):
+        """Feature-Vektor (FEATURE_LIST) der letzten Kerze, über den Feature-Cache."""
         model_key = f"{symbol}_{tf_name}"
-        model = self.models.get(model_key)
-        if model is None:
-            fn = os.path.join(self.models_dir, f"{model_key}_model.pkl")
-            if os.path.exists(fn):
-                try: 
-                    model = joblib.load(fn)
-                    model.n_jobs = 1
-                    self.models[symbol] = model
-                except: return [1.0, 0.0, 0.0]
-            else: return [1.0, 0.0, 0.0]
+        def compute():
+            # O(1) pro neuer Kerze statt pandas_ta über das ganze Fenster
+            x = self.streams.latest_from_frame(model_key, df)
+            if x is None:
+                x = self.feature_engineering(df)[FEATURE_LIST].iloc[-1].values
+            return x
+        return self.feature_cache.get((symbol, tf_name, "vector"), df, compute)
 
-        try:
+    def get_feature_row(self, symbol, df, tf_name="M5"):
+        """Komplette letzte Zeile von feature_engineering als dict (Shadow-Trades, DB), gecacht."""
+        def compute():
             data = self.feature_engineering(df)
-            feats = ['rsi', 'stoch_k', 'cci', 'rsi_prev1', 'rsi_prev2', 'macd_hist', 'trend_strength', 
-                     'macd_hist_prev1', 'macd_hist_prev2', 'bb_pct', 'bb_width', 'atr', 'mfi', 
-                     'obv_slope', 'wick_upper', 'wick_lower', 'is_doji', 'engulfing']
-            
-            X = data[feats].iloc[-1].values.reshape(1, -1)
+            return data.iloc[-1].to_dict() if not data.empty else {}
+        return dict(self.feature_cache.get((symbol, tf_name, "row"), df, compute))
+
+    def get_prediction_proba_all(self, symbol, df, tf_name="M5"):
+        model = self.models.get(f"{symbol}_{tf_name}")
+        if model is None: return [1.0, 0.0, 0.0]
+
+        try:
+            X = self.get_features(symbol, df, tf_name).reshape(1, -1)
             probs = model.predict_proba(X)[0]
             
             # WICHTIG: Mapping für 3 Klassen (0=Nix, 1=Win/Long, 2=Loss/Short)
@@ -245,5 +494,10 @@ class AIEngine:
     def save_experience(self, symbol, features, label):
         fp = os.path.join(self.models_dir, "smart_memory.csv")
         data = features.copy(); data['symbol'] = symbol; data['Target'] = label
+        if self.writer is not None:
+            # Import hier: persistence importiert `log` aus diesem Modul (Zyklus beim Modul-Import)
+            from persistence import csv_line
+            self.writer.append(fp, csv_line(data.values()), header=csv_line(data.keys()))
+            return
         df_new = pd.DataFrame([data])
         df_new.to_csv(fp, mode='a', header=not os.path.exists(fp), index=False)
@@ -0,0 +1,60 @@
+# labels.py
+import numpy as np
+
+# Ergebnis-Codes wie StrategyAITrainer (0 = Timeout/Nix, 1 = TP zuerst, 2 = SL zuerst)
+TIMEOUT, TP_FIRST, SL_FIRST = 0, 1, 2
+
+# Standard des Trainers: TP 2.5 ATR, SL 1.5 ATR, 48 Kerzen
+DEFAULT_BARRIERS = ((2.5, 1.5, 48),)
+
+
+def _first_true(mask):
+    """Index der ersten True-Spalte pro Zeile, sonst Spaltenanzahl (= nie)."""
+    first = mask.argmax(axis=1)
+    first[~mask.any(axis=1)] = mask.shape[1]
+    return first
+
+
+def triple_barrier_labels(high, low, close, atr, idx, sides, barriers=DEFAULT_BARRIERS):
+    """
+    First-Touch-Labels für alle Kandidaten auf einmal (statt iterrows pro Signal).
+    idx:      Signal-Bars (Einstieg = close[i], ATR = atr[i])
+    sides:    "LONG"/"SHORT" (oder +1/-1) pro Kandidat
+    barriers: Folge von (tp_atr, sl_atr, horizon) – alle Konfigurationen in einem Durchlauf
+    Geprüft werden die Bars i+1 .. i+horizon (am Datenende gekürzt). Berühren TP und SL
+    dieselbe Kerze, zählt TP (gleiche Reihenfolge wie simulate_outcome).
+    Rückgabe: int8-Array (len(barriers), len(idx)).
+    """
+    high, low, close, atr = (np.asarray(a, dtype=np.float64) for a in (high, low, close, atr))
+    idx = np.asarray(idx, dtype=np.int64)
+    sides = np.asarray(sides)
+    if sides.dtype.kind in "US":
+        sides = np.where(sides == "LONG", 1, -1)
+    is_long = sides > 0
+
+    out = np.zeros((len(barriers), len(idx)), dtype=np.int8)
+    if len(idx) == 0: return out
+
+    # Zukunftsfenster einmal für den größten Horizont; nach dem Datenende NaN (nie berührt)
+    max_h = max(h for _, _, h in barriers)
+    pad = np.full(max_h, np.nan)
+    ahead = idx[:, None] + 1 + np.arange(max_h)
+    fut_high = np.concatenate([high, pad])[ahead]
+    fut_low = np.concatenate([low, pad])[ahead]
+
+    entry, risk = close[idx], atr[idx]
+    # Günstige Seite (TP) und ungünstige Seite (SL) aus Sicht der Richtung
+    fav = np.where(is_long[:, None], fut_high, -fut_low)
+    adv = np.where(is_long[:, None], fut_low, -fut_high)
+    signed_entry = np.where(is_long, entry, -entry)
+
+    with np.errstate(invalid='ignore'):
+        for k, (tp_atr, sl_atr, horizon) in enumerate(barriers):
+            tp = signed_entry + risk * tp_atr
+            sl = signed_entry - risk * sl_atr
+            first_tp = _first_true(fav[:, :horizon] >= tp[:, None])
+            first_sl = _first_true(adv[:, :horizon] <= sl[:, None])
+            out[k] = np.where(first_tp <= first_sl,
+                              np.where(first_tp < horizon, TP_FIRST, TIMEOUT),
+                              SL_FIRST)
+    return out
@@ -19,8 +19,10 @@ from mt5_handler import MT5Handler
 from infrastructure import DatabaseHandler, VolumeProfileEngine, AIEngine, log, timedelta
 from risk_manager import RiskManager
 from settings import cfg
+from features import FEATURE_LIST
 import numpy as np
 from advanced_engine import AdvancedMarketEngine # <--- NEU
+from persistence import WriteBehind
 import joblib
 # Unterdrückt die nervigen Parallel-Warnungen
 warnings.filterwarnings("ignore", category=UserWarning, module="sklearn.utils.parallel")
@@ -48,12 +50,15 @@ class EnterpriseBot:
             self.current_login = 0
             log.warning("⚠️ Konnte Account-ID nicht lesen. Setze auf 0.")
 
-        self.db = DatabaseHandler()
-        self.adv_engine = AdvancedMarketEngine(self.mt5, self.db)
+        # Journal, Shadows, MFE/MAE, Lern-CSV und Status-Dateien: ein Schreib-Thread (Group Commit, gepuffert)
+        self.writer = WriteBehind(cfg.PERSIST_FLUSH_SECONDS, cfg.PERSIST_QUEUE_SIZE, background=cfg.PERSIST_WRITE_BEHIND)
+        self.db = DatabaseHandler(self.writer)
+        self.adv_engine = AdvancedMarketEngine(self.mt5, self.db, self.writer, migrate_legacy=True)
         log.info("🧠 Advanced AI Engine geladen (Shadows, MFE/MAE, Regime).")
 
-        self.vp_engine = VolumeProfileEngine()
-        self.ai = AIEngine()
+        self.vp_engine = VolumeProfileEngine(self.mt5.mt5)
+        self.ai = AIEngine(self.writer)
+        self.ai.models.preload(workers=cfg.MODEL_PRELOAD_WORKERS)
         self.risk_manager = RiskManager(self.mt5)
         
         # Hilfsvariablen
@@ -61,12 +66,11 @@ class EnterpriseBot:
         self.tz_ny = pytz.timezone('America/New_York')
         self.last_heartbeat = 0
     
-    def get_current_features(self, df_m5):
+    def get_current_features(self, symbol, df_m5):
         """Extrahiert die nackten Zahlen, die die AI sieht"""
-        df_m5_feat = self.ai.feature_engineering(df_m5.copy())
-        if df_m5_feat.empty: return {}
+        last_row = self.ai.get_feature_row(symbol, df_m5, tf_name="M5")
+        if not last_row: return {}
         
-        last_row = df_m5_feat.iloc[-1].to_dict()
         clean_features = {k: v for k, v in last_row.items() if isinstance(v, (int, float))}
         return clean_features
 
@@ -75,8 +79,11 @@ class EnterpriseBot:
             positions = self.mt5.mt5.positions_get()
             if positions:
                 for pos in positions:
+                    # Frischer Tick pro Position (einmal statt zweimal)
+                    tick = self.mt5.get_tick(pos.symbol, refresh=True)
+
                     # --- DYNAMISCHER FILLING MODE FIX ---
-                    symbol_info = self.mt5.mt5.symbol_info(pos.symbol)
+                    symbol_info = self.mt5.symbols.get_static(pos.symbol)
                     # Wir prüfen, was der Broker erlaubt (1=FOK, 2=IOC, 3=Beides)
                     filling = symbol_info.filling_mode
                     
@@ -93,7 +100,7 @@ class EnterpriseBot:
                         "symbol": pos.symbol,
                         "volume": pos.volume,
                         "type": self.mt5.mt5.ORDER_TYPE_SELL if pos.type == 0 else self.mt5.mt5.ORDER_TYPE_BUY,
-                        "price": self.mt5.mt5.symbol_info_tick(pos.symbol).bid if pos.type == 0 else self.mt5.mt5.symbol_info_tick(pos.symbol).ask,
+                        "price": tick.bid if pos.type == 0 else tick.ask,
                         "magic": 234000,
                         "comment": comment,
                         "type_time": self.mt5.mt5.ORDER_TIME_GTC,
@@ -211,22 +218,15 @@ class EnterpriseBot:
         if timeframe is None:
             timeframe = self.mt5.mt5.TIMEFRAME_M5 
             
-        rates = self.mt5.mt5.copy_rates_from_pos(symbol, timeframe, 0, 500)
-        
-        if rates is None or len(rates) == 0: return None
-        
-        df_m5 = pd.DataFrame(rates)
-        df_m5['time'] = pd.to_datetime(df_m5['time'], unit='s')
-        df_m5.rename(columns={'tick_volume': 'volume'}, inplace=True)
-        df_m5.set_index('time', inplace=True)
-        return df_m5
+        # Inkrementell: nur neue Kerzen werden vom Terminal geholt
+        return self.mt5.candles.get_frame(symbol, timeframe)
 
     def manage_running_trades(self):
         """
         Verwaltet offene Trades.
         NEU: Night Guard und korrigiertes, dynamisches Smart Trailing.
         """
-        positions = self.mt5.mt5.positions_get()
+        positions = self.mt5.snapshot.positions
         if not positions: return
 
         # --- NIGHT GUARD: ZWANGS-SCHLIESSUNG VOR ROLLOVER ---
@@ -258,7 +258,7 @@ class EnterpriseBot:
         try:
             for pos in positions:
                 symbol = pos.symbol
-                tick = self.mt5.mt5.symbol_info_tick(symbol)
+                tick = self.mt5.get_tick(symbol)
                 if not tick: continue
                 
                 # Preise definieren
@@ -280,17 +280,17 @@ class EnterpriseBot:
                 progress = dist_now / dist_total
                 
                 # FIX: Dynamischer Puffer basierend auf Punktewert (funktioniert bei JPY, EUR, Krypto)
-                point = self.mt5.mt5.symbol_info(symbol).point
+                point = self.mt5.symbols.get_static(symbol).point
                 BUFFER = point * 30 # 30 Points = exakt 3 Pips Abstand
 
                 # LVA vorbereiten (Nur wenn über 50%, spart CPU)
                 lva = None
                 if progress >= 0.50:
-                    candles = self.mt5.copy_rates_from_pos(symbol, self.mt5.mt5.TIMEFRAME_M5, 0, 500)
-                    if candles is not None:
-                        df_m5_trail = pd.DataFrame(candles)
-                        # FIX: Profil MUSS für dieses Symbol berechnet werden!
-                        self.vp_engine.calculate_enhanced_profile(df_m5_trail)
+                    # Gleicher Frame wie im Scan -> Profil kommt meist aus dem Cache
+                    df_m5_trail = self.fetch_candles(symbol, timeframe=self.mt5.mt5.TIMEFRAME_M5)
+                    if df_m5_trail is not None:
+                        # FIX: Profil MUSS für dieses Symbol geladen werden!
+                        self.vp_engine.get_profile(symbol, df_m5_trail)
                         direction_lva = "DOWN" if pos.type == self.mt5.mt5.ORDER_TYPE_BUY else "UP"
                         lva = self.vp_engine.find_nearest_lva(df_m5_trail, current_price, direction=direction_lva)
 
@@ -382,13 +382,14 @@ class EnterpriseBot:
             log.warning(f"🔄 FALSE BREAKOUT BEI {symbol}: Drehe Position sofort auf {new_side}!")
             
             # 1. Alten Trade schließen (Dein bestehender Code)
+            tick = self.mt5.get_tick(symbol, refresh=True)
             close_req = {
                 "action": self.mt5.mt5.TRADE_ACTION_DEAL,
                 "position": pos.ticket,
                 "symbol": symbol,
                 "volume": pos.volume,
                 "type": self.mt5.mt5.ORDER_TYPE_SELL if pos.type == 0 else self.mt5.mt5.ORDER_TYPE_BUY,
-                "price": self.mt5.mt5.symbol_info_tick(symbol).bid if pos.type == 0 else self.mt5.mt5.symbol_info_tick(symbol).ask,
+                "price": tick.bid if pos.type == 0 else tick.ask,
                 "magic": 234000,
                 "comment": "Switch Close",
             }
@@ -400,6 +401,7 @@ class EnterpriseBot:
 
             # 2. Neuen Trade öffnen (Dein bestehender Code für vol, sl_dist, tp_dist etc.)
             vol = pos.volume * MULTIPLIER
+            tick = self.mt5.get_tick(symbol, refresh=True)
             sl_dist = 0.0020 * current_price 
             tp_dist = 0.0040 * current_price 
             
@@ -407,12 +409,12 @@ class EnterpriseBot:
                 new_sl = current_price - sl_dist
                 new_tp = current_price + tp_dist
                 order_type = self.mt5.mt5.ORDER_TYPE_BUY
-                price_open = self.mt5.mt5.symbol_info_tick(symbol).ask
+                price_open = tick.ask
             else:
                 new_sl = current_price + sl_dist
                 new_tp = current_price - tp_dist
                 order_type = self.mt5.mt5.ORDER_TYPE_SELL
-                price_open = self.mt5.mt5.symbol_info_tick(symbol).bid
+                price_open = tick.bid
 
             req_new = {
                 "action": self.mt5.mt5.TRADE_ACTION_DEAL,
@@ -457,11 +459,8 @@ class EnterpriseBot:
         today_str = datetime.now().strftime("%Y-%m-%d")
         login_str = str(account.login)
         
-        data = {}
-        if os.path.exists(filename):
-            try:
-                with open(filename, "r") as f: data = json.load(f)
-            except: data = {}
+        # Noch nicht geschriebener Stand zählt schon (sonst doppelter Reset bis zum Flush)
+        data = dict(self.writer.read_json(filename) or {})
 
         account_data = data.get(login_str, {})
         saved_date = account_data.get("date", "")
@@ -477,9 +476,7 @@ class EnterpriseBot:
                 "start_equity": account.equity
             }
             data[login_str] = account_data
-            
-            with open(filename, "w") as f:
-                json.dump(data, f, indent=4)
+            self.writer.write_json(filename, data, indent=4)
                 
             return account.balance
         else:
@@ -545,7 +542,8 @@ class EnterpriseBot:
                             if init_login_success:
                                 log.info(f"✅ ERFOLG: Verbindung & Login für {json_login} hergestellt!")
                                 self.current_login = json_login
-                                self.vp_engine = VolumeProfileEngine() 
+                                self.vp_engine = VolumeProfileEngine(self.mt5.mt5)
+                                self.mt5.candles.clear()
                                 
                                 # Alles resetten und starten
                                 self.update_status("running")
@@ -637,8 +635,12 @@ class EnterpriseBot:
                 if time.time() - self.last_heartbeat > 300:
                     now_ny = datetime.now(self.tz_ny)
                     log.info(f"💓 Bot läuft | NY-Zeit: {now_ny.strftime('%H:%M')} | Equity: {account.equity if account else 0:.2f}")
+                    log.info(f"💾 Schreib-Thread: {self.writer.report()}")
                     self.last_heartbeat = time.time()
 
+                # Ein Tick-Snapshot pro Durchlauf für alle Subsysteme
+                self.mt5.refresh_snapshot(cfg.SYMBOLS)
+
                 # Laufende Trades managen & Lernen
                 self.manage_running_trades()
 
@@ -648,10 +650,13 @@ class EnterpriseBot:
                 # 1. Shadow Trades prüfen
                 self.adv_engine.update_shadow_trades()
                 
-                # 2. MFE / MAE Tracker für laufende Trades
-                positions = self.mt5.mt5.positions_get()
-                if positions:
-                    self.adv_engine.update_trade_performance_stats(positions)
+                # 2. MFE / MAE Tracker für laufende Trades (auch ohne Positionen: geschlossene archivieren,
+                #    aber nicht, wenn positions_get() fehlgeschlagen ist)
+                snapshot = self.mt5.snapshot
+                positions = snapshot.positions
+                if not snapshot.positions_ok:
+                    log.warning("⚠️ positions_get() fehlgeschlagen: MFE/MAE-Tracker wertet keine Trades als geschlossen.")
+                self.adv_engine.update_trade_performance_stats(positions, snapshot.positions_ok)
                 # ==========================================
 
                 self.learn_from_past_trades()
@@ -685,7 +690,7 @@ class EnterpriseBot:
                             print(f"⏳ {symbol}: Cooldown läuft noch.")
                             continue
                         
-                        tick = self.mt5.mt5.symbol_info_tick(symbol)
+                        tick = self.mt5.get_tick(symbol)
                         if not tick or tick.ask == 0: 
                             #print(f"❌ {symbol}: MT5 liefert keine Preise (Marktübersicht prüfen!)")
                             continue
@@ -806,12 +811,12 @@ class EnterpriseBot:
                         except:
                             current_atr = (df_m5['high'] - df_m5['low']).tail(14).mean()
 
-                        anchor_idx = self.vp_engine.find_last_pivot(df_m5)
+                        anchor_idx = self.vp_engine.find_last_pivot(df_m5, symbol)
                         df_m5_anchored = df_m5.loc[anchor_idx:]
                         if len(df_m5_anchored) < 10: df_m5_anchored = df_m5.tail(96)
 
-                        poc, vah, val = self.vp_engine.calculate_enhanced_profile(df_m5_anchored)
-                        vwap = self.vp_engine.calculate_vwap(df_m5)
+                        poc, vah, val = self.vp_engine.get_profile(symbol, df_m5_anchored)
+                        vwap = self.vp_engine.calculate_vwap(df_m5, symbol)
                         zone_tolerance = current_atr * 0.5
 
                         log.info(f"🔎 [{symbol}] Filter bestanden | M5-AI:{score_m5:.2f} | M1-AI:{score_m1:.2f} | POC:{poc:.2f}")
@@ -914,6 +919,18 @@ class EnterpriseBot:
                                         final_tp = get_logical_tp("SHORT", mid_price, final_sl)
                                         signal = {"side": "SHORT", "tp": final_tp, "sl": final_sl, "setup": "POC_Bounce_Smart"}
 
+                        # --- EXIT-PARAMETER AUS DEM OPTIMIZER (exit_params.json, bei Änderung neu geladen) ---
+                        if signal and cfg.EXIT_PARAMS_APPLY:
+                            exit_p = self.adv_engine.exit_params(symbol, signal['setup'])
+                            # Nur die beste Variante ohne Breakeven/Trailing: Breakeven/Trailing des Rasters wenden
+                            # echte Trades nicht an, deren gemessener Erwartungswert gilt live also nicht
+                            exit_p = exit_p.get('plain') if exit_p else None
+                            if exit_p and current_atr > 0:
+                                direction = 1 if signal['side'] == "LONG" else -1
+                                signal['sl'] = mid_price - direction * exit_p['sl_m'] * current_atr
+                                signal['tp'] = mid_price + direction * exit_p['tp_m'] * current_atr
+                                log.info(f"🎯 {symbol} {signal['setup']}: Optimizer-Exits SL {exit_p['sl_m']} / TP {exit_p['tp_m']} ATR")
+
                         # --- EXECUTION ---
                         if signal:
                             shares = 0 
@@ -945,13 +962,13 @@ class EnterpriseBot:
                                     
                                 if success:
                                     # 👻 SHADOW TRADES STARTEN
-                                    try: current_atr = df_m5.ta.atr(length=14).iloc[-1]
+                                    try: current_atr = self.ai.get_features(symbol, df_m5, tf_name="M5")[FEATURE_LIST.index('atr')]
                                     except: current_atr = mid_price * 0.002
 
-                                    current_features = self.ai.feature_engineering(df_m5).iloc[-1].to_dict()    
-                                    self.adv_engine.spawn_shadow_trades(symbol, signal['side'], mid_price, current_atr, current_features)
+                                    current_features = self.ai.get_feature_row(symbol, df_m5, tf_name="M5")
+                                    self.adv_engine.spawn_shadow_trades(symbol, signal['side'], mid_price, current_atr, current_features, signal['setup'])
 
-                                    features = self.get_current_features(df_m5)
+                                    features = self.get_current_features(symbol, df_m5)
                                         
                                     ticket_id = 0
                                     try:
@@ -989,14 +1006,15 @@ class EnterpriseBot:
                         "symbol_active": "Scan beendet..."
                     }
                     
-                    with open("monitor.json", "w") as f:
-                        json.dump(monitor_data, f)
+                    self.writer.write_json("monitor.json", monitor_data)
                 except Exception as mon_err:
                     pass 
 
                 time.sleep(5) 
 
             except KeyboardInterrupt:
+                log.info(f"💾 Schreibe ausstehende Daten... ({self.writer.depth} in der Queue)")
+                self.writer.close()
                 sys.exit()
             except Exception as e:
                 log.error(f"Main Loop Error: {e}")
@@ -0,0 +1,300 @@
+# market_data.py
+import time
+import numpy as np
+import pandas as pd
+from infrastructure import log
+
+
+# --- 1. KERZEN CACHE ---
+class _RateBuffer:
+    """
+    Ringpuffer fester Größe für die MT5-Kerzen eines (Symbol, Timeframe).
+    Intern doppelt so groß wie die Kapazität: neue Bars werden hinten angehängt und
+    erst am Ende des Speichers einmal nach vorne geschoben. Dadurch ist das aktuelle
+    Fenster immer ein zusammenhängender NumPy-View (keine Kopie pro Abruf).
+    """
+    def __init__(self, rates, capacity):
+        self.capacity = capacity
+        self.buf = np.zeros(capacity * 2, dtype=rates.dtype)
+        self.end = 0
+        self.appended = 0   # Zählt neue Bars (Fenster hat sich verschoben)
+        self.version = 0    # Zählt jede Änderung (auch Update der laufenden Kerze)
+        self.extend(rates)
+
+    def __len__(self):
+        return min(self.end, self.capacity)
+
+    @property
+    def last_time(self):
+        return int(self.buf['time'][self.end - 1]) if self.end else 0
+
+    def view(self, count=None):
+        n = len(self) if count is None else min(count, len(self))
+        return self.buf[self.end - n:self.end]
+
+    def extend(self, rates):
+        n = len(rates)
+        if n == 0: return
+        if n >= self.capacity:
+            self.buf[:self.capacity] = rates[-self.capacity:]
+            self.end = self.capacity
+        else:
+            if self.end + n > len(self.buf):
+                # Fenster nach vorne schieben (amortisiert O(1) pro Bar)
+                keep = self.capacity - n
+                self.buf[:keep] = self.buf[self.end - keep:self.end]
+                self.end = keep
+            self.buf[self.end:self.end + n] = rates
+            self.end += n
+        self.appended += 1
+        self.version += 1
+
+    def replace_last(self, rate):
+        if self.buf[self.end - 1] != rate:
+            self.buf[self.end - 1] = rate
+            self.version += 1
+
+
+class CandleCache:
+    """
+    Inkrementeller Kerzen-Cache pro (Symbol, Timeframe).
+    Beim ersten Zugriff werden `size` Bars geladen, danach nur noch die Bars ab der
+    letzten gecachten Kerze (die laufende Kerze wird dabei aktualisiert).
+    Achtung: Views und Frames sind nur bis zum nächsten Sync gültig und dürfen nicht
+    verändert werden.
+    """
+    def __init__(self, mt5_module, size=500):
+        self.mt5 = mt5_module
+        self.size = size
+        self._buffers = {}
+        self._frames = {}
+        self.stats = {"full_loads": 0, "incremental": 0, "frame_builds": 0}
+
+    def clear(self):
+        """Z.B. nach Account-Wechsel: Historie kann sich geändert haben."""
+        self._buffers.clear()
+        self._frames.clear()
+
+    def evict(self, symbol, timeframe):
+        """Gibt den Puffer frei (z.B. nach dem Training großer Historien)."""
+        self._buffers.pop((symbol, timeframe), None)
+        self._frames.pop((symbol, timeframe), None)
+
+    def _full_load(self, key, capacity):
+        symbol, timeframe = key
+        rates = self.mt5.copy_rates_from_pos(symbol, timeframe, 0, capacity)
+        if rates is None or len(rates) == 0:
+            self._buffers.pop(key, None)
+            return None
+        self.stats["full_loads"] += 1
+        buf = _RateBuffer(rates, capacity)
+        self._buffers[key] = buf
+        return buf
+
+    def _sync(self, symbol, timeframe, count=None):
+        key = (symbol, timeframe)
+        capacity = max(count or 0, self.size)
+        buf = self._buffers.get(key)
+        if buf is None or buf.capacity < capacity:
+            return self._full_load(key, capacity)
+
+        # Nur den Schwanz holen: klein anfangen, bei Lücke vergrößern
+        n = 2
+        while True:
+            rates = self.mt5.copy_rates_from_pos(symbol, timeframe, 0, n)
+            if rates is None or len(rates) == 0:
+                return buf
+            if rates['time'][0] <= buf.last_time or len(rates) < n:
+                break
+            n *= 4
+            if n >= buf.capacity:
+                return self._full_load(key, buf.capacity)
+
+        self.stats["incremental"] += 1
+        fresh = rates[rates['time'] >= buf.last_time]
+        if len(fresh) and fresh['time'][0] == buf.last_time:
+            buf.replace_last(fresh[0])
+            fresh = fresh[1:]
+        buf.extend(fresh)
+        return buf
+
+    def get_rates(self, symbol, timeframe, count=None):
+        """Aktuelle Kerzen als NumPy-View (älteste zuerst), oder None."""
+        buf = self._sync(symbol, timeframe, count)
+        if buf is None: return None
+        return buf.view(count)
+
+    def get_frame(self, symbol, timeframe):
+        """
+        DataFrame im Format von EnterpriseBot.fetch_candles (time-Index, 'volume').
+        Wird nur bei neuer Kerze neu gebaut, sonst wird die letzte Zeile aktualisiert.
+        """
+        key = (symbol, timeframe)
+        buf = self._sync(symbol, timeframe)
+        if buf is None:
+            self._frames.pop(key, None)
+            return None
+
+        cached = self._frames.get(key)
+        if cached is not None:
+            appended, version, df = cached
+            if appended == buf.appended:
+                if version != buf.version:
+                    last = buf.view(1)[0]
+                    df.iloc[-1] = [last[c] for c in buf.buf.dtype.names if c != 'time']
+                    self._frames[key] = (appended, buf.version, df)
+                return df
+
+        df = pd.DataFrame(buf.view())
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        df.rename(columns={'tick_volume': 'volume'}, inplace=True)
+        df.set_index('time', inplace=True)
+        self.stats["frame_builds"] += 1
+        self._frames[key] = (buf.appended, buf.version, df)
+        return df
+
+
+# --- 2. MARKT SNAPSHOT ---
+class MarketSnapshot:
+    """
+    Ein Tick pro Symbol, einmal pro Loop-Durchlauf vom Terminal gelesen.
+    Alle Subsysteme (Scan, Trailing, Shadows, MFE/MAE) lesen daraus.
+    Für Order-Submission kann mit refresh=True ein frischer Tick erzwungen werden.
+    """
+    def __init__(self, mt5_module):
+        self.mt5 = mt5_module
+        self.created = time.time()
+        self.ticks = {}
+        self.terminal_calls = 0
+        self._positions = None
+        # False, wenn positions_get() fehlgeschlagen ist (None): dann ist `positions` leer, aber nicht "alle geschlossen"
+        self.positions_ok = True
+
+    @classmethod
+    def capture(cls, mt5_module, symbols):
+        snap = cls(mt5_module)
+        positions = snap.positions
+        wanted = dict.fromkeys(list(symbols) + [p.symbol for p in positions])
+        for symbol in wanted:
+            snap.tick(symbol, refresh=True)
+        return snap
+
+    @property
+    def positions(self):
+        """Offene Positionen zum Zeitpunkt des Snapshots."""
+        if self._positions is None:
+            self.terminal_calls += 1
+            raw = self.mt5.positions_get()
+            self.positions_ok = raw is not None
+            self._positions = tuple(raw or ())
+        return self._positions
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+    def tick(self, symbol, refresh=False):
+        if refresh or symbol not in self.ticks:
+            self.terminal_calls += 1
+            self.ticks[symbol] = self.mt5.symbol_info_tick(symbol)
+        return self.ticks[symbol]
+
+    def prices(self, symbol, refresh=False):
+        tick = self.tick(symbol, refresh)
+        if tick is None:
+            return None, None
+        return tick.bid, tick.ask
+
+
+# --- 3. SYMBOL INFO CACHE ---
+class SymbolMeta:
+    """Sicht auf ein gecachtes symbol_info: statische + volatile Felder per Attribut."""
+    __slots__ = ("symbol", "static", "volatile", "refreshed")
+
+    def __init__(self, symbol, static, volatile):
+        self.symbol = symbol
+        self.static = static
+        self.volatile = volatile
+        self.refreshed = time.time()
+
+    def __getattr__(self, name):
+        for part in (self.volatile, self.static):
+            if name in part: return part[name]
+        raise AttributeError(name)
+
+
+class SymbolInfoCache:
+    """
+    TTL-Cache für mt5.symbol_info().
+    Statische Felder (Point, Volume-Step, Contract Size, Filling Mode, ...) werden einmal
+    geladen. Nur die volatilen Felder (Tick Value, Spread) werden nach Ablauf der TTL
+    aufgefrischt; ändert sich dabei ein statisches Feld, wird das geloggt und übernommen.
+    """
+    STATIC_FIELDS = (
+        "point", "digits", "trade_contract_size", "trade_tick_size",
+        "volume_min", "volume_max", "volume_step", "filling_mode", "currency_profit"
+    )
+    VOLATILE_FIELDS = (
+        "trade_tick_value", "trade_tick_value_profit", "trade_tick_value_loss", "spread"
+    )
+
+    def __init__(self, mt5_module, ttl=60):
+        self.mt5 = mt5_module
+        self.ttl = ttl
+        self._meta = {}
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "static_changes": 0}
+
+    @staticmethod
+    def _extract(info, fields):
+        return {f: getattr(info, f) for f in fields if hasattr(info, f)}
+
+    def _load(self, symbol):
+        info = self.mt5.symbol_info(symbol)
+        if info is None: return None
+        meta = SymbolMeta(symbol, self._extract(info, self.STATIC_FIELDS),
+                          self._extract(info, self.VOLATILE_FIELDS))
+        self._meta[symbol] = meta
+        return meta
+
+    def _refresh(self, meta):
+        info = self.mt5.symbol_info(meta.symbol)
+        if info is None: return meta
+        self.stats["refreshes"] += 1
+        static = self._extract(info, self.STATIC_FIELDS)
+        if static != meta.static:
+            changed = [k for k in static if meta.static.get(k) != static[k]]
+            log.warning(f"⚠️ Symbol-Spezifikation von {meta.symbol} geändert: {changed}")
+            self.stats["static_changes"] += 1
+            meta.static = static
+        meta.volatile = self._extract(info, self.VOLATILE_FIELDS)
+        meta.refreshed = time.time()
+        return meta
+
+    def get(self, symbol):
+        """Alle Felder; volatile Werte sind höchstens `ttl` Sekunden alt."""
+        meta = self._meta.get(symbol)
+        if meta is None:
+            self.stats["misses"] += 1
+            return self._load(symbol)
+        if time.time() - meta.refreshed > self.ttl:
+            self.stats["misses"] += 1
+            return self._refresh(meta)
+        self.stats["hits"] += 1
+        return meta
+
+    def get_static(self, symbol):
+        """Nur für statische Felder: kein Refresh nach dem ersten Laden."""
+        meta = self._meta.get(symbol)
+        if meta is None:
+            self.stats["misses"] += 1
+            return self._load(symbol)
+        self.stats["hits"] += 1
+        return meta
+
+    def invalidate(self, symbol=None):
+        if symbol is None: self._meta.clear()
+        else: self._meta.pop(symbol, None)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
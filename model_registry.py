@@ -0,0 +1,144 @@
+# model_registry.py
+import glob
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+from forest_compiler import CompiledForest, forest_path
+
+# Gleicher Logger wie infrastructure.log (ohne Import-Zyklus)
+log = logging.getLogger("EnterpriseBot")
+
+MODEL_SUFFIX = "_model.pkl"
+
+
+def model_nbytes(model, fallback=0):
+    """Speicherbedarf eines Modells: Knoten- und Wert-Arrays aller Bäume (sonst Dateigröße)."""
+    if isinstance(model, CompiledForest): return model.nbytes
+    total = 0
+    for est in getattr(model, "estimators_", [model]):
+        tree = getattr(est, "tree_", None)
+        if tree is None: continue
+        state = tree.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total or fallback
+
+
+class ModelRegistry:
+    """
+    Hält die trainierten Modelle (ai_models/{SYMBOL}_{TF}_model.pkl) im Speicher.
+    - preload(): lädt beim Start alle Modelle, optional parallel in Threads
+    - get(key): Cache-Treffer per Schlüssel "SYMBOL_TF", lädt bei Bedarf nach
+    - Speicherbudget (MB, 0 = unbegrenzt): am längsten unbenutzte Modelle werden verdrängt
+    - Geänderte Dateien (Trainer, update_brain) werden anhand der mtime neu geladen
+    - compile=True: Random Forests werden als CompiledForest gehalten (.forest.npz neben der .pkl)
+    """
+    def __init__(self, models_dir="ai_models", memory_budget_mb=0, mmap_mode=None, compile=False):
+        self.models_dir = models_dir
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.mmap_mode = mmap_mode
+        self.compile = compile
+        self._models = OrderedDict()   # key -> (model, mtime, nbytes)
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0, "load_seconds": 0.0}
+
+    def __contains__(self, key):
+        return key in self._models
+
+    def __len__(self):
+        return len(self._models)
+
+    @property
+    def resident_bytes(self):
+        return sum(entry[2] for entry in self._models.values())
+
+    def path(self, key):
+        return os.path.join(self.models_dir, f"{key}{MODEL_SUFFIX}")
+
+    def available(self):
+        """Alle Modell-Schlüssel im Ordner (z.B. 'EURUSD_M5')."""
+        files = glob.glob(os.path.join(self.models_dir, f"*{MODEL_SUFFIX}"))
+        return sorted(os.path.basename(f)[:-len(MODEL_SUFFIX)] for f in files)
+
+    def _compile(self, key, model, compiled_fn):
+        try:
+            compiled = CompiledForest.compile(model)
+        except ValueError:
+            return model   # Kein Random Forest -> sklearn-Modell behalten
+        try: compiled.save(compiled_fn)
+        except OSError as e: log.warning(f"⚠️ Kompiliertes Modell {key} nicht gespeichert: {e}")
+        log.info(f"⚙️ Modell {key} kompiliert ({compiled.n_trees} Bäume, Tiefe {compiled.max_depth})")
+        return compiled
+
+    def _load(self, key, mtime):
+        fn = self.path(key)
+        compiled_fn = forest_path(fn)
+        t0 = time.perf_counter()
+        if self.compile and os.path.exists(compiled_fn) and os.path.getmtime(compiled_fn) >= mtime:
+            model = CompiledForest.load(compiled_fn)
+        else:
+            model = joblib.load(fn, mmap_mode=self.mmap_mode)
+            if self.compile: model = self._compile(key, model, compiled_fn)
+        took = time.perf_counter() - t0
+        if hasattr(model, "n_jobs"): model.n_jobs = 1
+        nbytes = model_nbytes(model, fallback=os.path.getsize(fn))
+        log.info(f"📦 Modell {key} geladen: {took * 1000:.0f} ms | {nbytes / 1024 / 1024:.1f} MB")
+
+        with self._lock:
+            self.stats["loads"] += 1
+            self.stats["load_seconds"] += took
+            self._models[key] = (model, mtime, nbytes)
+            self._models.move_to_end(key)
+            self._enforce_budget(keep=key)
+        return model
+
+    def _enforce_budget(self, keep=None):
+        if not self.memory_budget: return
+        while self.resident_bytes > self.memory_budget and len(self._models) > 1:
+            victim = next(iter(self._models))
+            if victim == keep: break
+            _, _, nbytes = self._models.pop(victim)
+            self.stats["evictions"] += 1
+            log.info(f"♻️ Modell {victim} aus dem Speicher verdrängt ({nbytes / 1024 / 1024:.1f} MB, Budget)")
+
+    def get(self, key):
+        """Modell für 'SYMBOL_TF' oder None, wenn keine Datei existiert bzw. Laden fehlschlägt."""
+        try:
+            mtime = os.path.getmtime(self.path(key))
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and entry[1] == mtime:
+                self._models.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+        try:
+            return self._load(key, mtime)
+        except Exception as e:
+            log.error(f"❌ Modell {key} konnte nicht geladen werden: {e}")
+            return None
+
+    def preload(self, workers=1):
+        """Lädt alle verfügbaren Modelle (bei workers > 1 parallel). Gibt die Anzahl geladener Modelle zurück."""
+        keys = self.available()
+        if not keys: return 0
+        t0 = time.perf_counter()
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                loaded = list(pool.map(self.get, keys))
+        else:
+            loaded = [self.get(k) for k in keys]
+        count = sum(m is not None for m in loaded)
+        log.info(f"🧠 {count}/{len(keys)} Modelle vorgeladen in {time.perf_counter() - t0:.1f} s "
+                 f"({self.resident_bytes / 1024 / 1024:.1f} MB im Speicher)")
+        return count
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None: self._models.clear()
+            else: self._models.pop(key, None)
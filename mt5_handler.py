@@ -2,12 +2,20 @@
 import MetaTrader5 as mt5
 from settings import cfg
 from infrastructure import log
+from market_data import CandleCache, MarketSnapshot, SymbolInfoCache
 import time
 
 class MT5Handler:
     def __init__(self):
         self.mt5 = mt5
         self.connected = False
+        # Gemeinsamer Kerzen-Cache für Scan, Trailing und Trainer
+        self.candles = CandleCache(mt5, size=cfg.CANDLE_CACHE_SIZE)
+        # Tick-Snapshot des aktuellen Loop-Durchlaufs (füllt sich lazy bis zum ersten Refresh)
+        self.snapshot = MarketSnapshot(mt5)
+        # Symbol-Metadaten (Point, Volume-Step, Filling Mode, Tick Value)
+        self.symbols = SymbolInfoCache(mt5, ttl=cfg.SYMBOL_INFO_TTL)
+        self._selected = set()
         self.connect()
 
     def connect(self):
@@ -132,22 +140,30 @@ class MT5Handler:
                 )
         return alpaca_style
 
-    def get_live_price(self, symbol):
+    def refresh_snapshot(self, symbols):
+        """Liest einmal pro Loop alle Ticks (Symbole + offene Positionen)"""
+        self.snapshot = MarketSnapshot.capture(mt5, symbols)
+        return self.snapshot
+
+    def get_tick(self, symbol, refresh=False):
+        """Tick aus dem Snapshot. refresh=True holt einen frischen Tick (Orders!)"""
+        return self.snapshot.tick(symbol, refresh)
+
+    def get_live_price(self, symbol, refresh=False):
         """Holt echten Bid und Ask Preis"""
-        # Symbol im Market Watch aktivieren, falls nicht da
-        if not mt5.symbol_select(symbol, True):
-             return None, None
+        # Symbol im Market Watch aktivieren, falls nicht da (einmal pro Symbol)
+        if symbol not in self._selected:
+            if not mt5.symbol_select(symbol, True):
+                return None, None
+            self._selected.add(symbol)
 
-        tick = mt5.symbol_info_tick(symbol)
-        if tick is None:
-            return None, None
-        return tick.bid, tick.ask
+        return self.snapshot.prices(symbol, refresh)
 
     def submit_order(self, symbol, side, qty, sl=None, tp=None, comment="Bot V3"):
         """Sendet Order an MT5 mit dynamischem Filling Mode Fix"""
         
-        # 1. TICKET CHECK (Dein Original)
-        tick = mt5.symbol_info_tick(symbol)
+        # 1. TICKET CHECK (Frischer Tick für die Order, nicht aus dem Snapshot)
+        tick = self.get_tick(symbol, refresh=True)
         if tick is None:
             log.error(f"❌ Keine Live-Daten für {symbol}")
             return False
@@ -160,7 +176,7 @@ class MT5Handler:
         # ============================================================
         # ⚡ DYNAMISCHER FILLING MODE CHECK (Hardcoded Fix)
         # ============================================================
-        symbol_info = mt5.symbol_info(symbol)
+        symbol_info = self.symbols.get_static(symbol)
         if symbol_info is None:
             log.error(f"❌ Konnte Info für {symbol} nicht abrufen")
             return False
@@ -228,7 +244,7 @@ class MT5Handler:
     
     def close_position(self, ticket_id, symbol, qty, type_side):
         """Schließt eine spezifische Position"""
-        tick = mt5.symbol_info_tick(symbol)
+        tick = self.get_tick(symbol, refresh=True)
         if not tick: return False
         
         # Gegenteilige Order erstellen
@@ -0,0 +1,187 @@
+# persistence.py
+import atexit
+import csv
+import io
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from infrastructure import log
+
+
+def csv_line(values):
+    """Eine CSV-Zeile (wie DataFrame.to_csv: Komma, Anführungszeichen nur bei Bedarf, '\\n')."""
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(["" if v is None else v for v in values])
+    return buf.getvalue()
+
+
+class WriteBehind:
+    """
+    Schreibt für den Bot-Loop in einem Hintergrund-Thread (begrenzte Queue; ist sie voll, wartet der Aufrufer):
+    - execute()/executemany(): SQLite, alle anstehenden Statements einer Datei in einer Transaktion (Group Commit)
+    - append(): gepufferte Anhänge, ein write() pro Datei und Flush; header nur in eine neue/leere Datei
+    - write_json(): nur der letzte Stand pro Datei wird geschrieben (atomar über .tmp); read_json() sieht ihn sofort
+    Geflusht wird flush_interval Sekunden nach dem ältesten offenen Auftrag, bei flush() und beim Beenden (atexit).
+    Mit background=False wird sofort im aufrufenden Thread geschrieben (gleiche Schnittstelle).
+    """
+    MAX_BATCH = 5000    # Aufträge pro Flush, auch wenn das Intervall noch nicht abgelaufen ist
+
+    def __init__(self, flush_interval=1.0, max_queue=10000, background=True):
+        self.flush_interval = flush_interval
+        self.background = background
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"jobs": 0, "flushes": 0, "commits": 0, "errors": 0, "max_depth": 0,
+                      "last_flush_ms": 0.0, "max_flush_ms": 0.0, "last_latency_ms": 0.0, "max_latency_ms": 0.0}
+        self._pending_json = {}
+        self._lock = threading.Lock()
+        self._conns = {}
+        self._closed = False
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    # --- Aufträge ---
+    def execute(self, db, sql, params=()):
+        self._put(("sql", db, sql, [params]))
+
+    def executemany(self, db, sql, seq_of_params):
+        self._put(("sql", db, sql, list(seq_of_params)))
+
+    def append(self, path, text, header=None):
+        self._put(("append", path, text, header))
+
+    def write_json(self, path, data, indent=None):
+        with self._lock: self._pending_json[path] = data
+        self._put(("json", path, data, indent))
+
+    def read_json(self, path, default=None):
+        """Noch nicht geschriebener Stand aus write_json(), sonst die Datei."""
+        with self._lock:
+            if path in self._pending_json: return self._pending_json[path]
+        if not os.path.exists(path): return default
+        try:
+            with open(path, "r") as f: return json.load(f)
+        except Exception:
+            return default
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def _put(self, job):
+        if self._closed or not self.background:
+            self._write([(time.monotonic(), job)])
+            return
+        self.queue.put((time.monotonic(), job))
+        self.stats["jobs"] += 1
+        depth = self.queue.qsize()
+        if depth > self.stats["max_depth"]: self.stats["max_depth"] = depth
+
+    def flush(self, timeout=None):
+        """Wartet, bis alle bisher eingereihten Aufträge geschrieben sind."""
+        if not self.background or self._closed: return True
+        done = threading.Event()
+        self.queue.put((time.monotonic(), ("flush", done)))
+        return done.wait(timeout)
+
+    def close(self, timeout=30):
+        """Restliche Aufträge schreiben und den Thread beenden (wird auch per atexit aufgerufen)."""
+        if self._closed: return
+        if self.background and self._thread.is_alive():
+            done = threading.Event()
+            self.queue.put((time.monotonic(), ("stop", done)))
+            done.wait(timeout)
+        self._closed = True
+        for conn in self._conns.values(): conn.close()
+        self._conns.clear()
+
+    # --- Schreib-Thread ---
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            timeout = None if not batch else max(deadline - time.monotonic(), 0.0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not None and item[1][0] not in ("flush", "stop"):
+                batch.append(item)
+                if deadline is None: deadline = item[0] + self.flush_interval
+                if len(batch) < self.MAX_BATCH and time.monotonic() < deadline: continue
+            if batch:
+                self._write(batch)
+                batch, deadline = [], None
+            if item is not None and item[1][0] in ("flush", "stop"):
+                item[1][1].set()
+                if item[1][0] == "stop": return
+
+    def _conn(self, db):
+        if db not in self._conns:
+            conn = sqlite3.connect(db, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._conns[db] = conn
+        return self._conns[db]
+
+    def _write(self, batch):
+        t0 = time.monotonic()
+        sql, appends, snapshots = {}, {}, {}
+        for _, job in batch:
+            if job[0] == "sql": sql.setdefault(job[1], []).append(job[2:])
+            elif job[0] == "append": appends.setdefault(job[1], []).append(job[2:])
+            elif job[0] == "json": snapshots[job[1]] = job[2:]
+
+        for db, statements in sql.items():
+            conn = self._conn(db)
+            try:
+                with conn:
+                    for statement, params in statements: conn.executemany(statement, params)
+                self.stats["commits"] += 1
+            except Exception as e:
+                # Gruppe verworfen: einzeln wiederholen, damit nur der fehlerhafte Auftrag verloren geht
+                log.error(f"❌ Group Commit für {db} fehlgeschlagen ({e}), schreibe einzeln...")
+                for statement, params in statements:
+                    try:
+                        with conn: conn.executemany(statement, params)
+                        self.stats["commits"] += 1
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        log.error(f"❌ Verworfen ({db}): {statement[:60]}... -> {e}")
+
+        for path, parts in appends.items():
+            try:
+                header = parts[0][1]
+                new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write((header if header and new_file else "") + "".join(text for text, _ in parts))
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.error(f"❌ Anhängen an {path} fehlgeschlagen: {e}")
+
+        for path, (data, indent) in snapshots.items():
+            try:
+                with open(path + ".tmp", "w") as f: json.dump(data, f, indent=indent, default=str)
+                os.replace(path + ".tmp", path)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.error(f"❌ {path} nicht geschrieben: {e}")
+            with self._lock:
+                if self._pending_json.get(path) is data: del self._pending_json[path]
+
+        now = time.monotonic()
+        took, latency = (now - t0) * 1000, (now - batch[0][0]) * 1000
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"], self.stats["last_latency_ms"] = took, latency
+        self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], took)
+        self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], latency)
+
+    def report(self):
+        """Kurzfassung für den Heartbeat."""
+        s = self.stats
+        return (f"Queue {self.depth} (max {s['max_depth']}) | Flush {s['last_flush_ms']:.1f} ms "
+                f"(max {s['max_flush_ms']:.1f}) | Latenz {s['last_latency_ms']:.0f} ms (max {s['max_latency_ms']:.0f}) | "
+                f"{s['commits']} Commits, {s['errors']} Fehler")
@@ -38,7 +38,7 @@ class RiskManager:
             if dist == 0: return 0.0
 
             # 3. Symbol Informationen holen
-            symbol_info = self.mt5.mt5.symbol_info(symbol)
+            symbol_info = self.mt5.symbols.get(symbol)
             if not symbol_info:
                 log.error(f"❌ Kann Symbol-Info für {symbol} nicht laden.")
                 return 0.0
@@ -30,7 +30,64 @@ class Config:
     # Das verhindert "Klumpenrisiko" und hilft bei der Consistency-Rule.
     MAX_POSITION_SIZE = 0.20
 
+    # --- PERFORMANCE / CACHES ---
+    # Anzahl Kerzen, die pro Symbol & Timeframe im Speicher gehalten werden
+    CANDLE_CACHE_SIZE = 500
+    # Sekunden, bis volatile Symbol-Infos (Tick Value, Spread) neu geladen werden
+    SYMBOL_INFO_TTL = 60
+    # Max. Einträge im LRU-Cache für berechnete Features (Symbol, TF, letzte Bar)
+    FEATURE_CACHE_SIZE = 64
+    # Max. gecachte Volume Profiles (Symbol, Fenster, Anker, letzte Bar)
+    PROFILE_CACHE_SIZE = 64
+    # Volume Profile aus Kerzen ("bars") oder aus gestreamten Ticks ("ticks", Zerfall mit Halbwertszeit)
+    PROFILE_MODE = "bars"
+    TICK_PROFILE_BINS = 1024          # Feste Bin-Anzahl pro Symbol (8 KB)
+    TICK_PROFILE_POINTS = 10          # Bin-Breite in Points (wird bei Bedarf vergröbert)
+    TICK_PROFILE_HALFLIFE = 4 * 3600  # Sekunden
+    TICK_PROFILE_WARMUP = 8 * 3600    # Sekunden Tick-Historie beim ersten Laden
+    # KI-Modelle: Threads beim Vorladen, Speicherbudget in MB (0 = unbegrenzt), joblib mmap_mode (None oder 'r')
+    MODEL_PRELOAD_WORKERS = 4
+    MODEL_MEMORY_MB = 0
+    MODEL_MMAP_MODE = None
+    # Random Forests für die Live-Prognose in flache NumPy-Arrays kompilieren (bitgenau wie sklearn)
+    MODEL_COMPILE = True
+    # Parallele Trainings-Prozesse in train_orchestrator.py (je Prozess eine MT5-Verbindung)
+    TRAIN_WORKERS = 4
+    # Lokaler Kerzen-Speicher (eine Datei pro Symbol & Timeframe) und Historie in Kerzen beim Neuaufbau
+    BAR_STORE_DIR = "bar_store"
+    BAR_STORE_HISTORY = 50000
+
     # Datenbank Name
     DB_NAME = "trading_bot.db"
+    # Shadow-Trades (eigene SQLite-Datei; eine alte shadow_trades.json wird einmalig übernommen)
+    SHADOW_DB = "shadow_trades.db"
+    # Shadow-Varianten pro Einstieg: alle Kombinationen aus SL/TP-Multiplikatoren (x ATR),
+    # Breakeven-Auslöser (SL auf Einstand ab x ATR Gewinn) und Trailing-Abstand (x ATR); None = aus
+    # Kosten pro Tick hängen an der Zahl der Stufen (Schwellen-Kreuzungen), kaum an der Zahl der Kombinationen
+    SHADOW_SL_MULTS = [0.5 + 0.5 * i for i in range(10)]    # 0.5 ... 5.0
+    SHADOW_TP_MULTS = [1.0 + 1.0 * i for i in range(10)]    # 1.0 ... 10.0
+    SHADOW_BREAKEVEN = [None, 1.0]
+    SHADOW_TRAIL = [None, 1.5]
+    # Variante für smart_memory.csv (wie bisher "Day_Standard": SL 1.5 / TP 3.0 ATR)
+    SHADOW_REFERENCE = (1.5, 3.0)
+    # Danach werden noch offene Varianten zum Marktpreis geschlossen
+    SHADOW_MAX_AGE_HOURS = 48
+    # MFE/MAE-Tracker: Checkpoint der offenen Trades und Historie der geschlossenen (SQLite)
+    TRADE_STATS_DB = "trade_stats.db"
+    MFE_CHECKPOINT_SECONDS = 60
+    # Bis zu dieser Lücke (Sekunden) Extremwerte aus Ticks, darüber aus M1-Hochs/Tiefs
+    MFE_TICK_WINDOW = 3600
+    # Exit-Optimierer (exit_optimizer.py): Ergebnisdatei, Mindestanzahl Einstiege pro Gruppe und
+    # ob der Live-Loop SL/TP neuer Signale aus der Datei übernimmt (beste Variante ohne Breakeven/Trailing,
+    # sonst nur Empfehlung)
+    EXIT_PARAMS_FILE = "exit_params.json"
+    EXIT_OPT_MIN_SAMPLES = 30
+    EXIT_PARAMS_APPLY = False
+    # Schreib-Thread (persistence.py): Journal, Shadows, MFE/MAE, smart_memory.csv, monitor/daily_stats.json.
+    # Flush spätestens PERSIST_FLUSH_SECONDS nach dem ältesten Auftrag; volle Queue bremst den Loop.
+    # PERSIST_WRITE_BEHIND = False schreibt wie bisher sofort im Loop.
+    PERSIST_WRITE_BEHIND = True
+    PERSIST_FLUSH_SECONDS = 1.0
+    PERSIST_QUEUE_SIZE = 10000
 
 cfg = Config()
\ No newline at end of file
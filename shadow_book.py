@@ -0,0 +1,299 @@
+# shadow_book.py
+import numpy as np
+
+M1 = 60
+TP, STOP, EXPIRED = 1, -1, 2   # Ergebnis pro Variante (0 = offen); STOP ist auch ein Breakeven-/Trailing-Ausstieg
+GRID_KEYS = ("sl_m", "tp_m", "be_m", "trail_m")
+
+
+def variant_grid(sl_mults, tp_mults, breakeven=(None,), trail=(None,)):
+    """Alle Kombinationen als Parameter-Raster (Listen gleicher Länge, None = Regel aus)."""
+    combos = [(s, t, b, r) for s in sl_mults for t in tp_mults for b in breakeven for r in trail]
+    return {k: [c[i] for c in combos] for i, k in enumerate(GRID_KEYS)}
+
+
+def grid_arrays(grid):
+    """Raster als float-Arrays (abgeschaltete Regeln = inf)."""
+    return {k: np.array([np.inf if v is None else float(v) for v in grid[k]]) for k in GRID_KEYS}
+
+
+def reference_variant(grid, sl_m, tp_m):
+    """Index der Variante ohne Breakeven/Trailing, die (sl_m, tp_m) am nächsten liegt."""
+    a = grid_arrays(grid)
+    dist = np.abs(a["sl_m"] - sl_m) + np.abs(a["tp_m"] - tp_m)
+    plain = np.isinf(a["be_m"]) & np.isinf(a["trail_m"])
+    if plain.any(): dist[~plain] = np.inf
+    return int(np.argmin(dist))
+
+
+def current_stops(entry, sl0, be, trail, best):
+    """
+    Stop jeder Variante aus dem besten Kurs seit dem Einstieg (normiert: Gewinnrichtung = aufwärts).
+    Anfangs-SL, Trailing (best - Abstand) und Breakeven (Einstand, sobald best den Auslöser erreicht).
+    """
+    stop = np.maximum(sl0, best - trail)
+    return np.where(best >= be, np.maximum(stop, entry), stop)
+
+
+class _GridGroup:
+    """
+    Offene Einstiege eines Symbols mit demselben Raster. Das Raster wird zerlegt in
+    Stop-Regeln (SL, Breakeven, Trailing) und TP-Stufen: eine Variante ist entschieden, sobald
+    ihre Stop-Regel oder ihre TP-Stufe zum ersten Mal getroffen wird (gleicher Zeitpunkt -> Stop).
+    Der Aufwand hängt damit von Stop-Regeln + TP-Stufen ab, nicht von deren Produkt.
+    Preise sind normiert (SHORT gespiegelt), dann gilt überall die LONG-Logik.
+    """
+    def __init__(self, grid):
+        rules = np.stack([grid["sl_m"], grid["be_m"], grid["trail_m"]], axis=1)
+        rules, self.stop_of = np.unique(rules, axis=0, return_inverse=True)
+        self.sl_m, self.be_m, self.trail_m = rules.T
+        self.tp_m, self.tp_of = np.unique(grid["tp_m"], return_inverse=True)
+        self.stop_of, self.tp_of = self.stop_of.ravel(), self.tp_of.ravel()
+        self.dynamic = np.isfinite(self.be_m) | np.isfinite(self.trail_m)
+        self.unknown_open = False   # Einstiege ohne Eröffnungszeit (werden bei der nächsten Prüfung gesetzt)
+        self.entries = []
+        self.long = np.zeros(0, dtype=bool)
+        self.opened = np.zeros(0, dtype=np.int64)   # Serverzeit der Eröffnung, -1 = unbekannt
+        for c in ("entry", "atr", "best"): setattr(self, c, np.zeros(0))
+        S, T = len(self.sl_m), len(self.tp_m)
+        # Pro Einstieg x Stop-Regel bzw. TP-Stufe: Niveau und Zeitpunkt des ersten Treffers
+        # (inf = offen, -inf = keine offene Variante braucht sie mehr)
+        for c, w in (("sl0", S), ("be", S), ("trail", S), ("stop", S), ("stop_at", S), ("stop_exit", S),
+                     ("tp", T), ("tp_at", T)):
+            setattr(self, c, np.zeros((0, w)))
+        # Offene Varianten pro Stop-Regel bzw. TP-Stufe (0 -> Regel wird nicht mehr verfolgt)
+        self.stop_open, self.tp_open = np.zeros((0, S), dtype=np.int64), np.zeros((0, T), dtype=np.int64)
+        self.bounds = (-np.inf, np.inf, np.inf, -np.inf, np.inf, np.inf, np.iinfo(np.int64).max)
+
+    ROWS = ("long", "opened", "entry", "atr", "best", "sl0", "be", "trail", "stop", "stop_at", "stop_exit", "tp", "tp_at",
+            "stop_open", "tp_open")
+
+    def add(self, entry):
+        pending = entry["outcomes"] == 0
+        if not pending.any(): return
+        sign, atr = (1.0 if entry["side"] == "LONG" else -1.0), float(entry["atr"])
+        e = sign * float(entry["entry"])
+        best = sign * float(entry.get("best", entry["entry"]))
+        row = {"long": [sign > 0], "opened": [-1 if entry.get("entry_time") is None else int(entry["entry_time"])],
+               "entry": [e], "atr": [atr], "best": [best],
+               "sl0": [e - self.sl_m * atr], "be": [e + self.be_m * atr], "trail": [self.trail_m * atr],
+               "tp": [e + self.tp_m * atr], "stop_exit": [np.zeros(len(self.sl_m))]}
+        row["stop"] = [current_stops(e, row["sl0"][0], row["be"][0], row["trail"][0], best)]
+        row["stop_open"] = [np.bincount(self.stop_of[pending], minlength=len(self.sl_m))]
+        row["tp_open"] = [np.bincount(self.tp_of[pending], minlength=len(self.tp_m))]
+        # inf für Regeln, die noch eine offene Variante braucht, sonst -inf
+        row["stop_at"] = [np.where(row["stop_open"][0] > 0, np.inf, -np.inf)]
+        row["tp_at"] = [np.where(row["tp_open"][0] > 0, np.inf, -np.inf)]
+        for c in self.ROWS: setattr(self, c, np.concatenate([getattr(self, c), np.asarray(row[c], dtype=getattr(self, c).dtype)]))
+        self.unknown_open |= row["opened"][0] < 0
+        self.entries.append(entry)
+        self.refresh()
+
+    def keep(self, mask):
+        self.entries = [e for e, k in zip(self.entries, mask) if k]
+        for c in self.ROWS: setattr(self, c, getattr(self, c)[mask])
+
+    def refresh(self):
+        """Engste Schwellen je Seite: solange ein Tick keine kreuzt, ändert sich nichts."""
+        stop_open = self.stop_at == np.inf
+        # Pro Einstieg: höchster offener Stop, niedrigstes offenes TP, Bestkurs (nur mit offenen dynamischen Regeln)
+        stop = np.where(stop_open, self.stop, -np.inf).max(axis=1, initial=-np.inf)
+        tp = np.where(self.tp_at == np.inf, self.tp, np.inf).min(axis=1, initial=np.inf)
+        best = np.where((stop_open & self.dynamic).any(axis=1), self.best, np.inf)
+        b = []
+        for side in (self.long, ~self.long):
+            b += [stop[side].max(initial=-np.inf), tp[side].min(initial=np.inf), best[side].min(initial=np.inf)]
+        self.bounds = tuple(b) + (self.opened.min(initial=np.iinfo(np.int64).max),)
+
+    def quiet(self, bid, ask, now, max_age):
+        """True, wenn der Tick weder Stop, TP, neuen Bestkurs (Breakeven/Trailing) noch Ablauf auslöst."""
+        stop_l, tp_l, best_l, stop_s, tp_s, best_s, first = self.bounds
+        return (stop_l < bid < tp_l and bid <= best_l and stop_s < -ask < tp_s and -ask <= best_s
+                and (max_age is None or now - first < max_age))
+
+    def advance(self, times, bid_high, bid_low, ask_high, ask_low):
+        """
+        Preisweg (K Kerzen bzw. ein Tick mit high = low) für alle Einstiege auf einmal: LONG mit Bid,
+        SHORT mit Ask. Der Stop einer Kerze folgt aus dem Bestkurs vor ihr (konservativ).
+        Gibt die Zeilen mit neuen Treffern zurück.
+        """
+        if len(times) == 1: return self._advance_one(times[0], bid_high[0], bid_low[0], ask_high[0], ask_low[0])
+        fav_high = np.where(self.long[:, None], bid_high, -ask_low)         # (E, K)
+        fav_low = np.where(self.long[:, None], bid_low, -ask_high)
+        active = self.opened[:, None] <= times
+        best_after = np.maximum(self.best[:, None], np.maximum.accumulate(np.where(active, fav_high, -np.inf), axis=1))
+        best_before = np.concatenate([self.best[:, None], best_after[:, :-1]], axis=1)
+
+        stops = current_stops(self.entry[:, None, None], self.sl0[:, :, None], self.be[:, :, None],
+                              self.trail[:, :, None], best_before[:, None, :])                     # (E, S, K)
+        stop_hit = active[:, None, :] & (fav_low[:, None, :] <= stops)
+        tp_hit = active[:, None, :] & (fav_high[:, None, :] >= self.tp[:, :, None])             # (E, T, K)
+        new_stop = stop_hit.any(axis=2) & np.isposinf(self.stop_at)
+        new_tp = tp_hit.any(axis=2) & np.isposinf(self.tp_at)
+        if new_stop.any():
+            first = stop_hit.argmax(axis=2)
+            e, s = np.nonzero(new_stop)
+            self.stop_at[e, s] = times[first[e, s]]
+            self.stop_exit[e, s] = stops[e, s, first[e, s]]
+        if new_tp.any():
+            first = tp_hit.argmax(axis=2)
+            e, t = np.nonzero(new_tp)
+            self.tp_at[e, t] = times[first[e, t]]
+        self.best = best_after[:, -1]
+        self.stop = current_stops(self.entry[:, None], self.sl0, self.be, self.trail, self.best[:, None])
+        return np.flatnonzero(new_stop.any(axis=1) | new_tp.any(axis=1))
+
+    def _advance_one(self, time, bid_high, bid_low, ask_high, ask_low):
+        """advance() für einen einzelnen Tick: die Stops zum bisherigen Bestkurs stehen schon in self.stop."""
+        active = self.opened <= time
+        fav_high = np.where(self.long, bid_high, -ask_low)
+        fav_low = np.where(self.long, bid_low, -ask_high)
+        new_stop = active[:, None] & (fav_low[:, None] <= self.stop) & (self.stop_at == np.inf)
+        new_tp = active[:, None] & (fav_high[:, None] >= self.tp) & (self.tp_at == np.inf)
+        self.stop_at[new_stop], self.stop_exit[new_stop] = time, self.stop[new_stop]
+        self.tp_at[new_tp] = time
+        self.best = np.where(active, np.maximum(self.best, fav_high), self.best)
+        self.stop = current_stops(self.entry[:, None], self.sl0, self.be, self.trail, self.best[:, None])
+        return np.flatnonzero(new_stop.any(axis=1) | new_tp.any(axis=1))
+
+    def resolve(self, rows, now, fav_now, max_age):
+        """
+        Trägt neue Ergebnisse in die Einstiege ein (alle Zeilen auf einmal); abgelaufene Varianten zum aktuellen Kurs.
+        Geprüft werden nur offene Varianten einer neu getroffenen Stop-Regel bzw. TP-Stufe, nicht das ganze Raster.
+        """
+        entries = [self.entries[i] for i in rows.tolist()]
+        outcomes = np.stack([e["outcomes"] for e in entries])                             # (R, Varianten)
+        exits = np.stack([e["exits"] for e in entries])
+        stop_at, tp_at = self.stop_at[rows], self.tp_at[rows]
+        # Getroffene Regeln haben einen endlichen Zeitpunkt (offen = inf, nicht mehr gebraucht = -inf)
+        hit = np.take(np.isfinite(stop_at), self.stop_of, axis=1) | np.take(np.isfinite(tp_at), self.tp_of, axis=1)
+        r, v = np.nonzero(hit & (outcomes == 0))
+        s, t, i = self.stop_of[v], self.tp_of[v], rows[r]
+        loss = stop_at[r, s] <= tp_at[r, t]
+        outcomes[r, v] = np.where(loss, STOP, TP)
+        exits[r, v] = np.where(loss, (self.stop_exit[i, s] - self.entry[i]) / self.atr[i], self.tp_m[t])
+        R, S, T = len(rows), len(self.sl_m), len(self.tp_m)
+        stop_open = self.stop_open[rows] - np.bincount(r * S + s, minlength=R * S).reshape(R, S)
+        tp_open = self.tp_open[rows] - np.bincount(r * T + t, minlength=R * T).reshape(R, T)
+        if max_age is not None:
+            old = now - self.opened[rows] >= max_age
+            if old.any():
+                rest = (outcomes == 0) & old[:, None]
+                outcomes[rest] = EXPIRED
+                exits = np.where(rest, (fav_now[rows, None] - self.entry[rows, None]) / self.atr[rows, None],
+                                 exits).astype(np.float32)
+                stop_open[old], tp_open[old] = 0, 0
+        # Regeln ohne offene Variante nicht weiter verfolgen (engere Schwellen)
+        self.stop_open[rows], self.tp_open[rows] = stop_open, tp_open
+        self.stop_at[rows] = np.where(stop_open > 0, stop_at, -np.inf)
+        self.tp_at[rows] = np.where(tp_open > 0, tp_at, -np.inf)
+        best = np.where(self.long[rows], self.best[rows], -self.best[rows]).tolist()
+        open_rows = stop_open.any(axis=1).tolist()
+        for j, e in enumerate(entries):
+            e["outcomes"], e["exits"], e["best"] = outcomes[j], exits[j], best[j]
+            if not open_rows[j]: e["status"] = "DONE"
+        return entries
+
+
+class ShadowBook:
+    """
+    Offene Shadow-Einstiege pro Symbol, gruppiert nach Raster. Pro Tick bzw. pro Nachprüfung werden
+    alle Varianten aller Einstiege gemeinsam gegen den Preisweg aufgelöst (_GridGroup.advance).
+    Beginnt seit der letzten Prüfung eine neue M1-Kerze, werden vorher die M1-Hochs/-Tiefs seit
+    der letzten Nachprüfung ausgewertet -> Treffer zwischen zwei Loop-Durchläufen gehen nicht verloren.
+    """
+    def __init__(self, max_catchup_bars=500, max_age=None):
+        self.max_catchup_bars = max_catchup_bars
+        self.max_age = max_age   # Sekunden; danach werden offene Varianten zum Marktpreis geschlossen
+        self._symbols = {}       # symbol -> {grid_id: _GridGroup}
+        self._caught_up = {}     # symbol -> Serverzeit der letzten Kerzen-Nachprüfung
+        self.stats = {"evaluations": 0, "advances": 0, "catchups": 0, "resolved": 0}
+
+    def __len__(self):
+        return sum(len(g.entries) for groups in self._symbols.values() for g in groups.values())
+
+    def add(self, entry, grid):
+        """grid: Parameter-Raster des Einstiegs (Listen oder grid_arrays)."""
+        groups = self._symbols.setdefault(entry["symbol"], {})
+        group = groups.get(entry["grid_id"])
+        if group is None:
+            if not isinstance(grid["sl_m"], np.ndarray): grid = grid_arrays(grid)
+            group = groups[entry["grid_id"]] = _GridGroup(grid)
+        group.add(entry)
+        if not group.entries: del groups[entry["grid_id"]]
+        if not groups: del self._symbols[entry["symbol"]]
+
+    def symbols(self):
+        return list(self._symbols)
+
+    def entries(self, symbol=None):
+        groups = [self._symbols.get(symbol, {})] if symbol else self._symbols.values()
+        return [e for g in groups for group in g.values() for e in group.entries]
+
+    def _opened(self, symbol):
+        opened = [g.opened[g.opened >= 0] for g in self._symbols[symbol].values()]
+        opened = np.concatenate(opened) if opened else np.zeros(0, dtype=np.int64)
+        return int(opened.min()) if len(opened) else None
+
+    def catchup_bars(self, symbol, now):
+        """Anzahl M1-Kerzen für die Nachprüfung (0 = nicht nötig, solange keine neue Kerze begonnen hat)."""
+        if symbol not in self._symbols: return 0
+        since = self._caught_up.get(symbol)
+        if since is None: since = self._opened(symbol)
+        if since is None or now // M1 <= since // M1: return 0
+        return min(int(now // M1 - since // M1) + 1, self.max_catchup_bars)
+
+    def evaluate(self, symbol, bid, ask, now, bars=None):
+        """
+        Löst alle offenen Varianten des Symbols auf: erst die übergebenen M1-Kerzen (MT5-Rates,
+        älteste zuerst), dann den aktuellen Tick. Gibt die Einstiege mit neuen Ergebnissen zurück
+        (outcomes/exits/best aktualisiert, status 'DONE' wenn keine Variante mehr offen ist).
+        """
+        groups = self._symbols.get(symbol)
+        if not groups: return []
+        self.stats["evaluations"] += 1
+        now = int(now)
+        for group in groups.values():
+            if group.unknown_open:
+                group.opened[group.opened < 0] = now   # Eröffnung unbekannt: erst ab jetzt prüfen
+                group.unknown_open = False
+                group.refresh()
+        if symbol not in self._caught_up: self._caught_up[symbol] = self._opened(symbol)
+        since = self._caught_up[symbol]
+        # Ohne Kerzen: Tick kreuzt in keiner Gruppe eine Schwelle -> nichts zu tun
+        if bars is None and all(g.quiet(bid, ask, now, self.max_age) for g in groups.values()): return []
+
+        # Preisweg: M1-Kerzen seit der letzten Nachprüfung (Bid-Kerzen, Ask mit aktuellem Spread) + Tick
+        times, bid_high, bid_low = np.array([now]), np.array([bid]), np.array([bid])
+        ask_high, ask_low = np.array([ask]), np.array([ask])
+        if bars is not None:
+            bars = bars[bars['time'] >= since // M1 * M1]
+            if len(bars):
+                self.stats["catchups"] += 1
+                spread = max(ask - bid, 0.0)
+                high, low = bars['high'].astype(np.float64), bars['low'].astype(np.float64)
+                times = np.concatenate([bars['time'].astype(np.int64), times])
+                bid_high, bid_low = np.concatenate([high, bid_high]), np.concatenate([low, bid_low])
+                ask_high, ask_low = np.concatenate([high + spread, ask_high]), np.concatenate([low + spread, ask_low])
+            self._caught_up[symbol] = now
+
+        changed = []
+        for gid, group in list(groups.items()):
+            if bars is None and group.quiet(bid, ask, now, self.max_age): continue
+            self.stats["advances"] += 1
+            rows = group.advance(times, bid_high, bid_low, ask_high, ask_low)
+            if self.max_age is not None:
+                rows = np.union1d(rows, np.flatnonzero(now - group.opened >= self.max_age))
+            if len(rows):
+                fav_now = np.where(group.long, bid, -ask)
+                done = group.resolve(rows, now, fav_now, self.max_age)
+                self.stats["resolved"] += len(done)
+                changed += done
+                if any(e.get("status") == "DONE" for e in done):
+                    group.keep(np.array([e.get("status", "OPEN") == "OPEN" for e in group.entries], dtype=bool))
+                    if not group.entries: del groups[gid]
+            if gid in groups: group.refresh()
+        if not groups:
+            del self._symbols[symbol]
+            self._caught_up.pop(symbol, None)
+        return changed
@@ -0,0 +1,220 @@
+# shadow_store.py
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+from infrastructure import log
+
+FIELDS = ("id", "symbol", "side", "setup", "entry", "atr", "best", "entry_time", "start_time", "end_time",
+          "grid_id", "status")
+OUTCOME_CODES = {"WIN": 1, "LOSS": -1}
+
+
+def grid_id(grid):
+    """Inhalts-Hash des Parameter-Rasters (gleiches Raster -> gleiche ID)."""
+    blob = json.dumps({k: [None if v is None else round(float(v), 6) for v in grid[k]] for k in sorted(grid)})
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+class ShadowStore:
+    """
+    Shadow-Trades in SQLite: ein Datensatz pro Einstieg plus ein gemeinsames Parameter-Raster
+    (SL/TP-Multiplikatoren, Breakeven, Trailing) statt einer Zeile pro Variante.
+    - add_grid() / grid(): Raster einmal speichern, per ID (Inhalts-Hash) laden
+    - add_entries(): neue Einstiege in einer Transaktion anhängen
+    - load_open(): nur offene Einstiege (Index auf status, symbol)
+    - update_entries(): Ergebnisse pro Variante (int8) und Ausstiege in ATR (float32) als Blob;
+      ist die letzte Variante entschieden, bekommt der Einstieg eine fortlaufende closed_seq
+    - closed_since(): abgeschlossene Einstiege ab einem Cursor (z.B. feed_shadows.py)
+    Mit legacy_json (nur Bot und explizite Tools, nicht die parallelen Trainer-Worker) wird eine
+    shadow_trades.json einmalig übernommen.
+    Mit `writer` (persistence.WriteBehind) schreiben add_entries()/update_entries() im Hintergrund;
+    die seq vergibt dann der Store selbst (nur der Bot legt Einstiege an).
+    """
+    def __init__(self, path="shadow_trades.db", legacy_json=None):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # Bot schreibt, feed_shadows.py liest parallel
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._grids = {}
+        self.writer = None
+        self._next_seq = None
+        self.create_tables()
+        if legacy_json and os.path.exists(legacy_json):
+            self.migrate_json(legacy_json)
+
+    def create_tables(self):
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS grids (id TEXT PRIMARY KEY, params TEXT);
+            CREATE TABLE IF NOT EXISTS entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT, symbol TEXT, side TEXT, setup TEXT,
+                entry REAL, atr REAL, best REAL,
+                entry_time INTEGER, start_time TEXT, end_time TEXT,
+                grid_id TEXT, features TEXT,
+                outcomes BLOB, exits BLOB,
+                status TEXT DEFAULT 'OPEN',
+                closed_seq INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_status_symbol ON entries (status, symbol);
+            CREATE INDEX IF NOT EXISTS idx_entries_closed_seq ON entries (closed_seq);
+            CREATE TABLE IF NOT EXISTS cursors (name TEXT PRIMARY KEY, position INTEGER);
+        ''')
+        self.conn.commit()
+
+    # --- Raster ---
+    def add_grid(self, grid):
+        gid = grid_id(grid)
+        if gid not in self._grids:
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO grids (id, params) VALUES (?, ?)", (gid, json.dumps(grid)))
+            self._grids[gid] = grid
+        return gid
+
+    def grid(self, gid):
+        if gid not in self._grids:
+            row = self.conn.execute("SELECT params FROM grids WHERE id = ?", (gid,)).fetchone()
+            self._grids[gid] = json.loads(row[0]) if row else None
+        return self._grids[gid]
+
+    # --- Einstiege ---
+    @staticmethod
+    def _record(row):
+        entry = {k: row[k] for k in FIELDS}
+        entry["features"] = json.loads(row["features"]) if row["features"] else {}
+        entry["outcomes"] = np.frombuffer(row["outcomes"], dtype=np.int8).copy()
+        entry["exits"] = np.frombuffer(row["exits"], dtype=np.float32).copy()
+        entry["seq"] = row["seq"]
+        return entry
+
+    def add_entries(self, entries):
+        """Hängt Einstiege an und setzt ihre 'seq'. Ohne 'outcomes' sind alle Varianten offen."""
+        rows = []
+        for e in entries:
+            n = len(self.grid(e["grid_id"])["sl_m"])
+            e.setdefault("outcomes", np.zeros(n, dtype=np.int8))
+            e.setdefault("exits", np.zeros(n, dtype=np.float32))
+            e.setdefault("best", e["entry"])
+            e.setdefault("status", "OPEN")
+            rows.append((e.get("id"), e["symbol"], e["side"], e.get("setup"), float(e["entry"]), float(e["atr"]), float(e["best"]),
+                         e.get("entry_time"), e.get("start_time"), e.get("end_time"), e["grid_id"],
+                         json.dumps(e.get("features") or {}, default=str),
+                         e["outcomes"].astype(np.int8).tobytes(), e["exits"].astype(np.float32).tobytes(), e["status"]))
+        sql = ("INSERT INTO entries (id, symbol, side, setup, entry, atr, best, entry_time, start_time, end_time, "
+               "grid_id, features, outcomes, exits, status, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+        if self.writer is not None:
+            if self._next_seq is None:
+                self._next_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM entries").fetchone()[0]
+            for e in entries:
+                e["seq"], self._next_seq = self._next_seq, self._next_seq + 1
+            self.writer.executemany(self.path, sql, [row + (e["seq"],) for row, e in zip(rows, entries)])
+            return entries
+        with self.conn:
+            for row, e in zip(rows, entries):
+                e["seq"] = self.conn.execute(sql, row + (None,)).lastrowid
+        return entries
+
+    def load_open(self, symbol=None):
+        sql = "SELECT * FROM entries WHERE status = 'OPEN'"
+        args = ()
+        if symbol is not None:
+            sql += " AND symbol = ?"
+            args = (symbol,)
+        return [self._record(r) for r in self.conn.execute(sql + " ORDER BY seq", args)]
+
+    def update_entries(self, entries):
+        """Schreibt Ergebnisse, Ausstiege und besten Preis; status != 'OPEN' schließt den Einstieg ab."""
+        sql = ("UPDATE entries SET outcomes = ?, exits = ?, best = ?, status = ?, end_time = ?, "
+               "closed_seq = CASE WHEN ? != 'OPEN' THEN (SELECT COALESCE(MAX(closed_seq), 0) + 1 FROM entries) "
+               "ELSE closed_seq END WHERE seq = ? AND status = 'OPEN'")
+        rows = [(e["outcomes"].astype(np.int8).tobytes(), e["exits"].astype(np.float32).tobytes(),
+                 float(e["best"]), e["status"], e.get("end_time"), e["status"], e["seq"]) for e in entries]
+        if self.writer is not None:
+            self.writer.executemany(self.path, sql, rows)
+            return
+        with self.conn:
+            self.conn.executemany(sql, rows)
+
+    def closed_since(self, position=0, limit=None):
+        """Abgeschlossene Einstiege mit closed_seq > position (älteste zuerst) und die neue Position."""
+        sql = "SELECT * FROM entries WHERE closed_seq > ? ORDER BY closed_seq"
+        args = (position,)
+        if limit:
+            sql += " LIMIT ?"
+            args += (int(limit),)
+        rows = self.conn.execute(sql, args).fetchall()
+        return [self._record(r) for r in rows], (rows[-1]["closed_seq"] if rows else position)
+
+    def iter_done(self, chunk=2000):
+        """Alle abgeschlossenen Einstiege blockweise als Zeilen (symbol, setup, grid_id, outcomes, exits), ohne Features."""
+        cur = self.conn.execute("SELECT symbol, setup, grid_id, outcomes, exits FROM entries WHERE status = 'DONE'")
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows: return
+            yield rows
+
+    def get_cursor(self, name):
+        row = self.conn.execute("SELECT position FROM cursors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def set_cursor(self, name, position):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO cursors (name, position) VALUES (?, ?)", (name, int(position)))
+
+    def count(self, status=None):
+        if status is None:
+            return self.conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+        return self.conn.execute("SELECT count(*) FROM entries WHERE status = ?", (status,)).fetchone()[0]
+
+    # --- Übernahme alter Shadows (eine Zeile pro Variante) ---
+    def import_legacy(self, shadows):
+        """
+        Fasst die Varianten eines Spawns aus shadow_trades.json (gleiches Symbol, Seite, Entry, Zeitstempel
+        in der ID) zu einem Einstieg zusammen. ATR-Basis ist der SL-Abstand der ersten Variante, das Raster enthält die
+        SL/TP-Abstände aller Varianten in dieser Einheit (ohne Breakeven/Trailing).
+        """
+        groups = {}
+        for s in shadows:
+            stamp = str(s.get("id") or "")[len(s["symbol"]) + 1:].split("_")[0]
+            groups.setdefault((s["symbol"], s["side"], float(s["entry"]), stamp), []).append(s)
+
+        closed = []
+        for (symbol, side, entry, _), rows in groups.items():
+            atr = abs(entry - float(rows[0]["sl"])) or 1e-9
+            sl_m = [abs(entry - float(r["sl"])) / atr for r in rows]
+            tp_m = [abs(float(r["tp"]) - entry) / atr for r in rows]
+            grid = {"sl_m": sl_m, "tp_m": tp_m, "be_m": [None] * len(rows), "trail_m": [None] * len(rows)}
+            outcomes = np.array([OUTCOME_CODES.get(r.get("status"), 0) for r in rows], dtype=np.int8)
+            exits = np.where(outcomes > 0, tp_m, np.where(outcomes < 0, -np.asarray(sl_m), 0.0)).astype(np.float32)
+            done = bool(np.all(outcomes != 0))
+            e = {"id": rows[0].get("id"), "symbol": symbol, "side": side, "entry": entry, "atr": atr,
+                 "entry_time": rows[0].get("entry_time"), "start_time": rows[0].get("start_time"),
+                 "end_time": max((r.get("end_time") or "" for r in rows), default="") or None,
+                 "grid_id": self.add_grid(grid), "features": rows[0].get("features") or {},
+                 "outcomes": outcomes, "exits": exits, "status": "OPEN"}
+            self.add_entries([e])
+            # feed_shadows.py hat verfütterte Trades aus der JSON entfernt: alle abgeschlossenen sind neu
+            if done:
+                closed.append(dict(e, status="DONE"))
+        self.update_entries(closed)
+        return len(groups)
+
+    def migrate_json(self, legacy_json):
+        """Übernimmt shadow_trades.json einmalig: erst umbenennen (nur ein Prozess gewinnt), dann importieren."""
+        claimed = legacy_json + ".migrating"
+        try:
+            os.replace(legacy_json, claimed)
+        except OSError:
+            return 0   # Ein anderer Prozess übernimmt sie gerade
+        try:
+            with open(claimed, "r") as f: shadows = json.load(f)
+        except Exception as e:
+            os.replace(claimed, legacy_json)
+            log.error(f"❌ {legacy_json} nicht lesbar, keine Übernahme: {e}")
+            return 0
+        entries = self.import_legacy(shadows)
+        os.replace(claimed, legacy_json + ".migrated")
+        log.info(f"📦 {len(shadows)} Shadow-Trades aus {legacy_json} übernommen ({entries} Einstiege).")
+        return entries
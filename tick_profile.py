@@ -0,0 +1,156 @@
+# tick_profile.py
+import math
+import time
+import numpy as np
+
+DAY = 86400
+
+
+class DecayingHistogram:
+    """
+    Preis-Histogramm fester Größe mit exponentiellem Zerfall (Halbwertszeit in Sekunden).
+    - Zerfall ohne Durchlauf über das Array: neue Ticks bekommen das Gewicht exp(+λ·(t - t_ref)),
+      erst wenn der Exponent groß wird, wird einmal normiert (POC/VA/LVA sind skalierungsfrei)
+    - Verlässt der Preis das Raster, wird es verschoben (wenn die abgeschnittene Seite kaum
+      Gewicht hat) oder vergröbert (je zwei Bins zusammenfassen) -> Speicher bleibt konstant
+    """
+    RESCALE_EXP = 50.0      # Normieren, sobald Gewichte > e^50 werden
+    DROP_FRACTION = 0.01    # Max. Gewichtsanteil, der beim Verschieben verloren gehen darf
+
+    def __init__(self, bins=1024, step=0.0001, halflife=4 * 3600):
+        self.bins = bins
+        self.step = step
+        self.rate = math.log(2) / halflife
+        self.hist = np.zeros(bins)
+        self.origin = None      # Preis der Untergrenze von Bin 0
+        self.t_ref = None
+        self.count = 0          # Anzahl verarbeiteter Ticks
+
+    def _center(self, price):
+        self.origin = math.floor(price / self.step - self.bins / 2) * self.step
+
+    def _fit(self, lo, hi):
+        """Raster so anpassen, dass [lo, hi] hineinpasst."""
+        while True:
+            first = math.floor((lo - self.origin) / self.step)
+            last = math.floor((hi - self.origin) / self.step)
+            if first >= 0 and last < self.bins: return
+            if last - first < self.bins:
+                # Verschieben, so dass [lo, hi] mittig liegt
+                shift = (first + last) // 2 - self.bins // 2
+                total = self.hist.sum()
+                kept = self.hist[max(shift, 0):self.bins + min(shift, 0)].sum()
+                if total == 0 or total - kept <= total * self.DROP_FRACTION:
+                    moved = np.zeros(self.bins)
+                    if shift >= 0: moved[:self.bins - shift] = self.hist[shift:]
+                    else: moved[-shift:] = self.hist[:self.bins + shift]
+                    self.hist = moved
+                    self.origin += shift * self.step
+                    return
+            # Vergröbern: Bin-Paare zusammenfassen und mittig in das doppelt so breite Raster legen
+            merged = self.hist[:self.bins - self.bins % 2].reshape(-1, 2).sum(axis=1)
+            merged[-1] += self.hist[-1] if self.bins % 2 else 0.0
+            centre = self.bins // 4
+            self.hist = np.zeros(self.bins)
+            self.hist[centre:centre + len(merged)] = merged
+            self.step *= 2
+            self.origin -= centre * self.step
+
+    def add(self, times, prices, weights=None):
+        """Ticks hinzufügen (times in Sekunden, aufsteigend)."""
+        if len(prices) == 0: return
+        times = np.asarray(times, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.origin is None:
+            self._center(prices[-1])
+            self.t_ref = times[0]
+        if (times[-1] - self.t_ref) * self.rate > self.RESCALE_EXP:
+            self.hist *= math.exp(-(times[-1] - self.t_ref) * self.rate)
+            self.t_ref = times[-1]
+        self._fit(prices.min(), prices.max())
+
+        w = np.exp((times - self.t_ref) * self.rate)
+        if weights is not None: w *= weights
+        # Gleiche Rechnung wie in _fit -> alle Indizes liegen im Raster
+        idx = np.floor((prices - self.origin) / self.step).astype(np.intp)
+        if len(idx) < 64: np.add.at(self.hist, idx, w)   # Wenige Ticks: ohne Zwischen-Array
+        else: self.hist += np.bincount(idx, weights=w, minlength=self.bins)
+        self.count += len(prices)
+
+    def profile(self):
+        """(Volumen, Bin-Untergrenzen) des belegten Bereichs, oder (None, None) ohne Daten."""
+        filled = np.flatnonzero(self.hist)
+        if len(filled) == 0: return None, None
+        lo, hi = filled[0], filled[-1] + 1
+        prices = self.origin + np.arange(lo, hi) * self.step
+        return self.hist[lo:hi].copy(), prices
+
+    @property
+    def nbytes(self):
+        return self.hist.nbytes
+
+
+class TickProfileBook:
+    """
+    Tick-Profile pro Symbol aus copy_ticks_range, inkrementell: jeder Sync holt nur die Ticks
+    nach dem zuletzt verarbeiteten (time_msc). Gewicht 1 pro Tick (wie tick_volume), Preis = Bid.
+    Beim ersten Sync werden die letzten `warmup` Sekunden geladen.
+    """
+    def __init__(self, mt5_module, bins=1024, points_per_bin=10, halflife=4 * 3600, warmup=8 * 3600):
+        self.mt5 = mt5_module
+        self.bins = bins
+        self.points_per_bin = points_per_bin
+        self.halflife = halflife
+        self.warmup = warmup
+        self._hists = {}
+        self._last_msc = {}
+        self.stats = {"syncs": 0, "ticks": 0}
+
+    def _create(self, symbol):
+        info = self.mt5.symbol_info(symbol)
+        point = info.point if info else 0.00001
+        return DecayingHistogram(self.bins, point * self.points_per_bin, self.halflife)
+
+    def sync(self, symbol):
+        """Neue Ticks einlesen. Rückgabe: Anzahl neuer Ticks."""
+        last_msc = self._last_msc.get(symbol)
+        if last_msc is None:
+            tick = self.mt5.symbol_info_tick(symbol)
+            if tick is None: return 0
+            date_from = int(tick.time) - self.warmup
+        else:
+            date_from = last_msc // 1000
+        # Ende großzügig (Serverzeit kann von der lokalen Uhr abweichen)
+        ticks = self.mt5.copy_ticks_range(symbol, date_from, int(time.time()) + 2 * DAY, self.mt5.COPY_TICKS_ALL)
+        self.stats["syncs"] += 1
+        if ticks is None or len(ticks) == 0: return 0
+        if last_msc is not None:
+            ticks = ticks[ticks['time_msc'] > last_msc]
+            if len(ticks) == 0: return 0
+
+        hist = self._hists.get(symbol)
+        if hist is None: hist = self._hists[symbol] = self._create(symbol)
+        hist.add(ticks['time_msc'] / 1000.0, ticks['bid'])
+        self._last_msc[symbol] = int(ticks['time_msc'][-1])
+        self.stats["ticks"] += len(ticks)
+        return len(ticks)
+
+    def profile(self, symbol, sync=True):
+        """(Volumen, Bin-Preise) des Symbols oder (None, None), solange keine Ticks vorliegen."""
+        if sync: self.sync(symbol)
+        hist = self._hists.get(symbol)
+        return (None, None) if hist is None else hist.profile()
+
+    def version(self, symbol):
+        """Ändert sich mit jedem neuen Tick (Cache-Schlüssel für abgeleitete Werte)."""
+        return self._last_msc.get(symbol)
+
+    def reset(self, symbol=None):
+        if symbol is None:
+            self._hists.clear(); self._last_msc.clear()
+        else:
+            self._hists.pop(symbol, None); self._last_msc.pop(symbol, None)
+
+    @property
+    def nbytes(self):
+        return sum(h.nbytes for h in self._hists.values())
@@ -0,0 +1,215 @@
+# trade_stats.py
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from infrastructure import log
+
+FIELDS = ("symbol", "type", "entry", "max_profit_pips", "max_drawdown_pips")
+
+
+class TradeStatsStore:
+    """
+    MFE/MAE in SQLite:
+    - open_trades: Checkpoint der laufenden Trades (inkl. Zeitpunkt des zuletzt ausgewerteten Ticks)
+    - trade_history: abgeschlossene Trades, nur angehängt (Index auf Symbol und Schließzeit)
+    trade_perf_stats.json / trade_history_stats.json werden einmalig übernommen, wenn sie übergeben werden
+    (nur Bot und explizite Tools, nicht die parallelen Trainer-Worker).
+    Mit `writer` (persistence.WriteBehind) werden checkpoint()/archive() im Hintergrund geschrieben.
+    """
+    def __init__(self, path="trade_stats.db", legacy_active=None, legacy_history=None):
+        self.path = path
+        self.writer = None
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+        for legacy, target in ((legacy_active, "open"), (legacy_history, "history")):
+            if legacy and os.path.exists(legacy):
+                self.migrate_json(legacy, target)
+
+    def create_tables(self):
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS open_trades (
+                ticket TEXT PRIMARY KEY, symbol TEXT, type TEXT, entry REAL,
+                max_profit_pips REAL, max_drawdown_pips REAL, last_msc INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS trade_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket TEXT, symbol TEXT, type TEXT, entry REAL,
+                max_profit_pips REAL, max_drawdown_pips REAL, closed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_symbol ON trade_history (symbol, id);
+            CREATE INDEX IF NOT EXISTS idx_history_closed ON trade_history (closed_at);
+        ''')
+        self.conn.commit()
+
+    def load_open(self):
+        """{ticket: stats} der zuletzt gesicherten offenen Trades."""
+        return {r["ticket"]: {**{k: r[k] for k in FIELDS}, "last_msc": r["last_msc"] or 0}
+                for r in self.conn.execute("SELECT * FROM open_trades")}
+
+    def _write(self, statements):
+        """[(SQL, [Parameter, ...]), ...] in einer Transaktion, über den Writer oder direkt."""
+        if self.writer is not None:
+            for sql, rows in statements: self.writer.executemany(self.path, sql, rows)
+            return
+        with self.conn:
+            for sql, rows in statements: self.conn.executemany(sql, rows)
+
+    def checkpoint(self, stats):
+        """Ersetzt den Stand der offenen Trades (wenige Zeilen, eine Transaktion)."""
+        self._write([
+            ("DELETE FROM open_trades", [()]),
+            ("INSERT INTO open_trades (ticket, symbol, type, entry, max_profit_pips, max_drawdown_pips, last_msc) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+             [(t, s["symbol"], s["type"], float(s["entry"]), float(s["max_profit_pips"]),
+               float(s["max_drawdown_pips"]), int(s.get("last_msc") or 0)) for t, s in stats.items()])])
+
+    def archive(self, closed, closed_at=None):
+        """Hängt geschlossene Trades an die Historie an und entfernt sie aus open_trades."""
+        closed_at = time.time() if closed_at is None else closed_at
+        self._write([
+            ("INSERT INTO trade_history (ticket, symbol, type, entry, max_profit_pips, max_drawdown_pips, closed_at) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+             [(t, s["symbol"], s["type"], float(s["entry"]), float(s["max_profit_pips"]),
+               float(s["max_drawdown_pips"]), closed_at) for t, s in closed.items()]),
+            ("DELETE FROM open_trades WHERE ticket = ?", [(t,) for t in closed])])
+
+    def history(self, limit=500, symbol=None):
+        """Die letzten `limit` abgeschlossenen Trades (älteste zuerst)."""
+        sql = "SELECT * FROM trade_history"
+        args = ()
+        if symbol is not None:
+            sql += " WHERE symbol = ?"
+            args = (symbol,)
+        rows = self.conn.execute(sql + " ORDER BY id DESC LIMIT ?", args + (int(limit),)).fetchall()
+        return [{"ticket": r["ticket"], **{k: r[k] for k in FIELDS}, "closed_at": r["closed_at"]} for r in reversed(rows)]
+
+    def count(self):
+        return self.conn.execute("SELECT count(*) FROM trade_history").fetchone()[0]
+
+    def migrate_json(self, legacy_json, target):
+        """Übernimmt eine der alten JSON-Dateien einmalig: erst umbenennen (nur ein Prozess gewinnt), dann importieren."""
+        claimed = legacy_json + ".migrating"
+        try:
+            os.replace(legacy_json, claimed)
+        except OSError:
+            return 0   # Ein anderer Prozess übernimmt sie gerade
+        try:
+            with open(claimed, "r") as f: data = json.load(f)
+        except Exception as e:
+            os.replace(claimed, legacy_json)
+            log.error(f"❌ {legacy_json} nicht lesbar, keine Übernahme: {e}")
+            return 0
+        if target == "open":
+            self.checkpoint({**self.load_open(), **{str(t): s for t, s in (data or {}).items()}})
+        else:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO trade_history (ticket, symbol, type, entry, max_profit_pips, max_drawdown_pips, closed_at) "
+                    "VALUES (NULL, ?, ?, ?, ?, ?, NULL)",
+                    [tuple(s.get(k) for k in FIELDS) for s in data or []])
+        os.replace(claimed, legacy_json + ".migrated")
+        log.info(f"📦 {len(data or [])} Trades aus {legacy_json} übernommen.")
+        return len(data or [])
+
+
+class MfeMaeTracker:
+    """
+    MFE/MAE der offenen Positionen im Speicher, in Points (wie bisher 'pips').
+    - Extremwerte aus allen Ticks seit der letzten Prüfung (ein copy_ticks_range pro Symbol, nicht
+      pro Position); liegt die letzte Prüfung länger als `tick_window` Sekunden zurück (Neustart,
+      alte Position), aus den M1-Hochs/Tiefs seitdem (Ask = Bid + Spread der Kerze)
+    - Buy wird zum Bid bewertet, Sell zum Ask (Preis beim Schließen)
+    - Checkpoint der offenen Trades höchstens alle `checkpoint_interval` Sekunden,
+      geschlossene Trades werden sofort an die Historie angehängt
+    """
+    def __init__(self, mt5_handler, store, checkpoint_interval=60, tick_window=3600, max_bars=500):
+        self.mt5 = mt5_handler
+        self.store = store
+        self.checkpoint_interval = checkpoint_interval
+        self.tick_window = tick_window
+        self.max_bars = max_bars
+        self.stats = store.load_open()
+        self._dirty = False
+        self._last_checkpoint = time.time()
+
+    def _path(self, symbol, since_msc, tick):
+        """(Zeit in ms, Bid-Hoch, Bid-Tief, Ask-Hoch, Ask-Tief) aller Preise nach since_msc."""
+        module = self.mt5.mt5
+        if tick.time - since_msc // 1000 <= self.tick_window:
+            ticks = module.copy_ticks_range(symbol, since_msc // 1000, int(tick.time) + 60, module.COPY_TICKS_ALL)
+            if ticks is not None and len(ticks):
+                ticks = ticks[(ticks['time_msc'] > since_msc) & (ticks['bid'] > 0) & (ticks['ask'] > 0)]
+                return ticks['time_msc'], ticks['bid'], ticks['bid'], ticks['ask'], ticks['ask']
+        count = min(int(tick.time - since_msc // 1000) // 60 + 2, self.max_bars)
+        bars = self.mt5.candles.get_rates(symbol, module.TIMEFRAME_M1, count)
+        if bars is None or len(bars) == 0: return None
+        # Kerzen, die nach since_msc enden (die angebrochene zählt ganz)
+        bars = bars[(bars['time'] + 60) * 1000 > since_msc]
+        spread = bars['spread'] * self.mt5.symbols.get_static(symbol).point
+        return ((bars['time'] + 59) * 1000, bars['high'], bars['low'], bars['high'] + spread, bars['low'] + spread)
+
+    def update(self, positions, complete=True):
+        """
+        Aktualisiert MFE/MAE aller Positionen. Rückgabe: {ticket: stats} der seit dem letzten Aufruf geschlossenen.
+        complete=False (Positionsabfrage fehlgeschlagen): keine Schließ-Erkennung, nichts wird archiviert.
+        """
+        by_symbol = {}
+        for pos in positions:
+            ticket = str(pos.ticket)
+            if ticket not in self.stats:
+                opened = getattr(pos, "time_msc", 0) or int(pos.time) * 1000
+                self.stats[ticket] = {"symbol": pos.symbol, "max_profit_pips": 0.0, "max_drawdown_pips": 0.0,
+                                      "entry": pos.price_open, "type": "BUY" if pos.type == 0 else "SELL",
+                                      "last_msc": opened - 1}
+                self._dirty = True
+            by_symbol.setdefault(pos.symbol, []).append(self.stats[ticket])
+
+        for symbol, trades in by_symbol.items():
+            tick = self.mt5.get_tick(symbol)
+            if not tick: continue
+            tick_msc = getattr(tick, "time_msc", 0) or int(tick.time) * 1000
+            since = min(s["last_msc"] for s in trades)
+            path = self._path(symbol, since, tick) if since < tick_msc else None
+            times, bid_hi, bid_lo, ask_hi, ask_lo = path if path is not None else (np.empty(0),) * 5
+            point = self.mt5.symbols.get_static(symbol).point
+
+            for s in trades:
+                # Nur Preise nach der letzten Prüfung dieses Trades, plus der aktuelle Tick
+                new = times > s["last_msc"]
+                if s["type"] == "BUY":
+                    best = np.max(bid_hi[new], initial=tick.bid)
+                    worst = np.min(bid_lo[new], initial=tick.bid)
+                    profit, drawdown = (best - s["entry"]) / point, (worst - s["entry"]) / point
+                else:
+                    best = np.min(ask_lo[new], initial=tick.ask)
+                    worst = np.max(ask_hi[new], initial=tick.ask)
+                    profit, drawdown = (s["entry"] - best) / point, (s["entry"] - worst) / point
+                if profit > s["max_profit_pips"]:
+                    s["max_profit_pips"] = float(profit)
+                    self._dirty = True
+                if drawdown < s["max_drawdown_pips"]:   # drawdown ist negativ
+                    s["max_drawdown_pips"] = float(drawdown)
+                    self._dirty = True
+                # Später eintreffende Ticks werden beim nächsten Mal erneut gelesen (Extremwerte ändern sich nicht)
+                s["last_msc"] = max(s["last_msc"], tick_msc)
+
+        # Geschlossene Trades: sofort archivieren
+        closed = {}
+        if complete:
+            current = {str(p.ticket) for p in positions}
+            closed = {t: self.stats.pop(t) for t in [t for t in self.stats if t not in current]}
+        if closed:
+            self.store.archive(closed)
+
+        if self._dirty and time.time() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+        return closed
+
+    def checkpoint(self):
+        self.store.checkpoint(self.stats)
+        self._dirty = False
+        self._last_checkpoint = time.time()
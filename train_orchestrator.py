@@ -0,0 +1,146 @@
+# train_orchestrator.py
+"""
+Paralleles, fortsetzbares Training aller (Symbol, Timeframe)-Jobs.
+
+    python train_orchestrator.py                # Standard: cfg.TRAIN_WORKERS Prozesse
+    python train_orchestrator.py --workers 8 --symbols EURUSD XAUUSD --timeframes M5
+    python train_orchestrator.py --fresh        # neuer Lauf, auch nach Abbruch
+
+Jeder Job läuft in einem eigenen Prozess (eigene MT5-Verbindung). Das Manifest
+(ai_models/train_manifest.json) hält Status, Dauer und Daten-Hash pro Job:
+- Nach einem Abbruch setzt der nächste Start denselben Lauf fort und überspringt erledigte Jobs.
+- Jobs, deren abgeschlossene Kerzen sich seit dem letzten Modell nicht geändert haben, werden
+  nach dem Laden der Daten übersprungen ("unchanged").
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from infrastructure import log
+from settings import cfg
+
+MANIFEST_FILE = os.path.join("ai_models", "train_manifest.json")
+TIMEFRAMES = ("M1", "M5", "M15")
+# Modell ist aktuell / Job lief im Lauf vollständig durch (wird beim Fortsetzen übersprungen)
+FINISHED = ("done", "unchanged")
+COMPLETED = FINISHED + ("too_few_setups", "no_data")
+
+_trainer = None
+
+
+def _init_worker():
+    """Ein Trainer (inkl. MT5-Verbindung) pro Worker-Prozess."""
+    global _trainer
+    from trainer import StrategyAITrainer
+    _trainer = StrategyAITrainer()
+
+
+def _run_job(symbol, tf_name, prev_hash):
+    t0 = time.time()
+    try:
+        result = _trainer.train_job(symbol, tf_name, prev_hash)
+    except Exception as e:
+        log.error(f"❌ Job {symbol} {tf_name} abgebrochen: {e}")
+        result = {"status": "failed", "error": str(e)}
+    result["duration"] = round(time.time() - t0, 1)
+    return symbol, tf_name, result
+
+
+class TrainingManifest:
+    """JSON-Manifest der Trainings-Jobs; wird nach jedem Job atomar geschrieben."""
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.data = {"run": {}, "jobs": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f: self.data = json.load(f)
+            except Exception as e:
+                log.warning(f"⚠️ Manifest {path} unlesbar, starte neu: {e}")
+
+    @property
+    def jobs(self):
+        return self.data["jobs"]
+
+    def start_run(self, fresh=False):
+        run = self.data.get("run") or {}
+        if run.get("id") and not run.get("finished") and not fresh:
+            log.info(f"♻️ Setze unterbrochenen Trainingslauf {run['id']} fort.")
+        else:
+            self.data["run"] = {"id": datetime.now().strftime("%Y%m%d-%H%M%S"), "started": time.time(), "finished": None}
+        self.save()
+        return self.data["run"]["id"]
+
+    def finish_run(self):
+        self.data["run"]["finished"] = time.time()
+        self.save()
+
+    def update(self, key, **fields):
+        entry = self.jobs.setdefault(key, {})
+        entry.update(fields)
+        if entry.get("status") != "failed": entry.pop("error", None)
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f: json.dump(self.data, f, indent=4)
+        os.replace(tmp, self.path)
+
+
+def plan_jobs(manifest, run_id, symbols, timeframes):
+    """(symbol, tf, prev_hash) für alle Jobs, die in diesem Lauf noch ausstehen."""
+    pending = []
+    for symbol in symbols:
+        for tf_name in timeframes:
+            key = f"{symbol}_{tf_name}"
+            entry = manifest.jobs.get(key, {})
+            if entry.get("run") == run_id and entry.get("status") in COMPLETED:
+                continue   # In diesem Lauf schon erledigt (Fortsetzen nach Abbruch)
+            model_exists = os.path.exists(os.path.join("ai_models", f"{key}_model.pkl"))
+            prev_hash = entry.get("data_hash") if entry.get("status") in FINISHED and model_exists else None
+            pending.append((symbol, tf_name, prev_hash))
+    return pending
+
+
+def run(workers, symbols, timeframes, fresh=False):
+    manifest = TrainingManifest()
+    run_id = manifest.start_run(fresh)
+    jobs = plan_jobs(manifest, run_id, symbols, timeframes)
+    total = len(symbols) * len(timeframes)
+    log.info(f"🏭 Training: {len(jobs)}/{total} Jobs offen, {workers} Worker")
+
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = []
+        for symbol, tf_name, prev_hash in jobs:
+            manifest.update(f"{symbol}_{tf_name}", run=run_id, status="queued")
+            futures.append(pool.submit(_run_job, symbol, tf_name, prev_hash))
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            symbol, tf_name, result = future.result()
+            if result["status"] == "unchanged":
+                # Kennzahlen des bestehenden Modells behalten
+                result.pop("samples", None); result.pop("test_score", None)
+            manifest.update(f"{symbol}_{tf_name}", run=run_id, finished=time.time(), **result)
+            log.info(f"📋 [{done}/{len(futures)}] {symbol} {tf_name}: {result['status']} ({result['duration']} s)")
+
+    # Lauf bleibt offen, solange Jobs fehlgeschlagen sind -> nächster Start versucht nur diese erneut
+    statuses = [manifest.jobs.get(f"{s}_{tf}", {}).get("status") for s in symbols for tf in timeframes]
+    if all(st in COMPLETED for st in statuses):
+        manifest.finish_run()
+    counts = {st: statuses.count(st) for st in sorted(set(statuses), key=str)}
+    log.info(f"🏁 Trainingslauf {run_id} beendet in {time.time() - t0:.0f} s: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paralleles, fortsetzbares Modell-Training")
+    parser.add_argument("--workers", type=int, default=cfg.TRAIN_WORKERS)
+    parser.add_argument("--symbols", nargs="+", default=cfg.SYMBOLS)
+    parser.add_argument("--timeframes", nargs="+", default=list(TIMEFRAMES), choices=TIMEFRAMES)
+    parser.add_argument("--fresh", action="store_true", help="Neuen Lauf starten statt fortzusetzen")
+    args = parser.parse_args()
+    run(args.workers, args.symbols, args.timeframes, args.fresh)
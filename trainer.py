@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 np.NaN = np.nan
 import os
+import hashlib
 import joblib
 import MetaTrader5 as mt5
 from sklearn.ensemble import RandomForestClassifier
@@ -13,6 +14,10 @@ from infrastructure import AIEngine, log, DatabaseHandler, VolumeProfileEngine
 from mt5_handler import MT5Handler
 from advanced_engine import AdvancedMarketEngine
 from settings import cfg
+from features import FEATURE_LIST, compute_feature_matrix
+from forest_compiler import CompiledForest, forest_path
+from labels import triple_barrier_labels
+from bar_store import BarStore
 
 class StrategyAITrainer:
     def __init__(self):
@@ -22,113 +27,137 @@ class StrategyAITrainer:
         self.vp_engine = VolumeProfileEngine()
         self.ai_engine = AIEngine()
         self.strat_engine = AdvancedMarketEngine(self.mt5_handler, self.db_handler)
+        # Lokale Kerzen-Historie: pro Lauf wird nur der fehlende Schwanz vom Terminal geholt
+        self.bars = BarStore(mt5, cfg.BAR_STORE_DIR, history=cfg.BAR_STORE_HISTORY)
         
-        self.feature_list = [
-            'rsi', 'stoch_k', 'cci', 'rsi_prev1', 'rsi_prev2',
-            'macd_hist', 'trend_strength', 'macd_hist_prev1', 'macd_hist_prev2',
-            'bb_pct', 'bb_width', 'atr', 'mfi', 'obv_slope',
-            'wick_upper', 'wick_lower', 'is_doji', 'engulfing'
-        ]
+        self.feature_list = list(FEATURE_LIST)
+        # Triple Barrier: TP 2.5 ATR, SL 1.5 ATR, max. 48 Kerzen
+        self.barrier = (2.5, 1.5, 48)
 
     def simulate_outcome(self, df, start_idx, side):
-        lookahead = 48 
-        subset = df.iloc[start_idx + 1 : start_idx + lookahead + 1]
-        if subset.empty: return 0
-        entry = df['close'].iloc[start_idx]
-        atr = df['atr'].iloc[start_idx]
-        tp = entry + (atr * 2.5) if side == "LONG" else entry - (atr * 2.5)
-        sl = entry - (atr * 1.5) if side == "LONG" else entry + (atr * 1.5)
-        for _, row in subset.iterrows():
-            if side == "LONG":
-                if row['high'] >= tp: return 1 
-                if row['low'] <= sl: return 2  
-            else:
-                if row['low'] <= tp: return 1  
-                if row['high'] >= sl: return 2 
-        return 0 
+        """Einzelnes Label (1 = TP, 2 = SL, 0 = Timeout); für viele Signale label_outcomes nutzen."""
+        return int(self.label_outcomes(df, [start_idx], [side])[0])
+
+    def label_outcomes(self, df, indices, sides):
+        """First-Touch-Labels aller Signale in einem Durchlauf (TP/SL in ATR, Horizont in Kerzen)."""
+        return triple_barrier_labels(df['high'].values, df['low'].values, df['close'].values,
+                                     df['atr'].values, indices, sides, barriers=(self.barrier,))[0]
+
+    # Timeframes, die pro Symbol trainiert werden
+    TIMEFRAMES = {
+        "M1": mt5.TIMEFRAME_M1,
+        "M5": mt5.TIMEFRAME_M5,
+        "M15": mt5.TIMEFRAME_M15
+    }
+
+    @staticmethod
+    def data_hash(rates):
+        """Fingerabdruck der Kerzen (der Bar-Store liefert nur abgeschlossene Kerzen)."""
+        return hashlib.sha1(np.ascontiguousarray(rates).tobytes()).hexdigest()
+
+    def train_job(self, symbol, tf_name, prev_hash=None):
+        """
+        Trainiert ein Modell für (Symbol, Timeframe) und gibt das Ergebnis für das Job-Manifest zurück.
+        Ist prev_hash gesetzt und die Historie unverändert, wird nicht neu trainiert ("unchanged").
+        """
+        tf_value = self.TIMEFRAMES[tf_name]
+        result = {"status": "failed", "bars": 0, "data_hash": None, "samples": 0, "test_score": None}
+        mt5.symbol_select(symbol, True)
+        log.info(f"--- 🚀 Deep-Training: {symbol} auf {tf_name} ---")
+        try:
+            # Daten laden (Für M1 laden wir mehr, damit er genug Setups findet)
+            anzahl_kerzen = 50000 if tf_name == "M1" else 50000
+            rates = self.bars.bars(symbol, tf_value, count=anzahl_kerzen)
+            
+            if rates is None or len(rates) == 0:
+                log.error(f"❌ Keine {tf_name} Daten für {symbol} erhalten.")
+                result["status"] = "no_data"
+                return result
+
+            result["bars"] = len(rates)
+            result["data_hash"] = self.data_hash(rates)
+            if prev_hash and prev_hash == result["data_hash"]:
+                log.info(f"⏭️ {symbol} {tf_name}: Historie unverändert, Modell bleibt.")
+                result["status"] = "unchanged"
+                return result
+
+            # Vektorisierter NumPy-Kernel statt pandas_ta (gleiche Werte, ohne Zwischen-DataFrames)
+            df = pd.DataFrame(rates)
+            try:
+                features = compute_feature_matrix(df['open'].values, df['high'].values, df['low'].values,
+                                                  df['close'].values, df['tick_volume'].values)
+            except Exception as e:
+                log.error(f"❌ Feature Engineering fehlgeschlagen für {symbol} auf {tf_name}: {e}")
+                return result
+            df[self.feature_list] = features
+
+            # FIX: M1 braucht einen größeren Rückblick für das Volumen-Profil, sonst stürzt Pandas ab!
+            lookback = 400 if tf_name == "M1" else 200
+            
+            # Signale für die ganze Historie in einem Durchlauf (gleich wie check_entry_signal pro Fenster)
+            candidates = range(lookback + 50, len(df) - 50)
+            directions, _ = self.strat_engine.scan_entry_signals(df, lookback, candidates)
+            signal_idx = [i for i, d in zip(candidates, directions) if d]
+            signal_side = [d for d in directions if d]
+
+            # Alle Signale auf einmal labeln, Timeouts (0) verwerfen
+            outcomes = self.label_outcomes(df, signal_idx, signal_side)
+            keep = np.asarray(signal_idx, dtype=np.int64)[outcomes != 0]
+            X_data = list(features[keep])
+            y_data = outcomes[outcomes != 0].astype(int).tolist()
+            result["samples"] = len(X_data)
+
+            # --- DEBUG INFO ---
+            if len(X_data) < 50:
+                log.warning(f"⚠️ Zu wenig Setups auf {tf_name} gefunden ({len(X_data)}/50 benötigt).")
+                result["status"] = "too_few_setups"
+                return result
+            # ------------------
+
+            # --- NEU: DATEN SPLITTEN (80% Lernen, 20% Blind-Test) ---
+            X_train, X_test, y_train, y_test = train_test_split(
+                X_data, y_data, test_size=0.2, random_state=42, shuffle=False
+            )
+
+            log.info(f"🧠 Training mit {len(X_train)} Setups, Test mit {len(X_test)} Setups...")
+
+            model = RandomForestClassifier(
+                n_estimators=1000, 
+                max_depth=None, 
+                min_samples_leaf=1,
+                random_state=42,
+                n_jobs=1 
+            )
+            
+            # Nur mit dem Trainings-Teil fitten!
+            model.fit(X_train, y_train)
+            
+            # Scores berechnen
+            train_score = accuracy_score(y_train, model.predict(X_train))
+            test_score = accuracy_score(y_test, model.predict(X_test))
+            result["test_score"] = round(float(test_score), 4)
+            
+            log.info(f"🎯 Train-Score (Memory): {train_score:.2%}")
+            log.info(f"💎 ECHTE TEST-GENAUIGKEIT: {test_score:.2%}")
+
+            # Das Modell wird am Ende mit allen Daten finalisiert, bevor es gespeichert wird
+            model.fit(X_data, y_data)
+            
+            save_path = f"ai_models/{symbol}_{tf_name}_model.pkl" # z.B. XAGUSD_M1_model.pkl
+            joblib.dump(model, save_path)
+            CompiledForest.compile(model).save(forest_path(save_path))
+            log.info(f"💾 {tf_name} Modell gespeichert.")
+            result["status"] = "done"
+            return result
+        finally:
+            # Memory-Map der Trainings-Historie freigeben
+            self.bars.release(symbol, tf_value)
 
     def train_all(self):
-        timeframes = {
-            "M1": mt5.TIMEFRAME_M1,
-            "M5": mt5.TIMEFRAME_M5,
-            "M15": mt5.TIMEFRAME_M15
-        }
+        """Seriell über alle Symbole & Timeframes (parallel & fortsetzbar: train_orchestrator.py)."""
         for symbol in cfg.SYMBOLS:
-            mt5.symbol_select(symbol, True)
-            
-            for tf_name, tf_value in timeframes.items():
-                log.info(f"--- 🚀 Deep-Training: {symbol} auf {tf_name} ---")
-                
-                # Daten laden (Für M1 laden wir mehr, damit er genug Setups findet)
-                anzahl_kerzen = 50000 if tf_name == "M1" else 50000
-                rates = mt5.copy_rates_from_pos(symbol, tf_value, 0, anzahl_kerzen)
-                
-                if rates is None or len(rates) == 0:
-                    log.error(f"❌ Keine {tf_name} Daten für {symbol} erhalten.")
-                    continue
-                
-                # =================================================================
-                # FIX: Alles ab hier ist jetzt EINGERÜCKT, damit es für JEDEN 
-                # Timeframe ausgeführt wird (und nicht nur für den letzten!)
-                # =================================================================
-                
-                df = self.ai_engine.feature_engineering(pd.DataFrame(rates))
-                if df.empty:
-                    log.error(f"❌ Feature Engineering fehlgeschlagen für {symbol} auf {tf_name}")
-                    continue
-
-                X_data, y_data = [], []
-                
-                # FIX: M1 braucht einen größeren Rückblick für das Volumen-Profil, sonst stürzt Pandas ab!
-                lookback = 400 if tf_name == "M1" else 200
-                
-                for i in range(lookback + 50, len(df) - 50):
-                    subset = df.iloc[i-lookback : i+1]
-                    direction, _ = self.strat_engine.check_entry_signal(symbol, subset, self.vp_engine)
-                    
-                    if direction:
-                        outcome = self.simulate_outcome(df, i, direction)
-                        if outcome != 0:
-                            X_data.append(df.iloc[i][self.feature_list].values)
-                            y_data.append(outcome)
-
-                # --- DEBUG INFO ---
-                if len(X_data) < 50:
-                    log.warning(f"⚠️ Zu wenig Setups auf {tf_name} gefunden ({len(X_data)}/50 benötigt).")
-                    continue
-                # ------------------
-
-                # --- NEU: DATEN SPLITTEN (80% Lernen, 20% Blind-Test) ---
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X_data, y_data, test_size=0.2, random_state=42, shuffle=False
-                )
-
-                log.info(f"🧠 Training mit {len(X_train)} Setups, Test mit {len(X_test)} Setups...")
-
-                model = RandomForestClassifier(
-                    n_estimators=1000, 
-                    max_depth=None, 
-                    min_samples_leaf=1,
-                    random_state=42,
-                    n_jobs=1 
-                )
-                
-                # Nur mit dem Trainings-Teil fitten!
-                model.fit(X_train, y_train)
-                
-                # Scores berechnen
-                train_score = accuracy_score(y_train, model.predict(X_train))
-                test_score = accuracy_score(y_test, model.predict(X_test))
-                
-                log.info(f"🎯 Train-Score (Memory): {train_score:.2%}")
-                log.info(f"💎 ECHTE TEST-GENAUIGKEIT: {test_score:.2%}")
-
-                # Das Modell wird am Ende mit allen Daten finalisiert, bevor es gespeichert wird
-                model.fit(X_data, y_data)
-                
-                save_path = f"ai_models/{symbol}_{tf_name}_model.pkl" # z.B. XAGUSD_M1_model.pkl
-                joblib.dump(model, save_path)
-                log.info(f"💾 {tf_name} Modell gespeichert.")
+            for tf_name in self.TIMEFRAMES:
+                self.train_job(symbol, tf_name)
 
 if __name__ == "__main__":
     trainer = StrategyAITrainer()
@@ -23,7 +23,10 @@ def run_visualizer():
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     try:
         from infrastructure import AIEngine
+        from bar_store import BarStore
+        from settings import cfg
         ai = AIEngine()
+        store = BarStore(mt5, cfg.BAR_STORE_DIR, history=cfg.BAR_STORE_HISTORY)
     except ImportError:
         print("❌ Konnte AIEngine nicht laden.")
         return
@@ -41,9 +44,9 @@ def run_visualizer():
     model_m5.n_jobs = 1
     model_m1.n_jobs = 1
 
-    print("⏳ Hole Kerzendaten von MT5...")
-    rates_m5 = mt5.copy_rates_from_pos(SYMBOL, mt5.TIMEFRAME_M5, 0, 800)
-    rates_m1 = mt5.copy_rates_from_pos(SYMBOL, mt5.TIMEFRAME_M1, 0, 4000)
+    print("⏳ Hole Kerzendaten (Bar-Store, nur fehlende Kerzen von MT5)...")
+    rates_m5 = store.bars(SYMBOL, mt5.TIMEFRAME_M5, 800)
+    rates_m1 = store.bars(SYMBOL, mt5.TIMEFRAME_M1, 4000)
 
     df_m5 = pd.DataFrame(rates_m5)
     df_m5['time'] = pd.to_datetime(df_m5['time'], unit='s')
@@ -0,0 +1,142 @@
+# volume_profile.py
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def decay_weights(length, decay=0.95):
+    """Gewichte wie VolumeProfileEngine: älteste Kerze decay**(n-1), jüngste 1.0 (Python-Potenzen)."""
+    weights = [decay ** i for i in range(length)]
+    weights.reverse()
+    return np.array(weights)
+
+
+def _histograms(closes, weighted_vol, bins):
+    """np.histogram(bins=bins) für jede Zeile mit eigenem [min, max]-Bereich (gleiche Bin-Zuordnung)."""
+    n, m = closes.shape
+    first, last = closes.min(axis=1), closes.max(axis=1)
+    flat = first == last
+    first = np.where(flat, first - 0.5, first)
+    last = np.where(flat, last + 0.5, last)
+    edges = np.linspace(first, last, bins + 1, endpoint=True, axis=1)
+
+    rows = np.arange(n)[:, None]
+    idx = (((closes - first[:, None]) / (last - first)[:, None]) * bins).astype(np.intp)
+    idx[idx == bins] -= 1
+    # Korrektur auf ~1 ULP an den Kanten wie in numpy
+    idx[closes < edges[rows, idx]] -= 1
+    idx[(closes >= edges[rows, idx + 1]) & (idx != bins - 1)] += 1
+
+    # bincount über alle Zeilen auf einmal (Summierreihenfolge pro Bin = Reihenfolge im Fenster)
+    flat_idx = (rows * bins + idx).ravel()
+    hist = np.bincount(flat_idx, weights=weighted_vol.ravel(), minlength=n * bins).reshape(n, bins)
+    return hist, edges
+
+
+def _smooth3(hist):
+    """pd.Series(h).rolling(3, center=True, min_periods=1).mean() zeilenweise (inkl. Kahan-Summe)."""
+    n, m = hist.shape
+    out = np.empty_like(hist)
+    sum_x, comp_add, comp_rem = np.zeros(n), np.zeros(n), np.zeros(n)
+    neg = np.zeros(n, dtype=np.int64)
+    same = np.zeros(n, dtype=np.int64)
+    prev = hist[:, 0].copy()
+
+    def add(val):
+        nonlocal sum_x, comp_add, prev
+        y = val - comp_add
+        t = sum_x + y
+        comp_add = t - sum_x - y
+        sum_x = t
+        neg[:] += np.signbit(val)
+        same[:] = np.where(val == prev, same + 1, 1)
+        prev = val.copy()
+
+    def remove(val):
+        nonlocal sum_x, comp_rem
+        y = -val - comp_rem
+        t = sum_x + y
+        comp_rem = t - sum_x - y
+        sum_x = t
+        neg[:] -= np.signbit(val)
+
+    # Fenstergrenzen des zentrierten FixedWindowIndexer
+    end_raw = np.arange(2, m + 2)
+    start, end = np.maximum(end_raw - 3, 0), np.minimum(end_raw, m)
+    for i in range(m):
+        if i == 0:
+            for j in range(start[0], end[0]): add(hist[:, j])
+        else:
+            for j in range(start[i - 1], start[i]): remove(hist[:, j])
+            for j in range(end[i - 1], end[i]): add(hist[:, j])
+        nobs = end[i] - start[i]
+        res = sum_x / nobs
+        res = np.where(same >= nobs, prev, res)
+        res = np.where((neg == 0) & (res < 0), 0.0, res)
+        res = np.where((neg == nobs) & (res > 0), 0.0, res)
+        out[:, i] = res
+    return out
+
+
+def _value_area(vol, prices):
+    """POC / VAH / VAL pro Zeile wie calculate_enhanced_profile (inkl. pandas-Sortierreihenfolge)."""
+    n, m = vol.shape
+    rows = np.arange(n)[:, None]
+    poc = prices[np.arange(n), vol.argmax(axis=1)]
+    va_v = vol.sum(axis=1) * 0.70
+
+    # sort_values(ascending=False): pandas kehrt um, sortiert (quicksort) und kehrt wieder um
+    rev = np.arange(m)[::-1]
+    order = rev[np.argsort(vol[:, ::-1], axis=1, kind='quicksort')][:, ::-1]
+    cum_v = np.cumsum(vol[rows, order], axis=1)
+    in_va = cum_v <= va_v[:, None]
+    va_idx = np.where(in_va, order, -1)
+    hi = va_idx.max(axis=1)
+    lo = np.where(in_va, order, m).min(axis=1)
+
+    has_va = in_va.any(axis=1)
+    vah = np.where(has_va, prices[np.arange(n), np.maximum(hi, 0)], poc)
+    val = np.where(has_va, prices[np.arange(n), np.minimum(lo, m - 1)], poc)
+    return poc, vah, val
+
+
+def histogram_levels(hist, prices):
+    """Geglättetes Volumen und POC / VAH / VAL eines einzelnen Histogramms (wie calculate_enhanced_profile)."""
+    # Eine Zeile: pandas selbst ist hier schneller als _smooth3 (Schleife über die Bins)
+    vol = pd.Series(np.asarray(hist, dtype=np.float64)).rolling(window=3, center=True, min_periods=1).mean().fillna(0).values
+    poc, vah, val = (float(a[0]) for a in _value_area(vol[None], np.asarray(prices)[None]))
+    return vol, poc, vah, val
+
+
+def rolling_profile(close, volume=None, lookback=96, decay=0.95, bins=50, start=0, chunk=4096):
+    """
+    POC / VAH / VAL für jede Kerze i (Fenster = die letzten `lookback` Kerzen bis inkl. i),
+    identisch zu VolumeProfileEngine.calculate_enhanced_profile(df.iloc[:i+1]) – aber für die
+    ganze Historie in einem Durchlauf. Die Bin-Grenzen hängen vom Min/Max jedes Fensters ab,
+    daher werden die Fenster blockweise vektorisiert statt pro Bar mit pandas berechnet.
+    Kerzen mit weniger als 20 Bars Historie liefern (0, 0, 0) wie das Original.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.ones(len(close)) if volume is None else np.asarray(volume, dtype=np.float64)
+    n = len(close)
+    poc, vah, val = np.zeros(n), np.zeros(n), np.zeros(n)
+
+    # Anfang der Historie: kürzere Fenster (eigene Gewichtslänge)
+    for i in range(max(start, 19), min(lookback - 1, n)):
+        k = i + 1
+        w = decay_weights(k, decay)
+        hist, edges = _histograms(close[None, :k], (volume[:k] * w)[None], bins)
+        p = _value_area(_smooth3(hist), edges[:, :-1])
+        poc[i], vah[i], val[i] = (a[0] for a in p)
+
+    first = max(start, lookback - 1)
+    if first >= n: return poc, vah, val
+    weights = decay_weights(lookback, decay)
+    win_close = sliding_window_view(close, lookback)
+    win_vol = sliding_window_view(volume, lookback)
+    for s in range(first, n, chunk):
+        e = min(s + chunk, n)
+        rows = slice(s - lookback + 1, e - lookback + 1)
+        hist, edges = _histograms(win_close[rows], win_vol[rows] * weights, bins)
+        poc[s:e], vah[s:e], val[s:e] = _value_area(_smooth3(hist), edges[:, :-1])
+    return poc, vah, val